@@ -6,61 +6,342 @@ on the context.
 
 """
 import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from json import JSONDecodeError
 from pprint import pformat
-from urllib.parse import urljoin, urlunparse
+from urllib.parse import urljoin, urlparse, urlunparse
 
 import requests
 from requests.auth import AuthBase
 from requests.exceptions import HTTPError
 
-from integrade import config, exceptions
+from integrade import config, exceptions, jsonstream, tracing
 
 AUTHORIZATION_HEADER = 'Authorization'
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+IDEMPOTENT_METHODS = frozenset(('DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT'))
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+"""Upper bounds, in seconds, of the buckets of the latency histograms."""
+
 logger = logging.getLogger(__name__)
 
 
+def redacted_headers(request):
+    """Return a copy of the request headers safe to be logged.
+
+    The value of the authorization header is replaced with asterisks.
+    """
+    headers = request.headers.copy()
+    if headers.get(AUTHORIZATION_HEADER) is not None:
+        headers[AUTHORIZATION_HEADER] = '*' * 8
+    return headers
+
+
+def endpoint_name(method, url):
+    """Return a name grouping requests to the same endpoint.
+
+    Numeric path segments, like object IDs, are replaced with ``{id}`` so that,
+    for example, requests to every cloud account share a name::
+
+        >>> endpoint_name('GET', 'http://example.com/api/v1/account/12/')
+        'GET /api/v1/account/{id}/'
+    """
+    path = '/'.join(
+        '{id}' if segment.isdigit() else segment
+        for segment in urlparse(url).path.split('/')
+    )
+    return f'{method} {path}'
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of sorted ``samples``, by nearest rank."""
+    if not samples:
+        return None
+    rank = max(int(-(-pct * len(samples) // 100)), 1)
+    return samples[rank - 1]
+
+
+class RequestStats(object):
+    """Collect latency, size and status statistics of API requests.
+
+    Requests are grouped by :func:`endpoint_name`. Every :class:`Client`
+    records into the module level :data:`STATS` collector unless given its
+    own, so the statistics of a whole test session end up in one place.
+    """
+
+    def __init__(self):
+        """Start without any recorded requests."""
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, method, url, status, elapsed, size):
+        """Record a request.
+
+        :param method: The HTTP method of the request.
+        :param url: The requested URL.
+        :param status: The response status code, or ``None`` if no response
+            was received.
+        :param elapsed: How many seconds the request took.
+        :param size: How many bytes the response body had.
+        """
+        with self._lock:
+            endpoint = self._endpoint(endpoint_name(method, url))
+            endpoint['latencies'].append(elapsed)
+            endpoint['bytes'] += size
+            endpoint['statuses'][status] = (
+                endpoint['statuses'].get(status, 0) + 1)
+
+    def record_retry(self, method, url):
+        """Record that a request is about to be retried."""
+        with self._lock:
+            self._endpoint(endpoint_name(method, url))['retries'] += 1
+
+    def _endpoint(self, name):
+        """Return the statistics of an endpoint, creating them if needed."""
+        return self._endpoints.setdefault(name, {
+            'latencies': [],
+            'bytes': 0,
+            'statuses': {},
+            'retries': 0,
+        })
+
+    def summary(self):
+        """Return the statistics of every endpoint requested so far.
+
+        :returns: A dictionary keyed by endpoint name. Each value has the
+            request count, latency percentiles, mean and max in seconds, a
+            latency histogram keyed by the :data:`LATENCY_BUCKETS` upper
+            bounds as strings, the total bytes received, the count of each
+            status code and how many times requests were retried.
+        """
+        with self._lock:
+            endpoints = {
+                name: dict(e, latencies=sorted(e['latencies']),
+                           statuses=dict(e['statuses']))
+                for name, e in self._endpoints.items()
+            }
+        summary = {}
+        for name, endpoint in endpoints.items():
+            latencies = endpoint['latencies']
+            histogram = dict.fromkeys(map(str, LATENCY_BUCKETS), 0)
+            for latency in latencies:
+                bucket = next(b for b in LATENCY_BUCKETS if latency <= b)
+                histogram[str(bucket)] += 1
+            summary[name] = {
+                'count': len(latencies),
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'mean': sum(latencies) / len(latencies),
+                'max': latencies[-1],
+                'histogram': histogram,
+                'bytes': endpoint['bytes'],
+                'statuses': endpoint['statuses'],
+                'retries': endpoint['retries'],
+            }
+        return summary
+
+    def dump(self):
+        """Return the recorded requests, to be merged in other statistics.
+
+        Unlike :meth:`summary`, the result keeps every latency, so the
+        statistics of several processes can be merged with :meth:`merge`.
+        """
+        with self._lock:
+            return {
+                name: dict(e, latencies=list(e['latencies']),
+                           statuses=dict(e['statuses']))
+                for name, e in self._endpoints.items()
+            }
+
+    def merge(self, dumped):
+        """Add the requests returned by the :meth:`dump` of other statistics.
+
+        :param dumped: The result of :meth:`dump`.
+        """
+        with self._lock:
+            for name, other in dumped.items():
+                endpoint = self._endpoint(name)
+                endpoint['latencies'].extend(other['latencies'])
+                endpoint['bytes'] += other['bytes']
+                endpoint['retries'] += other['retries']
+                for status, count in other['statuses'].items():
+                    endpoint['statuses'][status] = (
+                        endpoint['statuses'].get(status, 0) + count)
+
+    def clear(self):
+        """Forget every recorded request."""
+        with self._lock:
+            self._endpoints.clear()
+
+
+STATS = RequestStats()
+"""Statistics of every request made by clients without their own collector."""
+
+
+def retry_after(response):
+    """Return how many seconds the ``Retry-After`` header asks us to wait.
+
+    :returns: A number of seconds, or ``None`` if the header is missing or
+        invalid.
+    """
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class Retry(object):
+    """Policy for retrying requests that failed with a transient error.
+
+    Requests are retried when the connection fails or the response status is
+    one of ``statuses``, but only for the ``methods`` given, which default to
+    the idempotent ones. Between attempts the client waits for the time asked
+    by the ``Retry-After`` response header or, without one, for a random
+    amount of time up to an exponentially growing limit ("full jitter").
+
+    :param total: How many times a single request may be retried.
+    :param statuses: Response status codes to retry.
+    :param methods: HTTP methods to retry.
+    :param backoff: Base of the exponential backoff, in seconds. The wait
+        before retry ``n`` (counting from 0) is at most ``backoff * 2 ** n``.
+    :param max_delay: The longest wait between attempts, in seconds. If
+        ``Retry-After`` asks for longer, the request is not retried.
+    """
+
+    def __init__(self, total=3, statuses=(502, 503, 504),
+                 methods=IDEMPOTENT_METHODS, backoff=0.5, max_delay=30):
+        """Save the retry policy."""
+        self.total = total
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    def can_retry(self, method, attempt):
+        """Return True if attempt number ``attempt`` may be retried."""
+        return attempt < self.total and method.upper() in self.methods
+
+    def delay(self, attempt, response=None):
+        """Return how long to wait before retrying attempt ``attempt``.
+
+        :returns: A number of seconds, or ``None`` if the response asked for a
+            longer wait than ``max_delay`` and should not be retried.
+        """
+        wait = retry_after(response)
+        if wait is not None:
+            return wait if wait <= self.max_delay else None
+        return random.uniform(
+            0, min(self.max_delay, self.backoff * 2 ** attempt))
+
+
+def _truncate(text, limit):
+    """Cap ``text`` at ``limit`` characters, saying how much was cut."""
+    if limit is None or len(text) <= limit:
+        return text
+    return '{}... ({} more characters)'.format(
+        text[:limit], len(text) - limit)
+
+
+class ResponseError(HTTPError):
+    """An HTTPError raised for a response with a 4XX or 5XX status code.
+
+    Building a readable message means decoding and pretty printing the whole
+    response, which is wasted work when the error is expected and caught, as
+    in negative tests. So the message is only built when the error is turned
+    into a string, and the bodies in it are capped at
+    :attr:`max_body_length` characters. The request and response are available
+    as usual through the ``request`` and ``response`` attributes, and
+    :attr:`details` holds the full details as a dictionary.
+    """
+
+    max_body_length = 2000
+    """How many characters of each body to include in the message."""
+
+    def __init__(self, *args, **kwargs):
+        """Remember the response, see ``requests.exceptions.HTTPError``."""
+        super().__init__(*args, **kwargs)
+        self._details = None
+        self._message = None
+
+    @property
+    def details(self):
+        """Return the details of the failed request and its response.
+
+        :returns: A dictionary with the request ``method``, ``path``, ``body``
+            and ``headers``, with the authorization header redacted, and the
+            response ``status_code`` and either its decoded ``json`` body or
+            its ``text``.
+        """
+        if self._details is None:
+            request = self.response.request
+            details = {
+                'method': request.method,
+                'path': request.path_url,
+                'body': request.body,
+                'headers': redacted_headers(request),
+                'status_code': self.response.status_code,
+            }
+            try:
+                details['json'] = self.response.json()
+            except JSONDecodeError:
+                details['text'] = self.response.text
+            self._details = details
+        return self._details
+
+    def __str__(self):
+        """Build, once, and return the error message."""
+        if self._message is None:
+            details = self.details
+            limit = self.max_body_length
+            if 'json' in details:
+                response_message = 'json_error_message : {}'.format(
+                    _truncate(pformat(details['json']), limit))
+            else:
+                response_message = 'text_error_message : {}'.format(
+                    _truncate(pformat(details['text']), limit))
+            rule = '\n{}\n'.format('=' * 60)
+            self._message = rule + (
+                '\nThe request you made received a status code that'
+                ' indicates\nan error was encountered. Details about the'
+                ' request and the\nresponse are below.\n'
+            ) + rule
+            self._message += '\n\n'.join([
+                'request path : {}'.format(pformat(details['path'])),
+                'request body : {}'.format(
+                    _truncate(pformat(details['body']), limit)),
+                'request headers : {}'.format(pformat(details['headers'])),
+                'response code : {}'.format(details['status_code']),
+                response_message,
+            ])
+            self._message += rule
+        return self._message
+
+
 def raise_error_for_status(response):
-    """Generate an error message and raise HTTPError for bad return codes.
+    """Raise a ResponseError for bad return codes.
 
-    :raises: ``requests.exceptions.HTTPError`` if the response status code is
-        in the 4XX or 5XX range.
+    :raises: :class:`ResponseError`, a ``requests.exceptions.HTTPError``, if
+        the response status code is in the 4XX or 5XX range.
     """
     if 400 <= response.status_code <= 599:
-        error_msgs = (
-            '\n============================================================\n'
-            '\nThe request you made received a status code that indicates\n'
-            'an error was encountered. Details about the request and the\n'
-            'response are below.\n'
-            '\n============================================================\n'
-        )
-
-        try:
-            response_message = 'json_error_message : {}'.format(
-                pformat(response.json()))
-        except JSONDecodeError:
-            response_message = 'text_error_message : {}'.format(
-                pformat(response.text))
-
-        error_headers = response.request.headers.copy()
-        if error_headers.get(AUTHORIZATION_HEADER) is not None:
-            error_headers[AUTHORIZATION_HEADER] = '*' * 8
-        error_msgs += '\n\n'.join(
-            [
-                'request path : {}'.format(pformat(
-                    response.request.path_url)),
-                'request body : {}'.format(pformat(
-                    response.request.body)),
-                'request headers : {}'.format(pformat(
-                    error_headers)),
-                'response code : {}'.format(response.status_code),
-                '{error_message}'.format(error_message=response_message)
-            ]
-        )
-        error_msgs += (
-            '\n============================================================\n'
-        )
-        raise HTTPError(error_msgs)
+        raise ResponseError(response=response)
 
 
 def echo_handler(response):
@@ -88,6 +369,132 @@ def json_handler(response):
     return response.json()
 
 
+def stream_handler(key, chunk_size=64 * 1024):
+    """Create a handler yielding the items of a list in a JSON response body.
+
+    Like :func:`json_handler`, but instead of decoding the whole body, return
+    a generator of the items of the list under the top level ``key``, decoded
+    as they are downloaded. This keeps memory bounded for large responses, like
+    the ``results`` of list endpoints or the ``daily_usage`` of reports::
+
+        >>> client = api.Client(api.stream_handler('results'))
+        >>> for instance in client.get(urls.INSTANCE):
+        ...     check(instance)
+
+    A :class:`Client` using this handler requests responses with
+    ``stream=True``. The response is closed once the generator is exhausted or
+    closed.
+
+    :param key: The top level key of the list to yield items from.
+    :param chunk_size: How many bytes to read from the response at once.
+    """
+    def handler(response):
+        raise_error_for_status(response)
+        return _iter_response_items(response, key, chunk_size)
+    handler.stream = True
+    return handler
+
+
+def _iter_response_items(response, key, chunk_size):
+    """Yield the items of a list in a response body, closing it after."""
+    try:
+        yield from jsonstream.iter_items(
+            response.iter_content(chunk_size), key)
+    finally:
+        response.close()
+
+
+class CacheEntry(object):
+    """A response stored in a :class:`ResponseCache`."""
+
+    def __init__(self, response, ttl):
+        """Store the response and when it was stored."""
+        self.response = response
+        self.ttl = ttl
+        self.refresh()
+
+    def refresh(self):
+        """Mark the response as just validated."""
+        self.stored_at = time.monotonic()
+
+    def fresh(self):
+        """Return True if the response can be used without revalidation."""
+        return time.monotonic() - self.stored_at < self.ttl
+
+    def validators(self):
+        """Return the headers to revalidate the response with the server."""
+        headers = {}
+        if self.response.headers.get('ETag'):
+            headers['If-None-Match'] = self.response.headers['ETag']
+        if self.response.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = (
+                self.response.headers['Last-Modified'])
+        return headers
+
+
+class ResponseCache(object):
+    """An LRU cache of GET responses for :class:`Client`.
+
+    Responses are keyed by URL, query parameters and credentials, so users
+    never see each other's responses. A cached response is used as is for
+    ``ttl`` seconds. After that, if the response had an ``ETag`` or
+    ``Last-Modified`` header, the next request for it is made conditional and
+    a ``304 Not Modified`` answer reuses the cached response. Otherwise it is
+    requested again. When more than ``maxsize`` responses are cached the least
+    recently used one is dropped.
+
+    Example::
+
+        >>> client = api.Client(cache=api.ResponseCache(ttl=30))
+        >>> client.get(urls.REPORT_ACCOUNTS, params=params)  # requested
+        >>> client.get(urls.REPORT_ACCOUNTS, params=params)  # cached
+
+    :param ttl: How many seconds a response is used without revalidation.
+    :param maxsize: How many responses to keep.
+    """
+
+    def __init__(self, ttl=60, maxsize=128):
+        """Start with an empty cache."""
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, params=None, headers=None, auth=None, **kwargs):
+        """Return the cache key of a GET request."""
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        authorization = (headers or {}).get(AUTHORIZATION_HEADER)
+        return repr((url, params, authorization, getattr(auth, 'token', auth)))
+
+    def get(self, key):
+        """Return the :class:`CacheEntry` for ``key``, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            return None
+
+    def store(self, key, response):
+        """Cache ``response`` under ``key``."""
+        with self._lock:
+            self._entries[key] = CacheEntry(response, self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        """Return how many responses are cached."""
+        return len(self._entries)
+
+
 class TokenAuth(AuthBase):
     """A class that enables token authentication with the Requests library.
 
@@ -147,7 +554,8 @@ class Client(object):
     """
 
     def __init__(self, response_handler=None, url=None, authenticate=True,
-                 token=None):
+                 token=None, stats=None, slow_request_threshold=None,
+                 retry=None, cache=None):
         """Initialize this object, collecting base URL from config file.
 
         If no response handler is specified, use the `code_handler` which will
@@ -156,11 +564,32 @@ class Client(object):
         If no URL is specified, then the url will be built from the
         environment variables $CLOUDIGRADE_BASE_URL and $USE_HTTPS values (see
         integrade/config.py).
+
+        Statistics of every request are recorded in ``stats``, a
+        :class:`RequestStats`, which defaults to the module level
+        :data:`STATS`. Requests taking longer than ``slow_request_threshold``
+        seconds are logged, the default comes from
+        $INTEGRADE_SLOW_REQUEST_SECONDS (see integrade/config.py).
+
+        Requests failing with a transient error are retried according to
+        ``retry``, a :class:`Retry`. If not specified, idempotent requests are
+        retried up to 3 times on connection errors and 502, 503 and 504
+        responses. Pass ``Retry(total=0)`` to disable retries.
+
+        GET responses are cached in ``cache``, a :class:`ResponseCache`, if
+        one is given. Caching is opt-in because tests checking that data
+        changes must see those changes.
         """
         self.token = token
         self.url = url
         cfg = config.get_config()
         self.verify = cfg.get('ssl-verify', False)
+        self.request_stats = STATS if stats is None else stats
+        if slow_request_threshold is None:
+            slow_request_threshold = cfg.get('slow_request_threshold')
+        self.slow_request_threshold = slow_request_threshold
+        self.retry = Retry() if retry is None else retry
+        self.cache = cache
 
         if not self.url:
             hostname = cfg.get('base_url')
@@ -241,6 +670,9 @@ class Client(object):
 
         Arguments passed directly in to this method override (but do not
         overwrite!) arguments specified in ``self.request_kwargs``.
+
+        A ``retry`` argument overrides the client's :class:`Retry` policy for
+        this request only.
         """
         # The `self.request_kwargs` dict should *always* have a "url" argument.
         # This is enforced by `self.__init__`. This allows us to call the
@@ -252,4 +684,97 @@ class Client(object):
         headers.update(kwargs.get('headers', {}))
         kwargs['headers'] = headers
         kwargs.setdefault('verify', self.verify)
-        return self.response_handler(requests.request(method, url, **kwargs))
+        if getattr(self.response_handler, 'stream', False):
+            kwargs.setdefault('stream', True)
+        retry = kwargs.pop('retry', self.retry)
+        cache_key = entry = None
+        if self.cache is not None:
+            if method.upper() not in SAFE_METHODS:
+                # Whatever we are about to change may be in a cached response.
+                self.cache.clear()
+            elif method.upper() == 'GET' and not kwargs.get('stream'):
+                cache_key = self.cache.key(url, **kwargs)
+                entry = self.cache.get(cache_key)
+                if entry is not None and entry.fresh():
+                    return self.response_handler(entry.response)
+                if entry is not None:
+                    headers.update(entry.validators())
+        response = self._send_with_retries(method, url, retry, **kwargs)
+        if cache_key is not None:
+            if response.status_code == 304 and entry is not None:
+                entry.refresh()
+                response = entry.response
+            elif response.status_code == 200:
+                self.cache.store(cache_key, response)
+        return self.response_handler(response)
+
+    def _send_with_retries(self, method, url, retry, **kwargs):
+        """Send an HTTP request, retrying it as allowed by ``retry``."""
+        attempt = 0
+        while True:
+            try:
+                response = self._send(method, url, attempt, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if not retry.can_retry(method, attempt):
+                    raise
+                delay = retry.delay(attempt)
+            else:
+                if (response.status_code not in retry.statuses or
+                        not retry.can_retry(method, attempt)):
+                    return response
+                delay = retry.delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+            logger.info('Retrying %s %s in %.2fs (attempt %s of %s)',
+                        method, url, delay, attempt + 1, retry.total)
+            self.request_stats.record_retry(method, url)
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, method, url, attempt, **kwargs):
+        """Send a single HTTP request, recording its timing and statistics."""
+        start = time.perf_counter()
+        name = endpoint_name(method, url)
+        with tracing.span(name, 'http', attempt=attempt) as span:
+            try:
+                response = requests.request(method, url, **kwargs)
+            except requests.exceptions.RequestException:
+                self.request_stats.record(
+                    method, url, None, time.perf_counter() - start, 0)
+                raise
+            span.tag(status=response.status_code)
+        elapsed = time.perf_counter() - start
+        self.request_stats.record(
+            method, url, response.status_code, elapsed,
+            _response_size(response))
+        if (self.slow_request_threshold is not None and
+                elapsed > self.slow_request_threshold):
+            logger.warning(
+                'Slow request took %.2fs: %s %s (status %s)\n'
+                'request headers : %s',
+                elapsed, method, url, response.status_code,
+                pformat(redacted_headers(response.request)),
+            )
+        return response
+
+    def stats(self):
+        """Return the statistics of the collector this client records into.
+
+        Unless the client was given its own ``stats``, this is the module
+        level :data:`STATS`, so the summary covers the requests of every such
+        client of the process, not only this one. See
+        :meth:`RequestStats.summary` for the format.
+        """
+        return self.request_stats.summary()
+
+
+def _response_size(response):
+    """Return the size in bytes of a response body, without reading it."""
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, TypeError, ValueError):
+        # Without a Content-Length, only count bodies that Requests already
+        # read, so streamed responses are not consumed here.
+        content = getattr(response, '_content', None)
+        return len(content) if isinstance(content, bytes) else 0
@@ -0,0 +1,339 @@
+"""Benchmark how the report endpoints scale with the amount of data.
+
+For each dataset size, a new user and cloud account are seeded with that many
+instances, each with many power on and off events spread over the last year,
+through :func:`integrade.injector.inject_bulk_instance_data`. Then each report
+endpoint is timed over 1, 30 and 365 day windows. Sizes grow geometrically so
+the time it takes to answer a report should grow at most linearly from one
+size to the next.
+
+Run it with ``python -m integrade.benchmark`` or ``integrade-benchmark``, for
+example::
+
+    integrade-benchmark run --build 1.2.0 --output 1.2.0.json
+    integrade-benchmark run --build 1.3.0 --output 1.3.0.json
+    integrade-benchmark compare 1.2.0.json 1.3.0.json
+
+``compare`` flags every report and window whose time grows superlinearly with
+the dataset size, and every timing that got slower than in the baseline
+results, and exits with an error if it flagged anything.
+"""
+import json
+import math
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+
+from integrade import api, injector
+from integrade.tests import urls, utils
+from integrade.utils import DAY, day_start, format_timestamp
+
+SIZES = (10, 100, 1000, 10000)
+WINDOWS = (1, 30, 365)
+REPORTS = {
+    'accounts': urls.REPORT_ACCOUNTS,
+    'images': urls.REPORT_IMAGES,
+    'instances': urls.REPORT_INSTANCES,
+}
+IMAGE_TYPES = ('', 'rhel', 'openshift', 'rhel,openshift')
+
+SCALING_THRESHOLD = 1.2
+"""Exponent above which the time of a report is considered superlinear.
+
+If the size grows by a factor ``k`` and the time by a factor ``t``, the
+exponent is ``log(t) / log(k)``. Linear scaling is 1, and a little headroom is
+left for the noise of timing a remote service.
+"""
+
+REGRESSION_THRESHOLD = 1.25
+"""Ratio of the current to the baseline time considered a regression."""
+
+
+def make_instances(size, events=10, images=None, days=400, seed=0):
+    """Return the description of ``size`` instances for the bulk injector.
+
+    :param size: How many instances.
+    :param events: How many events each instance has.
+    :param images: How many images the instances share, defaults to one per
+        ten instances.
+    :param days: How many days in the past the events are spread over.
+    :param seed: The random seed, the same arguments always describe the same
+        instances.
+    """
+    rng = random.Random(seed)
+    images = images or max(1, size // 10)
+    amis = [
+        (f'ami-bench-{seed}-{i}', rng.choice(IMAGE_TYPES))
+        for i in range(images)
+    ]
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    instances = []
+    for i in range(size):
+        ec2_ami_id, image_type = rng.choice(amis)
+        hours = sorted(rng.sample(range(1, days * 24), events), reverse=True)
+        instances.append({
+            'instance_id': f'i-bench-{seed}-{size}-{i}',
+            'ec2_ami_id': ec2_ami_id,
+            'image_type': image_type,
+            'vcpu': rng.choice((1, 2, 4, 8)),
+            'memory': rng.choice((1, 2, 4, 16)),
+            'events': [now - timedelta(hours=h) for h in hours],
+        })
+    return instances
+
+
+def seed_dataset(size, events=10, seed=0):
+    """Seed a new user and cloud account with ``size`` instances.
+
+    :returns: A dictionary with the ``auth`` of the user and the
+        ``account_id`` of the cloud account.
+    """
+    user = utils.create_user_account()
+    account = injector.inject_aws_cloud_account(user['id'], acct_age=400)
+    injector.inject_bulk_instance_data(
+        account['id'], make_instances(size, events, seed=seed))
+    # Check the whole dataset made it to the database in one round trip.
+    injected = len(injector.query_account_events(account['id'])['power_on'])
+    if injected != size * events:
+        raise RuntimeError(
+            f'Expected {size * events} events to be injected, found '
+            f'{injected}.')
+    return {'auth': utils.get_auth(user), 'account_id': account['id']}
+
+
+def window(days):
+    """Return the report parameters for a window ending tomorrow."""
+    end = day_start(days=1)
+    return {
+        'start': format_timestamp(end - days * DAY),
+        'end': format_timestamp(end),
+    }
+
+
+def time_report(client, url, params, auth, repeat=5):
+    """Return how many seconds each of ``repeat`` requests to a report took."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.get(url, params=params, auth=auth)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(sizes=SIZES, windows=WINDOWS, repeat=5, events=10, build=None,
+        seed=0, client=None, seeder=seed_dataset):
+    """Seed each dataset size and time every report over every window.
+
+    :param sizes: The dataset sizes, in instances.
+    :param windows: The report windows, in days.
+    :param repeat: How many times each report is requested.
+    :param events: How many events each instance has.
+    :param build: A label for the cloudigrade build being benchmarked.
+    :param seed: The random seed of the datasets.
+    :param client: The :class:`integrade.api.Client` requesting the reports.
+    :param seeder: A callable seeding a dataset, see :func:`seed_dataset`.
+    :returns: A dictionary with the parameters of the run and a ``results``
+        list with the ``timings``, ``median`` and ``min`` of each ``size``,
+        ``report`` and ``window``.
+    """
+    if client is None:
+        client = api.Client(authenticate=False, retry=api.Retry(total=0))
+    results = []
+    for size in sizes:
+        dataset = seeder(size, events=events, seed=seed)
+        for days in windows:
+            for report, url in REPORTS.items():
+                params = window(days)
+                if report == 'images':
+                    params['account_id'] = dataset['account_id']
+                timings = time_report(
+                    client, url, params, dataset['auth'], repeat)
+                results.append({
+                    'size': size,
+                    'report': report,
+                    'window': days,
+                    'timings': timings,
+                    'median': statistics.median(timings),
+                    'min': min(timings),
+                })
+    return {
+        'build': build,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'repeat': repeat,
+        'events': events,
+        'seed': seed,
+        'results': results,
+    }
+
+
+def _medians(benchmark):
+    """Map ``(report, window)`` to a ``{size: median}`` dictionary."""
+    medians = {}
+    for r in benchmark['results']:
+        medians.setdefault((r['report'], r['window']), {})[r['size']] = (
+            r['median'])
+    return medians
+
+
+def scaling_exponents(benchmark):
+    """Return how the time of each report grows with the dataset size.
+
+    :returns: A dictionary mapping ``(report, window)`` to a list of
+        ``(smaller size, larger size, exponent)`` for each pair of consecutive
+        sizes, see :data:`SCALING_THRESHOLD`.
+    """
+    exponents = {}
+    for key, medians in _medians(benchmark).items():
+        sizes = sorted(medians)
+        exponents[key] = [
+            (a, b, math.log(medians[b] / medians[a]) / math.log(b / a))
+            for a, b in zip(sizes, sizes[1:])
+            if medians[a] > 0 and medians[b] > 0
+        ]
+    return exponents
+
+
+def compare(baseline, current, scaling=SCALING_THRESHOLD,
+            regression=REGRESSION_THRESHOLD):
+    """Flag superlinear scaling and regressions in benchmark results.
+
+    :param baseline: The results of a previous :func:`run`, or None to only
+        look for superlinear scaling.
+    :param current: The results of the :func:`run` to check.
+    :param scaling: The exponent above which scaling is superlinear.
+    :param regression: The ratio to the baseline time above which a timing is
+        a regression.
+    :returns: A list of findings, each a dictionary with a ``kind``, either
+        ``superlinear`` or ``regression``, the ``report`` and ``window`` and
+        either the ``sizes`` and ``exponent`` or the ``size``, ``baseline``
+        and ``current`` medians and their ``ratio``.
+    """
+    findings = []
+    for (report, days), pairs in sorted(scaling_exponents(current).items()):
+        for a, b, exponent in pairs:
+            if exponent > scaling:
+                findings.append({
+                    'kind': 'superlinear',
+                    'report': report,
+                    'window': days,
+                    'sizes': [a, b],
+                    'exponent': exponent,
+                })
+    if baseline is None:
+        return findings
+    before = _medians(baseline)
+    for (report, days), medians in sorted(_medians(current).items()):
+        for size, median in sorted(medians.items()):
+            old = before.get((report, days), {}).get(size)
+            if not old:
+                continue
+            ratio = median / old
+            if ratio > regression:
+                findings.append({
+                    'kind': 'regression',
+                    'report': report,
+                    'window': days,
+                    'size': size,
+                    'baseline': old,
+                    'current': median,
+                    'ratio': ratio,
+                })
+    return findings
+
+
+def format_results(benchmark):
+    """Return a human readable table of benchmark results."""
+    lines = [
+        'Build {} ({} events per instance, median of {} requests)'.format(
+            benchmark.get('build') or 'unknown', benchmark['events'],
+            benchmark['repeat']),
+        '{:<10} {:>7} {:>8} {:>10}'.format(
+            'report', 'window', 'size', 'median'),
+    ]
+    for r in sorted(benchmark['results'],
+                    key=lambda r: (r['report'], r['window'], r['size'])):
+        lines.append('{:<10} {:>6}d {:>8} {:>9.3f}s'.format(
+            r['report'], r['window'], r['size'], r['median']))
+    return '\n'.join(lines)
+
+
+def format_finding(finding):
+    """Return a human readable description of a :func:`compare` finding."""
+    if finding['kind'] == 'superlinear':
+        return (
+            '{report} report over {window}d scales superlinearly from {0} to '
+            '{1} instances (exponent {exponent:.2f})'.format(
+                *finding['sizes'], **finding))
+    return (
+        '{report} report over {window}d with {size} instances regressed '
+        'from {baseline:.3f}s to {current:.3f}s ({ratio:.2f}x)'.format(
+            **finding))
+
+
+def _load(path):
+    """Load benchmark results from a JSON file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+@click.group()
+def main():
+    """Benchmark how the cloudigrade report endpoints scale."""
+
+
+@main.command('run')
+@click.option('--size', 'sizes', type=int, multiple=True,
+              help='Dataset size in instances, may be repeated. Defaults to '
+              + ', '.join(str(s) for s in SIZES))
+@click.option('--window', 'windows', type=int, multiple=True,
+              help='Report window in days, may be repeated. Defaults to '
+              + ', '.join(str(w) for w in WINDOWS))
+@click.option('--repeat', default=5, show_default=True,
+              help='Requests per report, size and window.')
+@click.option('--events', default=10, show_default=True,
+              help='Events per instance.')
+@click.option('--seed', default=0, show_default=True,
+              help='Random seed of the datasets.')
+@click.option('--build', help='Label of the cloudigrade build benchmarked.')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='Write the results as JSON to this file.')
+def run_command(sizes, windows, repeat, events, seed, build, output):
+    """Seed datasets and time the report endpoints."""
+    benchmark = run(
+        sizes=sizes or SIZES,
+        windows=windows or WINDOWS,
+        repeat=repeat,
+        events=events,
+        build=build,
+        seed=seed,
+    )
+    click.echo(format_results(benchmark))
+    for finding in compare(None, benchmark):
+        click.echo(format_finding(finding))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(benchmark, f, indent=2)
+
+
+@main.command('compare')
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--scaling', default=SCALING_THRESHOLD, show_default=True,
+              help='Exponent above which scaling is superlinear.')
+@click.option('--regression', default=REGRESSION_THRESHOLD, show_default=True,
+              help='Slowdown ratio above which a timing is a regression.')
+def compare_command(baseline, current, scaling, regression):
+    """Compare the CURRENT results to the BASELINE results."""
+    findings = compare(_load(baseline), _load(current), scaling, regression)
+    for finding in findings:
+        click.echo(format_finding(finding))
+    if findings:
+        raise SystemExit(1)
+    click.echo('No superlinear scaling or regressions found.')
+
+
+if __name__ == '__main__':
+    main()
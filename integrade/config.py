@@ -9,7 +9,7 @@ from xdg import BaseDirectory
 
 import yaml
 
-from integrade import exceptions, injector, utils
+from integrade import exceptions, injector, utils, workers
 
 
 # Suppress HTTPS warnings against our test server without a cert
@@ -23,6 +23,24 @@ _CONFIG = None
 _AWS_CONFIG = None
 
 
+class _MissingAwsProfiles(list):
+    """The empty AWS profiles of a worker which could not claim one.
+
+    Tests checking how many profiles are configured see none, but taking a
+    profile out of the list raises a
+    :class:`integrade.exceptions.MissingConfigurationError` telling why.
+    """
+
+    def __init__(self, error):
+        """Remember why there are no profiles."""
+        super().__init__()
+        self.error = error
+
+    def __getitem__(self, index):
+        """Raise the reason why there are no profiles."""
+        raise exceptions.MissingConfigurationError(self.error)
+
+
 def get_config(create_superuser=True, need_base_url=True):
     """Return a copy of the global config dictionary.
 
@@ -70,9 +88,23 @@ def get_config(create_superuser=True, need_base_url=True):
                     for role in filter(is_role, os.environ.keys())
                     ]
         profiles.sort(key=lambda p: p['name'])
-        _CONFIG['aws_profiles'] = profiles
-
+        # When sharded with pytest-xdist, each worker claims its own profile
+        # and sees it first, so tests using ``cfg['aws_profiles'][0]`` on
+        # different workers do not fight over the same AWS account.
+        # A worker left without a profile still runs the tests that need
+        # none, and only fails once a test takes a profile.
         missing_config_errors = []
+        slot = workers.claim_slot('aws_profile', len(profiles))
+        if profiles and slot is None:
+            profiles = _MissingAwsProfiles(
+                f'More pytest-xdist workers ({workers.worker_count()}) than'
+                f' AWS profiles ({len(profiles)}) were requested, so this'
+                f' worker has none. Run with at most {len(profiles)} workers'
+                ' or add CLOUDIGRADE_ROLE_* profiles to your environment.'
+            )
+        elif slot:
+            profiles = profiles[slot:] + profiles[:slot]
+        _CONFIG['aws_profiles'] = profiles
 
         try:
             aws_image_config = get_aws_image_config()
@@ -111,6 +143,14 @@ def get_config(create_superuser=True, need_base_url=True):
             _CONFIG['ssl-verify'] = True
         else:
             _CONFIG['ssl-verify'] = False
+        _CONFIG['slow_request_threshold'] = float(
+            os.getenv('INTEGRADE_SLOW_REQUEST_SECONDS', 5))
+        _CONFIG['remote_timeout'] = float(
+            os.getenv('INTEGRADE_REMOTE_TIMEOUT', 60))
+        _CONFIG['remote_max_result_size'] = int(
+            os.getenv('INTEGRADE_REMOTE_MAX_BYTES', 256 * 1024 * 1024))
+        _CONFIG['remote_compression'] = os.getenv(
+            'INTEGRADE_REMOTE_COMPRESSION', 'gzip')
 
         if missing_config_errors:
             raise exceptions.MissingConfigurationError(
@@ -119,21 +159,33 @@ def get_config(create_superuser=True, need_base_url=True):
         super_username = os.environ.get(
             'CLOUDIGRADE_USER', utils.uuid4()
         )
-        _CONFIG['super_user_name'] = super_username
         super_password = os.environ.get(
             'CLOUDIGRADE_PASSWORD', utils.gen_password()
         )
-        _CONFIG['super_user_password'] = super_password
         token = os.environ.get('CLOUDIGRADE_TOKEN', False)
         if not token and create_superuser:
+            def make_super_user():
+                return {
+                    'username': super_username,
+                    'password': super_password,
+                    'token': injector.make_super_user(
+                        super_username, super_password),
+                }
+
             try:
-                token = injector.make_super_user(
-                    super_username, super_password)
+                # Only one xdist worker creates the super user, the others
+                # reuse its credentials.
+                super_user = workers.shared_value('superuser', make_super_user)
             except RuntimeError as e:
                 raise exceptions.MissingConfigurationError(
                     'Could not create a super user or token, error:\n'
                     f'{repr(e)}'
                 )
+            super_username = super_user['username']
+            super_password = super_user['password']
+            token = super_user['token']
+        _CONFIG['super_user_name'] = super_username
+        _CONFIG['super_user_password'] = super_password
         _CONFIG['superuser_token'] = token
     return deepcopy(_CONFIG)
 
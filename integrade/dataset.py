@@ -0,0 +1,301 @@
+"""Generate large, reproducible datasets and the reports they should produce.
+
+A :class:`Dataset` builds a whole graph of cloud accounts, images, instances
+and power on/off events from a compact spec, see :data:`DEFAULT_SPEC`. The
+same spec, seed and reference time always produce the same dataset, and every
+instance can be generated on its own, so datasets of any size are streamed
+into :func:`integrade.injector.inject_bulk_instance_data` without holding them
+in memory.
+
+Since the dataset knows every event it injected, it also knows what the
+reports should say about it::
+
+    dataset = Dataset({'accounts': 2, 'instances': 500}, seed=42)
+    dataset.inject(user['id'])
+    response = client.get(urls.REPORT_INSTANCES, params=params, auth=auth)
+    expected = dataset.expected_daily_usage(start, end)
+    assert response.json()['daily_usage'] == expected['daily_usage']
+"""
+import itertools
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+
+from integrade import injector, oracle
+from integrade.oracle import TAGS
+from integrade.utils import DAY, utc_timestamp
+
+DEFAULT_SPEC = {
+    'accounts': 1,
+    'images': 10,
+    'instances': 100,
+    'days': 30,
+    'cycles': 3,
+    'duty_cycle': 0.5,
+    'running': 0.1,
+    'challenged': 0.0,
+    'tags': {'': 1, 'rhel': 2, 'openshift': 1, 'rhel,openshift': 1},
+    'vcpu': {1: 4, 2: 2, 4: 1},
+    'memory': {1: 4, 2: 2, 4: 1},
+}
+"""The spec of a dataset, any key given to :class:`Dataset` overrides these.
+
+* ``accounts``: How many cloud accounts.
+* ``images``: How many images each account has.
+* ``instances``: How many instances each account has, each running one of the
+  images of its account.
+* ``days``: How many days before the reference time the events span.
+* ``cycles``: How many times each instance is powered on and off.
+* ``duty_cycle``: The average fraction of the time instances are on.
+* ``running``: The fraction of instances left running, without a last power
+  off event.
+* ``challenged``: The fraction of images whose tags were challenged by the
+  user, which removes the challenged tags from the reports.
+* ``tags``, ``vcpu`` and ``memory``: Weights of the image types, in the
+  format taken by :func:`integrade.injector.inject_instance_data`, and of the
+  vCPU count and GB of memory of the instances.
+"""
+
+
+def _weighted(rng, weights):
+    """Pick a key of ``weights`` with probability proportional to its value."""
+    keys = list(weights)
+    return rng.choices(keys, [weights[key] for key in keys])[0]
+
+
+class Dataset(object):
+    """A reproducible graph of accounts, images, instances and events.
+
+    :param spec: A dictionary overriding keys of :data:`DEFAULT_SPEC`.
+    :param seed: The random seed.
+    :param now: The reference time, a datetime or a timestamp. Every event
+        happens in the ``days`` before it. Defaults to the start of the
+        current hour, pass it explicitly to get the exact same events on
+        every run.
+    """
+
+    def __init__(self, spec=None, seed=0, now=None):
+        """Generate the accounts and images, instances are generated lazily."""
+        self.spec = dict(DEFAULT_SPEC, **(spec or {}))
+        unknown = set(self.spec) - set(DEFAULT_SPEC)
+        if unknown:
+            raise ValueError(
+                'Unknown dataset spec keys: {}'.format(
+                    ', '.join(sorted(unknown))))
+        self.seed = seed
+        self.now = utc_timestamp(now)
+        if now is None:
+            self.now -= self.now % (60 * 60)
+        self._runs = {}
+        self.accounts = [
+            self._account(i) for i in range(self.spec['accounts'])]
+
+    def _rng(self, *path):
+        """Return a random generator for one part of the dataset.
+
+        Each account, image and instance gets its own generator, so any one
+        of them can be generated without generating the ones before it.
+        """
+        return random.Random('/'.join(str(p) for p in (self.seed,) + path))
+
+    def _account(self, index):
+        """Generate an account and its images."""
+        rng = self._rng('account', index)
+        aws_account_id = str(rng.randint(100000000000, 999999999999))
+        images = []
+        for i in range(self.spec['images']):
+            image_type = _weighted(rng, self.spec['tags'])
+            challenged = rng.random() < self.spec['challenged']
+            images.append({
+                'ec2_ami_id': 'ami-{:017x}'.format(rng.getrandbits(68)),
+                'image_type': image_type,
+                'challenged': challenged,
+                'tags': tuple(
+                    tag for tag in TAGS
+                    if tag in image_type and not challenged
+                ),
+            })
+        return {
+            'index': index,
+            'name': f'dataset-{self.seed}-{index}',
+            'aws_account_id': aws_account_id,
+            'images': images,
+        }
+
+    def instance(self, account, index):
+        """Generate the instance ``index`` of ``account``.
+
+        :returns: A dictionary accepted by
+            :func:`integrade.injector.inject_bulk_instance_data`, whose
+            ``events`` are timezone aware datetimes.
+        """
+        spec = self.spec
+        rng = self._rng('instance', account['index'], index)
+        image = rng.choice(account['images'])
+        span = spec['days'] * DAY
+        slot = span // spec['cycles']
+        first = self.now - span
+        events = []
+        for cycle in range(spec['cycles']):
+            length = int(slot * spec['duty_cycle'] * rng.uniform(0.5, 1.5))
+            length = max(1, min(slot - 1, length))
+            on = first + cycle * slot + rng.randrange(slot - length)
+            events += [on, on + length]
+        if rng.random() < spec['running']:
+            events.pop()
+        return {
+            'instance_id': 'i-{:017x}'.format(rng.getrandbits(68)),
+            'ec2_ami_id': image['ec2_ami_id'],
+            'image_type': image['image_type'],
+            'challenged': image['challenged'],
+            'vcpu': _weighted(rng, spec['vcpu']),
+            'memory': _weighted(rng, spec['memory']),
+            'events': [
+                datetime.fromtimestamp(e, timezone.utc) for e in events],
+        }
+
+    def instances(self, account):
+        """Yield every instance of ``account``."""
+        for index in range(self.spec['instances']):
+            yield self.instance(account, index)
+
+    def inject(self, user_id, batch_size=500):
+        """Inject the whole dataset for the user with ID ``user_id``.
+
+        Instances are generated and injected a batch at a time.
+
+        :returns: The injected cloud accounts, as returned by
+            :func:`integrade.injector.inject_aws_cloud_account`, in the same
+            order as :attr:`accounts`.
+        """
+        injected = []
+        for account in self.accounts:
+            cloud_account = injector.inject_aws_cloud_account(
+                user_id,
+                name=account['name'],
+                aws_account_number=account['aws_account_id'],
+                acct_age=self.spec['days'] + 1,
+            )
+            instances = self.instances(account)
+            while True:
+                batch = list(itertools.islice(instances, batch_size))
+                if not batch:
+                    break
+                injector.inject_bulk_instance_data(
+                    cloud_account['id'], batch, batch_size)
+            injected.append(cloud_account)
+        return injected
+
+    def runs(self, now=None):
+        """Return the runs of every instance of the dataset.
+
+        :param now: When instances still running are considered to have last
+            run. Defaults to the reference time of the dataset.
+        :returns: A :class:`integrade.oracle.Runs`, whose instances are in the
+            order of :meth:`instances` of each account in turn.
+        """
+        now = self.now if now is None else utc_timestamp(now)
+        if now not in self._runs:
+            instances = []
+            self._instance_account = []
+            self._instance_image = []
+            for account in self.accounts:
+                for instance in self.instances(account):
+                    instances.append(instance)
+                    self._instance_account.append(account['index'])
+                    self._instance_image.append(instance['ec2_ami_id'])
+            self._runs[now] = oracle.Runs.from_instances(instances, now)
+        return self._runs[now]
+
+    def index(self, by=None, now=None):
+        """Return an :class:`integrade.oracle.IntervalIndex` of the runs.
+
+        :param by: Either ``'tag'``, ``'account'`` or ``'image'`` to group the
+            runs by tag, AWS account ID or AMI ID, or None for a single group.
+        :param now: See :meth:`runs`.
+        """
+        runs = self.runs(now)
+        if by == 'account':
+            ids = [account['aws_account_id'] for account in self.accounts]
+            by = [ids[index] for index in self._instance_account]
+        elif by == 'image':
+            by = self._instance_image
+        elif by not in (None, 'tag'):
+            raise ValueError(f'Cannot group runs by {by!r}.')
+        return runs.index(by)
+
+    def expected_daily_usage(self, start, end, now=None):
+        """Return the instances report expected for ``[start, end)``.
+
+        :param start: The start of the report, at midnight UTC.
+        :param end: The end of the report.
+        :param now: When instances still running are considered to have last
+            run. Defaults to the reference time of the dataset, pass the time
+            of the request for datasets with running instances.
+        """
+        return self.runs(now).daily_usage(start, end)
+
+    def _seen(self, start, end, now):
+        """Return the runs and the runtime of each instance in the window."""
+        runs = self.runs(now)
+        return runs, runs.runtime(start, end)
+
+    def expected_accounts(self, start, end, now=None):
+        """Return the accounts report totals expected for ``[start, end)``.
+
+        See :meth:`expected_daily_usage` for the parameters.
+
+        :returns: A dictionary mapping the AWS account ID of every account to
+            its number of ``images`` and ``instances`` that ran in the window,
+            and the number of instances, runtime, memory and vCPU seconds of
+            each tag.
+        """
+        runs, seconds = self._seen(start, end, now)
+        accounts = np.array(self._instance_account)
+        images = np.array(self._instance_image)
+        totals = {}
+        for account in self.accounts:
+            seen = (seconds > 0) & (accounts == account['index'])
+            total = {
+                'images': len(np.unique(images[seen])),
+                'instances': int(seen.sum()),
+            }
+            for tag in TAGS:
+                tagged = seen & runs.tags[tag]
+                total.update({
+                    f'{tag}_instances': int(tagged.sum()),
+                    f'{tag}_runtime_seconds': float(seconds[tagged].sum()),
+                    f'{tag}_memory_seconds': float(
+                        (seconds * runs.memory)[tagged].sum()),
+                    f'{tag}_vcpu_seconds': float(
+                        (seconds * runs.vcpu)[tagged].sum()),
+                })
+            totals[account['aws_account_id']] = total
+        return totals
+
+    def expected_images(self, account, start, end, now=None):
+        """Return the images report totals of ``account`` for ``[start, end)``.
+
+        See :meth:`expected_daily_usage` for the parameters.
+
+        :returns: A dictionary mapping the AMI ID of every image that ran in
+            the window to its ``rhel`` and ``openshift`` flags, the number of
+            ``instances_seen`` and its ``runtime_seconds``.
+        """
+        runs, seconds = self._seen(start, end, now)
+        seen = (seconds > 0) & (
+            np.array(self._instance_account) == account['index'])
+        tags = {i['ec2_ami_id']: i['tags'] for i in account['images']}
+        images = {}
+        for index in np.flatnonzero(seen):
+            ec2_ami_id = self._instance_image[index]
+            total = images.setdefault(ec2_ami_id, {
+                'rhel': 'rhel' in tags[ec2_ami_id],
+                'openshift': 'openshift' in tags[ec2_ami_id],
+                'instances_seen': 0,
+                'runtime_seconds': 0.0,
+            })
+            total['instances_seen'] += 1
+            total['runtime_seconds'] += float(seconds[index])
+        return images
@@ -48,3 +48,14 @@ class EventTimeoutError(Exception):
     Raise this error if the timeout is exceeded while waiting for an event to
     occur.
     """
+
+
+class RemoteResultTooLarge(Exception):
+    """The result of code run in the cloudigrade pod is too large.
+
+    Results are capped so a query returning much more than expected fails
+    quickly instead of exhausting memory. Return less data, for example by
+    filtering the query, or raise the limit with the ``max_size`` argument of
+    :func:`integrade.injector.run_remote_python` or
+    $INTEGRADE_REMOTE_MAX_BYTES.
+    """
@@ -1,53 +1,261 @@
 """Utilities to help interact with the remote environment."""
+import io
 import pickle
+import struct
 import subprocess
+import sys
+import threading
+import zlib
 from random import randint
 from shutil import which
 from textwrap import dedent, indent
 
-from integrade import config
+from integrade import config, tracing
+from integrade.exceptions import RemoteResultTooLarge
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Results of remote code are sent back after this marker, followed by a byte
+# naming their compression and by length prefixed frames ending with an empty
+# frame. Anything printed by the remote code before it is ignored.
+RESULT_MARKER = b'\x00INTEGRADE-RESULT\x00'
+FRAME_HEADER = struct.Struct('>I')
+CODECS = {b'n': 'none', b'g': 'gzip', b'z': 'zstd'}
+
+_SEND_RESULT = """
+def _send_result(value, codec, marker, chunk_size=64 * 1024):
+    # Django's shell execs the script inside a function, where the names the
+    # wrapper imports are locals this function cannot see.
+    import io, pickle, struct, sys, zlib
+    out = sys.stdout.buffer
+    compressor = None
+    if codec == 'zstd':
+        try:
+            import zstandard
+            compressor = zstandard.ZstdCompressor().compressobj()
+        except ImportError:
+            codec = 'gzip'
+    if codec == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    elif codec != 'zstd':
+        codec = 'none'
+
+    def frame(data):
+        if data:
+            out.write(struct.pack('>I', len(data)))
+            out.write(data)
+
+    class Framer(io.RawIOBase):
+        def writable(self):
+            return True
+
+        def write(self, data):
+            size = len(data)
+            data = bytes(data)
+            frame(compressor.compress(data) if compressor else data)
+            return size
+
+    sys.stdout.flush()
+    out.write(marker + codec[0].encode())
+    writer = io.BufferedWriter(Framer(), chunk_size)
+    pickle.dump(value, writer, protocol=4)
+    writer.flush()
+    if compressor:
+        frame(compressor.flush())
+    out.write(struct.pack('>I', 0))
+    out.flush()
+"""
+
+_GET_OR_CREATE_IMAGE = """
+def get_or_create_image(acct, ec2_ami_id, image_type, challenged=False,
+                        owner_aws_account_id=None):
+    # Imported here for the same reason as in _send_result.
+    import json
+    from account.models import AwsMachineImage
+    return AwsMachineImage.objects.get_or_create(
+        ec2_ami_id=ec2_ami_id,
+        defaults=dict(
+            owner_aws_account_id=owner_aws_account_id or acct.aws_account_id,
+            status=AwsMachineImage.INSPECTED,
+            inspection_json=json.dumps(
+                {"rhel_release_files_found": 'rhel' in image_type}),
+            openshift_detected='openshift' in image_type,
+            rhel_challenged=(challenged and 'rhel' in image_type),
+            openshift_challenged=(challenged and 'openshift' in image_type),
+            platform='none',
+        )
+    )[0]
+"""
+
 
+class _ResultReader(io.RawIOBase):
+    """Decode the framed, compressed result written by remote code.
 
-def run_remote_python(script, **kwargs):
-    """Run Python code inside the remote OpenShift pod."""
+    :param stream: The stdout of the remote process.
+    :param max_size: The largest result, in uncompressed bytes, to accept.
+    """
+
+    def __init__(self, stream, max_size):
+        """Start reading after the result marker, if there is one."""
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+        self.pending = b''
+        self.done = False
+        self.found = self._skip_to_marker()
+        if self.found:
+            codec = CODECS.get(self.stream.read(1))
+            if codec == 'gzip':
+                self.decompressor = zlib.decompressobj(31)
+            elif codec == 'zstd':
+                if zstandard is None:
+                    raise RuntimeError(
+                        'Install the zstandard package to read zstd '
+                        'compressed remote results.')
+                self.decompressor = (
+                    zstandard.ZstdDecompressor().decompressobj())
+            elif codec == 'none':
+                self.decompressor = None
+            else:
+                raise RuntimeError('Unknown remote result compression.')
+
+    def _skip_to_marker(self):
+        """Consume the stream up to the marker, return whether it was found."""
+        window = b''
+        while True:
+            byte = self.stream.read(1)
+            if not byte:
+                return False
+            window = (window + byte)[-len(RESULT_MARKER):]
+            if window == RESULT_MARKER:
+                return True
+
+    def _read_exactly(self, size):
+        """Read ``size`` bytes, the result is truncated if there are less."""
+        data = self.stream.read(size)
+        while len(data) < size:
+            more = self.stream.read(size - len(data))
+            if not more:
+                raise EOFError('The remote result was truncated.')
+            data += more
+        return data
+
+    def _check_size(self, size):
+        """Raise if ``size`` more bytes would make the result too large."""
+        if self.size + size > self.max_size:
+            raise RemoteResultTooLarge(
+                f'The remote result is larger than {self.max_size} bytes. '
+                'Return less data or raise the limit with max_size or '
+                '$INTEGRADE_REMOTE_MAX_BYTES.')
+
+    def _next_frame(self):
+        """Decompress the next frame into the pending data."""
+        size, = FRAME_HEADER.unpack(self._read_exactly(FRAME_HEADER.size))
+        if size == 0:
+            self.done = True
+            data = self.decompressor.flush() if self.decompressor else b''
+        elif self.decompressor:
+            data = self.decompressor.decompress(self._read_exactly(size))
+        else:
+            # Uncompressed frames are as large as they say, check that
+            # before reading them in memory.
+            self._check_size(size)
+            data = self._read_exactly(size)
+        self._check_size(len(data))
+        self.size += len(data)
+        self.pending = memoryview(data)
+
+    def readable(self):
+        """Tell the buffered reader wrapping us that we can be read."""
+        return True
+
+    def readinto(self, buffer):
+        """Fill ``buffer`` with the next decompressed bytes."""
+        while not self.pending:
+            if self.done:
+                return 0
+            self._next_frame()
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def load(self):
+        """Unpickle the result as its frames arrive."""
+        return pickle.load(io.BufferedReader(self, 64 * 1024))
+
+
+def _remote_command(container_name):
+    """Return the command running a Django shell in the cloudigrade pod."""
+    return [
+        'sh',
+        '-c',
+        f'oc rsh -c {container_name} $(oc get pods'
+        ' -o jsonpath="{.items[*].metadata.name}" -l'
+        f' name={container_name})'
+        ' scl enable rh-python36'
+        ' -- python -W ignore manage.py shell'
+    ]
+
+
+def run_remote_python(script, timeout=None, max_size=None, compression=None,
+                      **kwargs):
+    """Run Python code inside the remote OpenShift pod.
+
+    The keyword arguments are available as global variables to the code,
+    which can return any picklable value. The value is streamed back in
+    compressed frames and unpickled as it arrives, so large results neither
+    need to fit in a pipe buffer nor be held twice in memory.
+
+    :param timeout: How many seconds the code may take. Defaults to
+        ``cfg['remote_timeout']``.
+    :param max_size: The largest result, in bytes once uncompressed, to
+        accept. Defaults to ``cfg['remote_max_result_size']``.
+    :param compression: Either ``gzip``, ``zstd`` or ``none``. Defaults to
+        ``cfg['remote_compression']``. zstd falls back to gzip if the
+        zstandard package is missing on either side.
+    :raises subprocess.TimeoutExpired: If the code takes too long.
+    :raises integrade.exceptions.RemoteResultTooLarge: If the result is
+        larger than ``max_size``.
+    """
     script = dedent(script).strip()
 
-    openshift_prefix = config.get_config()['openshift_prefix']
+    cfg = config.get_config()
+    openshift_prefix = cfg['openshift_prefix']
     if openshift_prefix:
         container_name = f'{openshift_prefix}a'
     else:
         raise RuntimeError('Unable to determine openshift prefix!')
+    if timeout is None:
+        timeout = cfg.get('remote_timeout', 60)
+    if max_size is None:
+        max_size = cfg.get('remote_max_result_size', 256 * 1024 * 1024)
+    if compression is None:
+        compression = cfg.get('remote_compression', 'gzip')
+    if compression == 'zstd' and zstandard is None:
+        compression = 'gzip'
 
     data = pickle.dumps(kwargs)
     wrap_start = 'import pickle as _pickle;import sys as _sys;\n' \
         f'globals().update(_pickle.loads({repr(data)}))\n' \
         'def _codewrapper():\n'
-    wrap_end = '\n_retval = _codewrapper()\n' \
-        '_sys.stdout.buffer.write(_pickle.dumps(_retval))\n'
+    wrap_end = '\n_retval = _codewrapper()\n' + _SEND_RESULT + \
+        f'_send_result(_retval, {compression!r}, {RESULT_MARKER!r})\n'
     script = wrap_start + indent(script, '  ') + wrap_end
     script = script.encode('utf8')
 
     if which('oc'):
-        result = subprocess.run(['sh',
-                                 '-c',
-                                 f'oc rsh -c {container_name} $(oc get pods'
-                                 ' -o jsonpath="{.items[*].metadata.name}" -l'
-                                 f' name={container_name})'
-                                 ' scl enable rh-python36'
-                                 ' -- python -W ignore manage.py shell'],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                input=script,
-                                timeout=60
-                                )
-        if result.returncode != 0:
-            for line in result.stdout:
-                print(line)
-            raise RuntimeError(
-                f'Remote script failed (container_name="{container_name}"'
-            )
-        elif result.stdout:
-            return pickle.loads(result.stdout)
+        # Tag the span with the helper calling us, like inject_instance_data,
+        # so the trace shows which remote operations are slow.
+        caller = sys._getframe(1).f_code.co_name
+        with tracing.span('run_remote_python', 'remote', caller=caller):
+            return _run(
+                _remote_command(container_name), script, container_name,
+                timeout, max_size)
     else:
         raise EnvironmentError(
             'Must have access to the cloudigrade openshift pod via the "oc"'
@@ -57,6 +265,65 @@ def run_remote_python(script, **kwargs):
         )
 
 
+def _run(command, script, container_name, timeout, max_size):
+    """Run ``command`` with ``script`` as input and read back its result."""
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    def feed():
+        try:
+            process.stdin.write(script)
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            # The process died or was killed, which is reported below.
+            pass
+
+    stderr = []
+    threads = [
+        threading.Thread(target=feed, daemon=True),
+        threading.Thread(
+            target=lambda: stderr.append(process.stderr.read()),
+            daemon=True),
+    ]
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    for thread in threads:
+        thread.start()
+    try:
+        reader = _ResultReader(process.stdout, max_size)
+        result = reader.load() if reader.found else None
+    except RemoteResultTooLarge:
+        process.kill()
+        raise
+    except (EOFError, pickle.UnpicklingError):
+        if not timed_out.is_set() and process.wait() == 0:
+            raise
+        result = None
+    finally:
+        returncode = process.wait()
+        timer.cancel()
+        for thread in threads:
+            thread.join()
+        process.stdout.close()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout)
+    if returncode != 0:
+        print(b''.join(stderr).decode('utf8', 'replace'))
+        raise RuntimeError(
+            f'Remote script failed (container_name="{container_name}"'
+        )
+    return result
+
+
 def direct_count_images(acct_id=None):
     """Count the number of images in an account directly."""
     return run_remote_python("""
@@ -88,6 +355,132 @@ def clear_images(acct_id=None):
         """, **locals())
 
 
+def query_instances(acct_id):
+    """Return the instances of an account as columns.
+
+    Like the other ``query_`` helpers, this runs a single ``values_list``
+    query in the pod and returns compact columns instead of a dictionary per
+    row. Numeric columns are :class:`array.array`, which can be turned into
+    NumPy arrays with ``numpy.asarray``. Rows are in the same order in every
+    column.
+
+    :returns: A dictionary with the database ``id`` and the
+        ``ec2_instance_id`` of every instance, ordered by ``id``.
+    """
+    return run_remote_python("""
+        from array import array
+        from account.models import AwsInstance
+
+        rows = AwsInstance.objects.filter(
+            account_id=acct_id,
+        ).order_by('id').values_list('id', 'ec2_instance_id')
+        columns = {'id': array('q'), 'ec2_instance_id': []}
+        for id, ec2_instance_id in rows.iterator():
+            columns['id'].append(id)
+            columns['ec2_instance_id'].append(ec2_instance_id)
+        return columns
+        """, acct_id=acct_id)
+
+
+def query_account_events(acct_id):
+    """Return every instance event of an account as columns.
+
+    See :func:`query_instances` for the format.
+
+    :returns: A dictionary with, for every event ordered by instance and
+        time, its ``instance_id`` and ``image_id`` in the database, -1 if it
+        has no image, when it ``occurred_at`` in seconds since the epoch,
+        whether it is a ``power_on`` event and its ``instance_type``, as an
+        index in the ``instance_types`` list.
+    """
+    return run_remote_python("""
+        from array import array
+        from account.models import AwsInstanceEvent
+
+        rows = AwsInstanceEvent.objects.filter(
+            instance__account_id=acct_id,
+        ).order_by('instance_id', 'occurred_at').values_list(
+            'instance_id',
+            'machineimage_id',
+            'occurred_at',
+            'event_type',
+            'instance_type',
+        )
+        columns = {
+            'instance_id': array('q'),
+            'image_id': array('q'),
+            'occurred_at': array('q'),
+            'power_on': array('b'),
+            'instance_type': array('h'),
+        }
+        instance_types = {}
+        for instance_id, image_id, occurred_at, event_type, instance_type in (
+                rows.iterator()):
+            columns['instance_id'].append(instance_id)
+            columns['image_id'].append(-1 if image_id is None else image_id)
+            columns['occurred_at'].append(int(occurred_at.timestamp()))
+            columns['power_on'].append(event_type == 'power_on')
+            columns['instance_type'].append(
+                instance_types.setdefault(instance_type, len(instance_types)))
+        columns['instance_types'] = list(instance_types)
+        return columns
+        """, acct_id=acct_id)
+
+
+def query_images(acct_id=None):
+    """Return the images used by an account, or every image, as columns.
+
+    See :func:`query_instances` for the format.
+
+    :returns: A dictionary with, for every image ordered by ``id``, its
+        database ``id``, its ``ec2_ami_id``, its inspection ``status``, as an
+        index in the ``statuses`` list, whether RHEL release files or
+        OpenShift were detected and whether the user challenged either tag.
+    """
+    return run_remote_python("""
+        from array import array
+        import json
+        from account.models import AwsMachineImage
+
+        images = AwsMachineImage.objects.all()
+        if acct_id:
+            images = images.filter(
+                instanceevent__instance__account_id=acct_id).distinct()
+        rows = images.order_by('id').values_list(
+            'id',
+            'ec2_ami_id',
+            'status',
+            'inspection_json',
+            'openshift_detected',
+            'rhel_challenged',
+            'openshift_challenged',
+        )
+        columns = {
+            'id': array('q'),
+            'ec2_ami_id': [],
+            'status': array('b'),
+            'rhel_detected': array('b'),
+            'openshift_detected': array('b'),
+            'rhel_challenged': array('b'),
+            'openshift_challenged': array('b'),
+        }
+        statuses = {}
+        for row in rows.iterator():
+            columns['id'].append(row[0])
+            columns['ec2_ami_id'].append(row[1])
+            columns['status'].append(
+                statuses.setdefault(row[2], len(statuses)))
+            inspection = json.loads(row[3]) if row[3] else {}
+            columns['rhel_detected'].append(
+                bool(inspection.get('rhel_release_files_found')))
+            columns['openshift_detected'].append(bool(row[4]))
+            columns['rhel_challenged'].append(bool(row[5]))
+            columns['openshift_challenged'].append(bool(row[6]))
+        columns['statuses'] = list(statuses)
+        return columns
+        """, acct_id=acct_id)
+
+
 def inject_aws_cloud_account(user_id,
                              name=None,
                              aws_account_number=None,
@@ -165,12 +558,11 @@ def inject_instance_data(
         instance_id = str(randint(100000, 999999999999))
     if ec2_ami_id is None:
         ec2_ami_id = str(randint(100000, 999999999999))
-    return run_remote_python("""
+    return run_remote_python(_GET_OR_CREATE_IMAGE + dedent("""
     from datetime import date, timedelta
-    import json
 
     from account.models import Account, AwsInstance, AwsInstanceEvent
-    from account.models import AwsMachineImage, AwsEC2InstanceDefinitions
+    from account.models import AwsEC2InstanceDefinitions
 
     instance_type = 'xx.fake-' + str(vcpu) + '-' + str(memory)
 
@@ -183,23 +575,8 @@ def inject_instance_data(
     )
 
     acct = Account.objects.get_or_create(id=acct_id)[0]
-    rhel_detected = True if 'rhel' in image_type else False
-    image1 = AwsMachineImage.objects.get_or_create(
-        ec2_ami_id=ec2_ami_id,
-
-        defaults=dict(
-            owner_aws_account_id=owner_aws_account_id or acct.aws_account_id,
-            status=AwsMachineImage.INSPECTED,
-            inspection_json=json.dumps(
-                {"rhel_release_files_found": rhel_detected}),
-            openshift_detected=True if 'openshift' in image_type else False,
-
-            rhel_challenged=(challenged and 'rhel' in image_type),
-            openshift_challenged=(challenged and 'openshift' in image_type),
-
-            platform='none',
-        )
-    )[0]
+    image1 = get_or_create_image(
+        acct, ec2_ami_id, image_type, challenged, owner_aws_account_id)
     instance1 = AwsInstance.objects.get_or_create(
         ec2_instance_id=instance_id,
 
@@ -229,7 +606,150 @@ def inject_instance_data(
         'image_id': image1.id,
         'instance_id': instance1.id,
     }
-    """, **locals())
+    """), **locals())
+
+
+def inject_bulk_instance_data(acct_id, instances, batch_size=500):
+    """Inject many instances, their images and events in few remote calls.
+
+    Each item of ``instances`` is a dictionary with the arguments accepted by
+    :func:`inject_instance_data`, except ``acct_id``: ``image_type`` and
+    ``events`` are required, ``instance_id``, ``ec2_ami_id``,
+    ``owner_aws_account_id``, ``challenged``, ``vcpu`` and ``memory`` are
+    optional. Instances sharing an ``ec2_ami_id`` share an image.
+
+    Instead of one remote call per instance, instances are injected in
+    batches of ``batch_size``, each in a single remote call and database
+    transaction. Within a batch, instances and events are bulk inserted, a
+    few statements per table whatever the number of rows, even though
+    Django's ``bulk_create`` does not support their multi-table inherited
+    models. This is what makes datasets of thousands of instances practical
+    to build.
+
+    :returns: A list with an ``{'image_id', 'instance_id'}`` dictionary for
+        each instance, in the same order as ``instances``.
+    """
+    instances = [dict(instance) for instance in instances]
+    for instance in instances:
+        if instance.get('instance_id') is None:
+            instance['instance_id'] = str(randint(100000, 999999999999))
+        if instance.get('ec2_ami_id') is None:
+            instance['ec2_ami_id'] = str(randint(100000, 999999999999))
+    results = []
+    for i in range(0, len(instances), batch_size):
+        batch = instances[i:i + batch_size]
+        results.extend(run_remote_python(_GET_OR_CREATE_IMAGE + dedent("""
+        from datetime import date, timedelta
+
+        from django.db import transaction
+
+        from account.models import Account, AwsInstance, AwsInstanceEvent
+        from account.models import AwsEC2InstanceDefinitions
+
+        def bulk_create(model, objs):
+            # Django can't bulk create multi-table inherited models. Bulk
+            # create the rows of their parent tables first, which gets their
+            # IDs back from PostgreSQL, then bulk insert the rows of their
+            # own table pointing to them.
+            if not objs:
+                return
+            if not model._meta.parents:
+                model.objects.bulk_create(objs)
+                return
+            for parent, link in model._meta.parents.items():
+                rows = [
+                    parent(**{
+                        field.attname: getattr(obj, field.attname)
+                        for field in parent._meta.concrete_fields
+                    })
+                    for obj in objs
+                ]
+                bulk_create(parent, rows)
+                for obj, row in zip(objs, rows):
+                    setattr(obj, parent._meta.pk.attname, row.pk)
+                    setattr(obj, link.attname, row.pk)
+            using = model.objects.db
+            model._base_manager._insert(
+                objs, fields=model._meta.local_concrete_fields, using=using)
+            for obj in objs:
+                obj._state.adding = False
+                obj._state.db = using
+
+        acct = Account.objects.get(id=acct_id)
+        today = date.today()
+
+        with transaction.atomic():
+            instance_types = []
+            definitions = {}
+            for item in batch:
+                vcpu = item.get('vcpu', 1)
+                memory = item.get('memory', 1)
+                instance_type = 'xx.fake-' + str(vcpu) + '-' + str(memory)
+                instance_types.append(instance_type)
+                definitions[instance_type] = dict(memory=memory, vcpu=vcpu)
+            for instance_type, defaults in definitions.items():
+                AwsEC2InstanceDefinitions.objects.get_or_create(
+                    instance_type=instance_type,
+                    defaults=defaults,
+                )
+
+            images = {}
+            for item in batch:
+                if item['ec2_ami_id'] not in images:
+                    images[item['ec2_ami_id']] = get_or_create_image(
+                        acct,
+                        item['ec2_ami_id'],
+                        item['image_type'],
+                        item.get('challenged', False),
+                        item.get('owner_aws_account_id'),
+                    )
+
+            instances = {
+                instance.ec2_instance_id: instance
+                for instance in AwsInstance.objects.filter(
+                    ec2_instance_id__in=[
+                        item['instance_id'] for item in batch])
+            }
+            new_instances = []
+            for item in batch:
+                if item['instance_id'] not in instances:
+                    instance = AwsInstance(
+                        ec2_instance_id=item['instance_id'],
+                        account=acct,
+                        region='us-east1',
+                    )
+                    instances[item['instance_id']] = instance
+                    new_instances.append(instance)
+            bulk_create(AwsInstance, new_instances)
+
+            events = []
+            for item, instance_type in zip(batch, instance_types):
+                on = False
+                for event in item['events']:
+                    if isinstance(event, int):
+                        when = today - timedelta(days=event)
+                    else:
+                        when = event
+                    events.append(AwsInstanceEvent(
+                        event_type='power_on' if not on else 'power_off',
+                        machineimage=images[item['ec2_ami_id']],
+                        instance=instances[item['instance_id']],
+                        instance_type=instance_type,
+                        occurred_at=when,
+                        created_at=when,
+                    ))
+                    on = not on
+            bulk_create(AwsInstanceEvent, events)
+
+        return [
+            {
+                'image_id': images[item['ec2_ami_id']].id,
+                'instance_id': instances[item['instance_id']].id,
+            }
+            for item in batch
+        ]
+        """), acct_id=acct_id, batch=batch))
+    return results
 
 
 def make_super_user(username, password):
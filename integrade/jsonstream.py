@@ -0,0 +1,132 @@
+"""Incrementally decode the items of a list in a JSON document.
+
+The list and report endpoints wrap their data in a top level object, like
+``{"count": 2, "results": [{...}, {...}]}`` or ``{"daily_usage": [...]}``.
+:func:`iter_items` yields the items of one of those lists as soon as each item
+has been received, without ever holding the whole document in memory, so
+memory use is bounded by the size of the largest single item.
+"""
+import codecs
+import json
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_NUMBER = '0123456789.eE+-'
+
+
+class _Buffer(object):
+    """Text read so far from an iterable of chunks, consumed from the left."""
+
+    def __init__(self, chunks):
+        """Start reading from ``chunks``, which may be bytes or text."""
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=1):
+        """Read chunks until at least ``size`` unconsumed characters or EOF.
+
+        :returns: False if the end of the chunks was already reached.
+        """
+        if self.eof:
+            return False
+        pieces = [self.text[self.pos:]]
+        available = len(pieces[0])
+        while available < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+                pieces.append(self.decoder.decode(b'', final=True))
+                break
+            if isinstance(chunk, bytes):
+                chunk = self.decoder.decode(chunk)
+            pieces.append(chunk)
+            available += len(chunk)
+        self.text = ''.join(pieces)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non whitespace character, or '' at the end."""
+        while True:
+            while (self.pos < len(self.text) and
+                   self.text[self.pos] in _WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, *chars):
+        """Consume the next non whitespace character, which must be in chars.
+
+        :returns: The consumed character.
+        :raises ValueError: If the next character is not one of ``chars``.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f'Expected one of {chars!r} but found {char!r} in JSON.')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode and consume the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value, read at least as much again as we have
+                # so large values are not re-decoded once per chunk.
+                if not self.fill(2 * (len(self.text) - self.pos) + 1):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next
+            # chunk, like "6.5e" followed by "3", every other value knows
+            # where it ends.
+            if (isinstance(value, (int, float)) and
+                    not isinstance(value, bool) and not self.eof and
+                    not self.text[end:].lstrip(_NUMBER)):
+                self.fill(len(self.text) - self.pos + 1)
+                continue
+            self.pos = end
+            return value
+
+
+def iter_items(chunks, key, others=None):
+    """Yield the items of the list under ``key`` in a top level JSON object.
+
+    :param chunks: An iterable of bytes or text making up the JSON document,
+        like ``response.iter_content(chunk_size)``.
+    :param key: The top level key of the list, like ``results``.
+    :param others: An optional dictionary, filled in with every other top
+        level value, like ``count``, as they are decoded. Values after the
+        list are only available once every item has been consumed.
+    :raises ValueError: If the document is not a JSON object or the value
+        under ``key`` is not a list.
+    """
+    buf = _Buffer(chunks)
+    buf.expect('{')
+    if buf.peek() == '}':
+        return
+    while True:
+        name = buf.value()
+        buf.expect(':')
+        if name == key:
+            if buf.peek() != '[':
+                raise ValueError(f'The value of {key!r} is not a list.')
+            buf.expect('[')
+            if buf.peek() == ']':
+                buf.expect(']')
+            else:
+                while True:
+                    yield buf.value()
+                    if buf.expect(',', ']') == ']':
+                        break
+        else:
+            value = buf.value()
+            if others is not None:
+                others[name] = value
+        if buf.expect(',', '}') == '}':
+            return
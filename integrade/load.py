@@ -0,0 +1,414 @@
+"""Generate load against the cloudigrade API.
+
+Many virtual users run concurrently, each logging in and then repeatedly
+running scenarios picked at random according to their weights, until the run
+is over. Users are started one by one over a ramp up period. At the end a
+report with the throughput, the latency percentiles of every endpoint and the
+error rate of every scenario is produced.
+
+Run it with ``python -m integrade.load`` or ``integrade-load``, for example::
+
+    integrade-load --users 50 --ramp 60 --duration 300 \
+        --scenario report_accounts=10 --output load.json
+
+The same configuration used by the functional tests (see
+:mod:`integrade.config`) tells where cloudigrade is. By default every virtual
+user logs in as the configured super user, use ``--user`` to log in as other
+users instead. When ``CLOUDIGRADE_TOKEN`` is set, no super user is created, so
+its credentials must be set with ``CLOUDIGRADE_USER`` and
+``CLOUDIGRADE_PASSWORD``, or other users given with ``--user``.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import click
+
+from integrade import api, config
+from integrade.tests import urls
+from integrade.utils import DAY, day_start, format_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+class SkipScenario(Exception):
+    """Raised by a scenario which can not run for the virtual user yet."""
+
+
+def _time_range(offset):
+    """Return the start and end of a 30 day report window ending on offset."""
+    end = day_start(days=1 + offset)
+    return {
+        'start': format_timestamp(end - 30 * DAY),
+        'end': format_timestamp(end),
+    }
+
+
+def _rolling_range():
+    """Return a report window ending up to a year ago, like users browsing."""
+    return _time_range(-random.randint(0, 365))
+
+
+def login(client, user):
+    """Log in, like a user opening the UI."""
+    return client.post(urls.AUTH_TOKEN_CREATE, {
+        'username': user['username'],
+        'password': user['password'],
+    })
+
+
+def list_accounts(client, user):
+    """List the cloud accounts of the user, remembering their IDs."""
+    response = client.get(urls.CLOUD_ACCOUNT, auth=user['auth'])
+    if response.status_code == 200:
+        user['account_ids'] = [
+            account['id'] for account in response.json()['results']]
+    return response
+
+
+def report_accounts(client, user):
+    """Fetch the accounts report for a rolling date range."""
+    return client.get(
+        urls.REPORT_ACCOUNTS, params=_rolling_range(), auth=user['auth'])
+
+
+def report_images(client, user):
+    """Fetch the images report of one of the user's accounts."""
+    if not user.get('account_ids'):
+        raise SkipScenario('no account of the user is known')
+    params = _rolling_range()
+    params['account_id'] = random.choice(user['account_ids'])
+    return client.get(urls.REPORT_IMAGES, params=params, auth=user['auth'])
+
+
+def report_instances(client, user):
+    """Fetch the instances report for a rolling date range."""
+    return client.get(
+        urls.REPORT_INSTANCES, params=_rolling_range(), auth=user['auth'])
+
+
+def list_images(client, user):
+    """List the images seen by the user."""
+    return client.get(urls.IMAGE, auth=user['auth'])
+
+
+SCENARIOS = {
+    'login': (login, 1),
+    'list_accounts': (list_accounts, 4),
+    'report_accounts': (report_accounts, 4),
+    'report_images': (report_images, 2),
+    'report_instances': (report_instances, 2),
+    'list_images': (list_images, 2),
+}
+"""Available scenarios, mapping names to a function and its default weight.
+
+Scenario functions take a :class:`integrade.api.Client` and a dictionary
+describing the logged in virtual user, and return the response they got, or
+raise :class:`SkipScenario` if they can not run for the user. Every virtual
+user logs in and lists its accounts once before running scenarios.
+"""
+
+
+def _super_user_credentials():
+    """Return the credentials of the configured super user.
+
+    :raises ValueError: If ``CLOUDIGRADE_TOKEN`` is set without the super
+        user credentials, which are then made up by the configuration.
+    """
+    cfg = config.get_config()
+    if os.environ.get('CLOUDIGRADE_TOKEN') and not (
+            os.environ.get('CLOUDIGRADE_USER') and
+            os.environ.get('CLOUDIGRADE_PASSWORD')):
+        raise ValueError(
+            'CLOUDIGRADE_TOKEN is set, so the super user credentials are '
+            'unknown. Set CLOUDIGRADE_USER and CLOUDIGRADE_PASSWORD, or log '
+            'in as other users with --user.')
+    return {
+        'username': cfg['super_user_name'],
+        'password': cfg['super_user_password'],
+    }
+
+
+class LoadRun(object):
+    """A load generation run.
+
+    :param users: How many virtual users to run concurrently.
+    :param duration: How many seconds to run for, counting the ramp up.
+    :param ramp: How many seconds to take to start every user.
+    :param weights: A dictionary mapping scenario names to their weights.
+        Defaults to the weights in :data:`SCENARIOS`.
+    :param credentials: A list of dictionaries with ``username`` and
+        ``password``. Virtual users take turns using them. Defaults to the
+        configured super user.
+    :param client_factory: A callable returning the client for a virtual
+        user, given the shared :class:`integrade.api.RequestStats`.
+    """
+
+    def __init__(self, users, duration, ramp=0, weights=None,
+                 credentials=None, client_factory=None):
+        """Save the run configuration."""
+        self.users = users
+        self.duration = duration
+        self.ramp = ramp
+        weights = weights or {
+            name: weight for name, (_, weight) in SCENARIOS.items()}
+        unknown = set(weights) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(
+                'Unknown scenarios: {}'.format(', '.join(sorted(unknown))))
+        self.weights = {
+            name: weight for name, weight in weights.items() if weight > 0}
+        if not self.weights:
+            raise ValueError('At least one scenario must have a weight.')
+        if credentials is None:
+            credentials = [_super_user_credentials()]
+        self.credentials = credentials
+        self.client_factory = client_factory or self._default_client
+        self.stats = api.RequestStats()
+        self._lock = threading.Lock()
+        self._scenarios = {
+            name: {'runs': 0, 'errors': 0, 'skipped': 0, 'exceptions': {}}
+            for name in self.weights}
+        self._failed_logins = 0
+        self._login_exceptions = {}
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _default_client(stats):
+        """Return a client that neither raises nor retries on errors."""
+        return api.Client(
+            response_handler=api.echo_handler,
+            authenticate=False,
+            stats=stats,
+            retry=api.Retry(total=0),
+        )
+
+    def start_delay(self, index):
+        """Return when, in seconds from the start, to start user ``index``."""
+        if self.users <= 1:
+            return 0
+        return self.ramp * index / (self.users - 1)
+
+    def _record(self, name, error, exception=None):
+        """Record a scenario run.
+
+        :returns: True if ``exception`` is the first the scenario raised.
+        """
+        with self._lock:
+            scenario = self._scenarios[name]
+            scenario['runs'] += 1
+            scenario['errors'] += int(error)
+            if exception is None:
+                return False
+            return _count_exception(scenario['exceptions'], exception)
+
+    def _skip(self, name):
+        """Record a skipped scenario run.
+
+        :returns: True if it is the first time the scenario is skipped.
+        """
+        with self._lock:
+            scenario = self._scenarios[name]
+            scenario['skipped'] += 1
+            return scenario['skipped'] == 1
+
+    def _run_scenario(self, name, client, user):
+        """Run a scenario, recording whether it failed.
+
+        Exceptions are counted by type, only the first of each scenario is
+        logged so a failing scenario doesn't flood the output. Skipped runs
+        are counted apart, and neither timed nor counted as runs.
+        """
+        func = SCENARIOS[name][0]
+        try:
+            response = func(client, user)
+        except SkipScenario as e:
+            if self._skip(name):
+                logger.info(
+                    'Skipped scenario %s: %s, further skips are only counted',
+                    name, e)
+            return None
+        except Exception as e:  # pylint:disable=broad-except
+            if self._record(name, True, e):
+                logger.exception(
+                    'Scenario %s raised, further exceptions are only counted',
+                    name)
+            return None
+        self._record(name, response.status_code >= 400)
+        return response
+
+    def _virtual_user(self, index):
+        """Log in and run scenarios until the run is over."""
+        if self._stop.wait(self.start_delay(index)):
+            return
+        client = self.client_factory(self.stats)
+        user = dict(self.credentials[index % len(self.credentials)])
+        try:
+            response = login(client, user)
+        except Exception as e:  # pylint:disable=broad-except
+            with self._lock:
+                first = _count_exception(self._login_exceptions, e)
+            if first:
+                logger.exception(
+                    'Logging in raised, further exceptions are only counted')
+            response = None
+        if response is None or response.status_code != 200:
+            with self._lock:
+                self._failed_logins += 1
+            return
+        user['auth'] = api.TokenAuth(response.json()['auth_token'])
+        try:
+            list_accounts(client, user)
+        except Exception:  # pylint:disable=broad-except
+            # The images report scenario is skipped until the list accounts
+            # scenario succeeds.
+            logger.debug('Listing the accounts raised', exc_info=True)
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        while not self._stop.is_set():
+            name = random.choices(names, weights)[0]
+            self._run_scenario(name, client, user)
+
+    def run(self):
+        """Run the load and return a report, see :meth:`report`."""
+        threads = [
+            threading.Thread(target=self._virtual_user, args=(i,), daemon=True)
+            for i in range(self.users)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        self._stop.wait(self.duration)
+        self._stop.set()
+        for thread in threads:
+            thread.join()
+        return self.report(time.monotonic() - start)
+
+    def report(self, elapsed):
+        """Return a report of the run.
+
+        :param elapsed: How many seconds the run took.
+        :returns: A dictionary with the ``elapsed`` time, the number of
+            ``requests``, the ``throughput`` in requests per second, the runs,
+            errors, ``error_rate``, ``skipped`` runs and count of
+            ``exceptions`` by type of every scenario, how many users
+            ``failed_logins`` and never ran any scenario, the count of
+            ``login_exceptions`` by type, and the statistics of every
+            endpoint, see
+            :meth:`integrade.api.RequestStats.summary`.
+        """
+        endpoints = self.stats.summary()
+        requests = sum(e['count'] for e in endpoints.values())
+        with self._lock:
+            scenarios = {
+                name: dict(
+                    s,
+                    exceptions=dict(s['exceptions']),
+                    error_rate=s['errors'] / s['runs'] if s['runs'] else 0,
+                )
+                for name, s in self._scenarios.items()
+            }
+            login_exceptions = dict(self._login_exceptions)
+        return {
+            'users': self.users,
+            'elapsed': elapsed,
+            'requests': requests,
+            'throughput': requests / elapsed if elapsed else 0,
+            'scenarios': scenarios,
+            'failed_logins': self._failed_logins,
+            'login_exceptions': login_exceptions,
+            'endpoints': endpoints,
+        }
+
+
+def _count_exception(counts, exception):
+    """Count an exception by type, and return whether it is the first."""
+    name = type(exception).__name__
+    counts[name] = counts.get(name, 0) + 1
+    return sum(counts.values()) == 1
+
+
+def _format_exceptions(counts):
+    """Return the count of exceptions by type, as shown in reports."""
+    if not counts:
+        return ''
+    return ' ({})'.format(', '.join(
+        f'{count} {name}' for name, count in sorted(counts.items())))
+
+
+def format_report(report):
+    """Return a human readable version of a run report."""
+    lines = [
+        '{requests} requests by {users} users in {elapsed:.1f}s, '
+        '{throughput:.1f} requests/s, {failed_logins} failed logins'.format(
+            **report),
+        '',
+        'Scenarios:',
+    ]
+    for name, s in sorted(report['scenarios'].items()):
+        skipped = ', {} skipped'.format(s['skipped']) if s['skipped'] else ''
+        lines.append('  {:<20} {:>8} runs {:>6.1%} errors{}{}'.format(
+            name, s['runs'], s['error_rate'], skipped,
+            _format_exceptions(s['exceptions'])))
+    if report['login_exceptions']:
+        lines.append('  Logging in raised{}'.format(
+            _format_exceptions(report['login_exceptions'])))
+    lines += ['', 'Endpoints:']
+    for name, e in sorted(report['endpoints'].items()):
+        lines.append(
+            '  {:<40} {:>8} p50={:.3f}s p95={:.3f}s p99={:.3f}s'.format(
+                name, e['count'], e['p50'], e['p95'], e['p99']))
+    return '\n'.join(lines)
+
+
+def _parse_weight(value):
+    """Parse a ``name=weight`` scenario option."""
+    name, _, weight = value.partition('=')
+    try:
+        return name, float(weight)
+    except ValueError:
+        raise click.BadParameter(f'{value!r} is not of the form name=weight')
+
+
+@click.command()
+@click.option('--users', default=10, show_default=True,
+              help='Number of concurrent virtual users.')
+@click.option('--duration', default=60.0, show_default=True,
+              help='Seconds to run for, counting the ramp up.')
+@click.option('--ramp', default=0.0, show_default=True,
+              help='Seconds to take to start every user.')
+@click.option('--scenario', 'scenarios', multiple=True,
+              help='Weight of a scenario as name=weight, may be repeated. '
+              'Scenarios not given are not run. Available: '
+              + ', '.join(SCENARIOS))
+@click.option('--user', 'users_credentials', multiple=True,
+              help='Log in as username:password, may be repeated. Defaults '
+              'to the configured super user, whose credentials must be set '
+              'along CLOUDIGRADE_TOKEN.')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='Write the report as JSON to this file.')
+def main(users, duration, ramp, scenarios, users_credentials, output):
+    """Generate load against the cloudigrade API."""
+    weights = dict(_parse_weight(s) for s in scenarios) or None
+    credentials = None
+    if users_credentials:
+        credentials = []
+        for value in users_credentials:
+            username, _, password = value.partition(':')
+            credentials.append({'username': username, 'password': password})
+    try:
+        load = LoadRun(users, duration, ramp, weights, credentials)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    report = load.run()
+    click.echo(format_report(report))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
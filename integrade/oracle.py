@@ -0,0 +1,315 @@
+"""Compute the usage the reports should show for a whole dataset at once.
+
+The report endpoints sum, for every day of a window, how long instances of
+each tag ran and how many GB of memory and vCPUs they used while doing so.
+Instead of walking the events of one instance at a time, :class:`Runs` keeps
+the runs of every instance of a dataset in NumPy arrays, so the expected
+values of a report are computed in a handful of vectorized operations, for
+any ``[start, end)`` window down to the second::
+
+    runs = Runs.from_instances(instances, now=time.time())
+    expected = runs.daily_usage(start, end)
+    assert response.json()['daily_usage'] == expected['daily_usage']
+
+To sweep many windows over the same dataset, build an :class:`IntervalIndex`
+once with :meth:`Runs.index`. It answers how long runs overlapped a window,
+grouped by tag or by any label of their instances, in logarithmic time.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from integrade.utils import DAY, format_timestamp, utc_timestamp
+
+TAGS = ('rhel', 'openshift')
+
+
+def instance_tags(instance):
+    """Return the tags an instance is reported with.
+
+    :param instance: A dictionary with an ``image_type`` and optionally
+        ``challenged``, like the ones taken by
+        :func:`integrade.injector.inject_bulk_instance_data`.
+    """
+    if instance.get('challenged'):
+        return ()
+    return tuple(tag for tag in TAGS if tag in instance['image_type'])
+
+
+def distinct(values):
+    """Return the sorted distinct values of an integer array.
+
+    Sorting and dropping repeats is several times faster than
+    :func:`numpy.unique` on the millions of values of a large dataset.
+    """
+    values = np.sort(values)
+    if len(values):
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+class Runs(object):
+    """The runs of many instances, from a power on to the next power off.
+
+    :param instance: For each run, the index of its instance.
+    :param on: For each run, the timestamp it was powered on.
+    :param off: For each run, the timestamp it was powered off.
+    :param vcpu: For each instance, its number of vCPUs.
+    :param memory: For each instance, its GB of memory.
+    :param tags: A dictionary mapping each tag to, for each instance, whether
+        it is reported with that tag.
+    """
+
+    def __init__(self, instance, on, off, vcpu, memory, tags):
+        """Keep the runs and instances as arrays."""
+        self.instance = np.asarray(instance, dtype=np.int64)
+        self.on = np.asarray(on, dtype=np.int64)
+        self.off = np.asarray(off, dtype=np.int64)
+        self.vcpu = np.asarray(vcpu, dtype=np.float64)
+        self.memory = np.asarray(memory, dtype=np.float64)
+        self.tags = {
+            tag: np.asarray(tags.get(tag, ()), dtype=bool) for tag in TAGS}
+
+    def __len__(self):
+        """Return the number of instances."""
+        return len(self.vcpu)
+
+    @classmethod
+    def from_instances(cls, instances, now):
+        """Build the runs of a list of instance dictionaries.
+
+        :param instances: Dictionaries with ``events``, as datetimes or
+            timestamps, ``image_type``, and optionally ``challenged``,
+            ``vcpu`` and ``memory``, like the ones taken by
+            :func:`integrade.injector.inject_bulk_instance_data`.
+        :param now: When instances whose last event powered them on are
+            considered to have last run.
+        """
+        now = utc_timestamp(now)
+        run_instance, events, vcpu, memory = [], [], [], []
+        tags = {tag: [] for tag in TAGS}
+        for index, instance in enumerate(instances):
+            times = [utc_timestamp(event) for event in instance['events']]
+            if len(times) % 2:
+                times.append(max(now, times[-1]))
+            run_instance += [index] * (len(times) // 2)
+            events += times
+            vcpu.append(instance.get('vcpu', 1))
+            memory.append(instance.get('memory', 1))
+            reported = instance_tags(instance)
+            for tag in TAGS:
+                tags[tag].append(tag in reported)
+        events = np.array(events, dtype=np.int64)
+        return cls(run_instance, events[::2], events[1::2], vcpu, memory, tags)
+
+    def clip(self, start, end):
+        """Return the part of every run inside ``[start, end)``.
+
+        :returns: The indices of the runs overlapping the window and their
+            clipped power on and off timestamps.
+        """
+        on = np.maximum(self.on, utc_timestamp(start))
+        off = np.minimum(self.off, utc_timestamp(end))
+        overlapping = np.flatnonzero(on < off)
+        return overlapping, on[overlapping], off[overlapping]
+
+    def runtime(self, start, end):
+        """Return how many seconds each instance ran inside ``[start, end)``.
+
+        An instance ran in the window if its runtime is positive.
+        """
+        runs, on, off = self.clip(start, end)
+        return np.bincount(
+            self.instance[runs], weights=off - on, minlength=len(self))
+
+    def index(self, by=None):
+        """Return an :class:`IntervalIndex` of the runs.
+
+        :param by: How to group the runs. ``'tag'`` groups the runs of each
+            tag, a run of an instance with both tags is in both groups. A
+            sequence with a label for each instance, like its account or
+            image, groups the runs by the label of their instance. None puts
+            every run in a single group, labeled None.
+        """
+        on, off, instance = self.on, self.off, self.instance
+        groups = None
+        if isinstance(by, str) and by == 'tag':
+            selected = [
+                np.flatnonzero(self.tags[tag][instance]) for tag in TAGS]
+            groups = [
+                tag for tag, runs in zip(TAGS, selected) for _ in runs]
+            selected = np.concatenate(selected)
+            on, off, instance = on[selected], off[selected], instance[selected]
+        elif by is not None:
+            groups = np.asarray(by, dtype=object)[instance]
+        return IntervalIndex(on, off, groups, {
+            'runtime': np.ones(len(on)),
+            'memory': self.memory[instance],
+            'vcpu': self.vcpu[instance],
+        })
+
+    def daily_usage(self, start, end):
+        """Return the instances report expected for ``[start, end)``.
+
+        :param start: The start of the window, at midnight UTC.
+        :param end: The end of the window.
+        :returns: A dictionary with the ``daily_usage`` of every day, as
+            returned by the instances report, and the number of
+            ``instances_seen_with_`` each tag.
+        """
+        first = utc_timestamp(start)
+        days = -(-(utc_timestamp(end) - first) // DAY)
+        runs, on, off = self.clip(start, end)
+        instance = self.instance[runs]
+
+        # Split every run in one piece per day it spans.
+        first_day = (on - first) // DAY
+        spans = (off - 1 - first) // DAY - first_day + 1
+        piece = np.repeat(np.arange(len(runs)), spans)
+        day = first_day[piece] + (
+            np.arange(len(piece)) - np.repeat(np.cumsum(spans) - spans, spans))
+        day_start = first + day * DAY
+        seconds = (
+            np.minimum(off[piece], day_start + DAY) -
+            np.maximum(on[piece], day_start)
+        ).astype(np.float64)
+        instance = instance[piece]
+
+        usage = {}
+        report = {}
+        for tag in TAGS:
+            tagged = self.tags[tag][instance]
+            tag_day = day[tagged]
+            tag_instance = instance[tagged]
+            tag_seconds = seconds[tagged]
+            # An instance running several times in a day counts once.
+            seen = distinct(tag_instance * days + tag_day)
+            usage[tag] = {
+                'instances': np.bincount(seen % days, minlength=days),
+                'runtime_seconds': np.bincount(
+                    tag_day, weights=tag_seconds, minlength=days),
+                'memory_seconds': np.bincount(
+                    tag_day, weights=tag_seconds * self.memory[tag_instance],
+                    minlength=days),
+                'vcpu_seconds': np.bincount(
+                    tag_day, weights=tag_seconds * self.vcpu[tag_instance],
+                    minlength=days),
+            }
+            report[f'instances_seen_with_{tag}'] = len(
+                distinct(tag_instance))
+
+        report['daily_usage'] = []
+        for index in range(days):
+            row = {
+                'date': format_timestamp(
+                    first + index * DAY, '%Y-%m-%dT%H:%M:%SZ'),
+            }
+            for tag in TAGS:
+                row[f'{tag}_instances'] = int(usage[tag]['instances'][index])
+                for key in ('runtime', 'memory', 'vcpu'):
+                    row[f'{tag}_{key}_seconds'] = float(
+                        usage[tag][f'{key}_seconds'][index])
+            report['daily_usage'].append(row)
+        return report
+
+
+class IntervalIndex(object):
+    """Answer how much a set of intervals overlaps any window.
+
+    The time an interval ``[on, off)`` has run by time ``t`` is
+    ``max(0, t - on) - max(0, t - off)``. Summed over every interval, that is
+    ``t`` times the number of ``on`` before ``t`` minus their sum, minus the
+    same for ``off``. With the ``on`` and ``off`` of each group sorted and
+    their prefix sums precomputed, it takes two binary searches, and the
+    overlap of ``[start, end)`` is the difference of its values at ``end``
+    and ``start``.
+
+    :param on: For each interval, when it started.
+    :param off: For each interval, when it ended.
+    :param groups: For each interval, the label of its group. Defaults to a
+        single group labeled None.
+    :param weights: A dictionary mapping names to, for each interval, what
+        each of its seconds is worth, like its vCPUs. Defaults to
+        ``{'runtime': 1}``.
+    """
+
+    def __init__(self, on, off, groups=None, weights=None):
+        """Sort the intervals of each group and sum their weights."""
+        on = np.asarray(on, dtype=np.int64)
+        off = np.asarray(off, dtype=np.int64)
+        if weights is None:
+            weights = {'runtime': np.ones(len(on))}
+        # Work relative to the first interval so the prefix sums keep their
+        # precision as floats.
+        self.origin = int(on.min()) if len(on) else 0
+        on = (on - self.origin).astype(np.float64)
+        off = (off - self.origin).astype(np.float64)
+        if groups is None:
+            groups = [None] * len(on)
+        codes = {}
+        group_codes = np.fromiter(
+            (codes.setdefault(g, len(codes)) for g in groups),
+            dtype=np.int64, count=len(on))
+        self.groups = {}
+        for label, code in codes.items():
+            members = np.flatnonzero(group_codes == code)
+            self.groups[label] = (
+                self._sorted(on[members], weights, members),
+                self._sorted(off[members], weights, members),
+            )
+
+    @staticmethod
+    def _sorted(times, weights, members):
+        """Sort ``times`` and compute the prefix sums of their weights."""
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        sums = {}
+        for name, weight in weights.items():
+            weight = np.asarray(weight, dtype=np.float64)[members][order]
+            sums[name] = (
+                np.concatenate(([0.0], np.cumsum(weight))),
+                np.concatenate(([0.0], np.cumsum(weight * times))),
+            )
+        return times, sums
+
+    def _ran(self, group, t):
+        """Return the weighted seconds run by ``t`` by a group's intervals."""
+        (on, on_sums), (off, off_sums) = group
+        started = np.searchsorted(on, t)
+        ended = np.searchsorted(off, t)
+        return {
+            name: (t * count[started] - total[started]) - (
+                t * off_sums[name][0][ended] - off_sums[name][1][ended])
+            for name, (count, total) in on_sums.items()
+        }
+
+    def query(self, start, end):
+        """Return how much the intervals of each group overlap a window.
+
+        :param start: The start of the window, a datetime or a timestamp, or
+            an array of timestamps.
+        :param end: The end of the window, or an array of ends.
+        :returns: A dictionary mapping the label of each group to a
+            dictionary with the ``<name>_seconds`` of each weight and the
+            number of overlapping ``intervals``. Each value is an array if
+            arrays of windows were given.
+        """
+        if isinstance(start, datetime):
+            start = utc_timestamp(start)
+        if isinstance(end, datetime):
+            end = utc_timestamp(end)
+        start = np.asarray(start, dtype=np.float64) - self.origin
+        end = np.asarray(end, dtype=np.float64) - self.origin
+        result = {}
+        for label, group in self.groups.items():
+            before, after = self._ran(group, start), self._ran(group, end)
+            overlap = {
+                f'{name}_seconds': after[name] - before[name]
+                for name in before
+            }
+            (on, _), (off, _) = group
+            overlap['intervals'] = (
+                np.searchsorted(on, end) -
+                np.searchsorted(off, start, side='right'))
+            result[label] = overlap
+        return result
@@ -13,8 +13,10 @@ import random
 import pytest
 
 from integrade import api, config
+from integrade.dataset import Dataset
 from integrade.injector import inject_aws_cloud_account, inject_instance_data
 from integrade.tests import urls, utils
+from integrade.utils import DAY, day_start, format_timestamp
 
 
 def hour2sec(h):
@@ -410,3 +412,45 @@ def test_another_users_instances_report(instances_report_data):
         auth=auth2
     )
     assert impersonate_response == response
+
+
+def test_instances_report_at_scale():
+    """Test the instances report of a large generated dataset.
+
+    :id: 0dde267e-87b4-4a29-a680-7788f7d79926
+    :description: Test that the instances report matches the usage computed
+        from a large, reproducible dataset.
+    :steps:
+        1) Add two cloud accounts for a regular user, each with hundreds of
+           instances of twenty images, powered on and off several times.
+        2) Generate an instances report for the last 30 days.
+        3) Ensure every day of the report matches the usage of the dataset.
+    :expectedresults:
+        The daily usage and the instances seen with each tag match the
+        dataset.
+    """
+    dataset = Dataset({
+        'accounts': 2,
+        'images': 20,
+        'instances': 250,
+        'running': 0,
+    }, seed=1)
+    user = utils.create_user_account()
+    auth = utils.get_auth(user)
+    dataset.inject(user['id'])
+    end = day_start(days=1)
+    start = end - 30 * DAY
+    client = api.Client(response_handler=api.json_handler)
+
+    response = client.get(
+        urls.REPORT_INSTANCES,
+        params={
+            'start': format_timestamp(start),
+            'end': format_timestamp(end),
+        },
+        auth=auth
+    )
+
+    expected = dataset.expected_daily_usage(start, end)
+    for key, value in expected.items():
+        assert response[key] == value, key
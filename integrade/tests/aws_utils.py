@@ -12,7 +12,7 @@ import botocore
 
 import pytest
 
-from integrade import config
+from integrade import config, tracing
 from integrade.exceptions import (
     AWSCredentialsNotFoundError,
     ConfigFileNotFoundError,
@@ -438,10 +438,35 @@ def aws_session(aws_profile):
         access_key_id = os.environ.get(f'AWS_ACCESS_KEY_ID_{aws_profile}')
         access_key = os.environ.get(f'AWS_SECRET_ACCESS_KEY_{aws_profile}')
     if access_key_id and access_key:
-        return boto3.Session(
+        session = boto3.Session(
             aws_access_key_id=access_key_id,
             aws_secret_access_key=access_key)
+        session.events.register('before-call.*.*', _start_aws_span)
+        session.events.register('after-call.*.*', _end_aws_span)
+        session.events.register('after-call-error.*.*', _fail_aws_span)
+        return session
     else:
         raise AWSCredentialsNotFoundError(
             f'Could not find credentials in the environment for {aws_profile}'
         )
+
+
+def _start_aws_span(model, context, **kwargs):
+    """Open a tracing span when botocore starts an AWS API call."""
+    name = f'{model.service_model.service_name}.{model.name}'
+    context['integrade_span'] = tracing.span(name, 'aws').__enter__()
+
+
+def _end_aws_span(http_response, context, **kwargs):
+    """Close the tracing span opened by ``_start_aws_span``."""
+    span = context.pop('integrade_span', None)
+    if span is not None:
+        span.tag(status=http_response.status_code)
+        span.__exit__(None, None, None)
+
+
+def _fail_aws_span(exception, context, **kwargs):
+    """Close the span of an AWS API call that raised, like on a timeout."""
+    span = context.pop('integrade_span', None)
+    if span is not None:
+        span.__exit__(type(exception), exception, None)
@@ -1,14 +1,13 @@
 """Pytest customizations and fixtures for cloudigrade tests."""
-import atexit
+import json
 import os
 import subprocess
 from multiprocessing import Pool
-from time import time
 from urllib.parse import urljoin
 
 import pytest
 
-from integrade import api, config, exceptions
+from integrade import api, config, exceptions, tracing, workers
 from integrade.tests import urls, utils
 from integrade.tests.aws_utils import (
     delete_bucket_and_cloudtrail,
@@ -75,43 +74,87 @@ def capture_logs():
                        )
 
 
-T = 0
-TIMINGS = {}
-
-
-def timemetric(name):
-    """Create a timer context to record blocks of time."""
-    return TimeMetricContext(name)
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """Tag the spans recorded while a test runs with its node ID."""
+    tracing.set_test(item.nodeid)
+    yield
+    tracing.set_test(None)
 
 
-class TimeMetricContext:
-    """Conext manager meausure the time blocks of code take.
+# Timers and requests of the pytest-xdist workers, gathered by the controller.
+_WORKER_OUTPUTS = []
 
-    Each timer is given a name and all of the timers of the same name are added
-    up and the total time can be reported at the end of the test via the
-    report_timers() atexit callback.
-    """
 
-    def __init__(self, name):
-        """Remember what named timer we're adding to."""
-        self.name = name
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """Gather the timers and requests of a pytest-xdist worker once done."""
+    output = getattr(node, 'workeroutput', {}).get('integrade')
+    if output:
+        _WORKER_OUTPUTS.append(output)
 
-    def __enter__(self):
-        """Mark the time at the start of the timer entry."""
-        self.start = time()
 
-    def __exit__(self, *args):
-        """Add the elapsed time to the appropriate timer."""
-        self.end = time()
-        TIMINGS.setdefault(self.name, 0)
-        TIMINGS[self.name] += self.end - self.start
+def pytest_terminal_summary(terminalreporter):
+    """Report the total time spent in every named span and API endpoint.
 
-
-@atexit.register
-def report_timers():
-    """Report results of all timers."""
-    for t in TIMINGS:
-        print(f'Timer "{t}": {TIMINGS[t]:.2f}s')
+    When sharded with pytest-xdist, the timers and requests of all workers
+    are reported together.
+    """
+    totals = tracing.totals()
+    dropped = tracing.dropped()
+    stats = api.RequestStats()
+    stats.merge(api.STATS.dump())
+    for output in _WORKER_OUTPUTS:
+        for name, total in output['timers'].items():
+            totals[name] = totals.get(name, 0) + total
+        dropped += output['dropped']
+        stats.merge(output['requests'])
+    for name, total in sorted(totals.items()):
+        terminalreporter.write_line(f'Timer "{name}": {total:.2f}s')
+    if dropped:
+        terminalreporter.write_line(
+            f'{dropped} spans over $INTEGRADE_TRACE_MAX_SPANS were only '
+            'counted in the timers, not exported')
+    for name, endpoint in sorted(stats.summary().items()):
+        terminalreporter.write_line(
+            f'Endpoint "{name}": {endpoint["count"]} requests, '
+            f'p50={endpoint["p50"]:.2f}s p95={endpoint["p95"]:.2f}s '
+            f'p99={endpoint["p99"]:.2f}s, {endpoint["bytes"]} bytes'
+        )
+
+
+def _worker_path(path):
+    """Suffix a path with the pytest-xdist worker id when sharded."""
+    if workers.is_worker():
+        root, ext = os.path.splitext(path)
+        path = f'{root}-{workers.worker_id()}{ext}'
+    return path
+
+
+def pytest_sessionfinish(session):
+    """Export the spans and request statistics recorded during the session.
+
+    Set $INTEGRADE_TRACE to a file path to export every span, and
+    $INTEGRADE_TRACE_FORMAT to ``chrome`` to export them in the Chrome trace
+    format instead of JSON. Set $INTEGRADE_REQUEST_STATS to a file path to
+    dump the API request statistics as JSON. Each pytest-xdist worker writes
+    its own files, suffixed with the worker id.
+    """
+    path = os.environ.get('INTEGRADE_TRACE')
+    if path:
+        tracing.export(_worker_path(path),
+                       os.environ.get('INTEGRADE_TRACE_FORMAT', 'json'))
+    path = os.environ.get('INTEGRADE_REQUEST_STATS')
+    if path:
+        with open(_worker_path(path), 'w') as f:
+            json.dump(api.STATS.summary(), f, indent=2)
+    workeroutput = getattr(session.config, 'workeroutput', None)
+    if workeroutput is not None:
+        workeroutput['integrade'] = {
+            'timers': tracing.totals(),
+            'dropped': tracing.dropped(),
+            'requests': api.STATS.dump(),
+        }
 
 
 @pytest.fixture()
@@ -128,13 +171,7 @@ def drop_account_data():
     other tests. For that reason, mark any test using this fixture with
     "@pytest.mark.serial_only".
     """
-    # global T
-    # start = time()
-    with timemetric('drop_account_data()'):
-        utils.drop_account_data()
-    # end = time()
-    # T += (end - start)
-    # print(f'T={T}')
+    utils.drop_account_data()
 
 
 @pytest.fixture()
@@ -0,0 +1,160 @@
+"""Check what the UI would show without launching a browser.
+
+Most of what the UI tests look for, like account names, image and instance
+counts and the hours of each product, is data the frontend requests from the
+report endpoints and formats. The classes here request the same reports and
+format them the same way, so these expectations can be checked against the
+JSON in milliseconds. Tests of layout, navigation and interactions still need
+a browser.
+
+The texts are the ones the UI tests look for, for example ``'1 Images'`` or
+``'5RHEL'``, where the UI renders the number and the label in separate
+elements.
+"""
+import math
+
+from integrade import api
+from integrade.tests import urls
+from integrade.tests.utils import get_time_range
+from integrade.utils import day_start, overlap, utc_timestamp
+
+NOT_AVAILABLE = 'N/A'
+"""What the UI shows for counts of accounts that did not exist yet."""
+
+
+def format_hours(seconds):
+    """Return the hours the UI shows for a runtime in seconds, rounded up."""
+    if seconds is None:
+        return NOT_AVAILABLE
+    return str(math.ceil(seconds / 3600))
+
+
+def format_count(count):
+    """Return the count the UI shows, which may not be available."""
+    return NOT_AVAILABLE if count is None else str(count)
+
+
+def runtime_seconds(events, start, end, now=None):
+    """Return how long an instance ran within a report window, in seconds.
+
+    :param events: The day offsets of the power on and off events of the
+        instance, as taken by :func:`integrade.injector.inject_instance_data`.
+        Events happen at midnight UTC, and an instance powered on last is
+        still running.
+    :param start: The start of the report, as a timestamp.
+    :param end: The end of the report, as a timestamp. Instances still
+        running only count until ``now``.
+    :param now: The current time, see :func:`integrade.utils.utc_timestamp`.
+    """
+    now = utc_timestamp(now)
+    times = [day_start(now, -event) for event in events]
+    if len(times) % 2:
+        times.append(now)
+    return sum(
+        overlap(on, off, start, min(end, now))
+        for on, off in zip(times[::2], times[1::2])
+    )
+
+
+def summary_texts(overview):
+    """Return the texts of the summary row of an account.
+
+    :param overview: An item of the ``cloud_account_overviews`` of the
+        accounts report.
+    """
+    return {
+        overview['name'],
+        f'{format_count(overview["images"])} Images',
+        f'{format_count(overview["instances"])} Instances',
+        f'{format_hours(overview["rhel_runtime_seconds"])}RHEL',
+        f'{format_hours(overview["openshift_runtime_seconds"])}RHOCP',
+    }
+
+
+def image_texts(image):
+    """Return the texts of the row of an image in the account detail view.
+
+    :param image: An item of the ``images`` of the images report. Hours only
+        count for the products the image is tagged with, once challenges are
+        taken into account.
+    """
+    hours = format_hours(image['runtime_seconds'])
+    return {
+        image['ec2_ami_id'],
+        '{}RHEL'.format(hours if image['rhel'] else 0),
+        '{}RHOCP'.format(hours if image['openshift'] else 0),
+    }
+
+
+class AccountSummaryView(object):
+    """The account summary list, as built from the accounts report.
+
+    :param auth: The auth of the logged in user.
+    :param start: The start of the report, formatted for the API. Together
+        with ``end`` it defaults to the window of
+        :func:`integrade.tests.utils.get_time_range`.
+    :param end: The end of the report, formatted for the API.
+    :param client: The :class:`integrade.api.Client` requesting the reports.
+    """
+
+    def __init__(self, auth, start=None, end=None, client=None):
+        """Request the accounts report."""
+        if start is None or end is None:
+            start, end = get_time_range()
+        self.auth = auth
+        self.params = {'start': start, 'end': end}
+        self.client = client or api.Client(authenticate=False)
+        response = self.client.get(
+            urls.REPORT_ACCOUNTS, params=self.params, auth=auth)
+        self.accounts = response.json()['cloud_account_overviews']
+
+    def account(self, name):
+        """Return the overview of the account named ``name``."""
+        for overview in self.accounts:
+            if overview['name'] == name:
+                return overview
+        raise KeyError(
+            f'No account named {name!r} in the summary list, found: '
+            f'{[a["name"] for a in self.accounts]}')
+
+    def texts(self, name=None):
+        """Return the texts of the row of an account, or of every row."""
+        if name is not None:
+            return summary_texts(self.account(name))
+        return set().union(*(summary_texts(a) for a in self.accounts))
+
+    def detail(self, name):
+        """Return the detail view of the account named ``name``."""
+        return AccountDetailView(self, self.account(name))
+
+
+class AccountDetailView(object):
+    """The detail view of an account, as built from the images report.
+
+    Get it with :meth:`AccountSummaryView.detail`.
+    """
+
+    def __init__(self, summary, overview):
+        """Request the images report of the account over the same range."""
+        self.overview = overview
+        params = dict(summary.params, account_id=overview['id'])
+        response = summary.client.get(
+            urls.REPORT_IMAGES, params=params, auth=summary.auth)
+        self.images = response.json()['images']
+
+    def image(self, ec2_ami_id):
+        """Return the images report item of the image ``ec2_ami_id``."""
+        for image in self.images:
+            if image['ec2_ami_id'] == ec2_ami_id:
+                return image
+        raise KeyError(f'No image {ec2_ami_id!r} in the detail view')
+
+    def texts(self, ec2_ami_id=None):
+        """Return the texts of the row of an image, or of the whole view.
+
+        The whole view includes the summary of the account at the top.
+        """
+        if ec2_ami_id is not None:
+            return image_texts(self.image(ec2_ami_id))
+        return summary_texts(self.overview).union(
+            *(image_texts(i) for i in self.images))
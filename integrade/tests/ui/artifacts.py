@@ -0,0 +1,136 @@
+"""Save what the browser showed when a UI test failed.
+
+Embedding the page source in exception messages makes failures unreadable, and
+still misses what the page looked like and what the browser logged. Instead,
+when a UI test fails, :class:`FailureArtifacts` saves a screenshot, the DOM and
+the browser console log in a directory named after the test node ID::
+
+    ui-artifacts/
+        integrade.tests.ui.test_login.py__test_login/
+            screenshot.png
+            dom.html.gz
+            console.json.gz
+
+Only grabbing them from the browser happens while the test is being reported,
+since the browser is handed to the next test right after. Compressing and
+writing them to disk happens in a background thread.
+
+The artifacts of a test run are capped by a disk budget, split evenly between
+pytest-xdist workers. Once a worker used its share, artifacts that don't fit
+are dropped. The console log, usually the smallest, is written first so late
+failures still get it.
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import threading
+
+from selenium.common.exceptions import WebDriverException
+
+from integrade import workers
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS = ('console.json.gz', 'dom.html.gz', 'screenshot.png')
+"""The files saved for a failed test, in the order they are written."""
+
+
+def artifact_dir_name(nodeid):
+    """Return a directory name for a test node ID, safe on any filesystem."""
+    return re.sub(r'[^\w.-]+', '_', nodeid.replace('/', '.')).strip('_')
+
+
+def grab(driver):
+    """Return the raw artifacts of the current page of ``driver``.
+
+    Anything the browser fails to give, like the console log that only some
+    drivers support, is left out.
+
+    :returns: A dictionary mapping the artifact file names to the console log
+        entries, the page source and the PNG screenshot.
+    """
+    grabbed = {}
+    for name, get in (
+        ('console.json.gz', lambda: driver.get_log('browser')),
+        ('dom.html.gz', lambda: driver.page_source),
+        ('screenshot.png', driver.get_screenshot_as_png),
+    ):
+        try:
+            grabbed[name] = get()
+        except WebDriverException as e:
+            logger.debug('Could not grab %s: %s', name, e.msg)
+    return grabbed
+
+
+def encode(name, value):
+    """Return the bytes to write for an artifact, compressed if need be."""
+    if name == 'console.json.gz':
+        return gzip.compress(json.dumps(value, indent=2).encode())
+    if name == 'dom.html.gz':
+        return gzip.compress(value.encode())
+    return value
+
+
+class FailureArtifacts(object):
+    """Save the artifacts of failed tests in the background.
+
+    :param directory: Where to create a directory per failed test.
+    :param budget: How many bytes of artifacts the whole test run may write.
+        Each of the pytest-xdist workers gets an even share.
+    """
+
+    def __init__(self, directory, budget):
+        """Start the thread writing artifacts."""
+        self.directory = directory
+        self.budget = budget // workers.worker_count()
+        self.used = 0
+        self.dropped = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_all, daemon=True)
+        self._thread.start()
+
+    def capture(self, driver, nodeid):
+        """Grab the artifacts of a failed test, and queue them for writing.
+
+        :returns: The directory the artifacts will be written to.
+        """
+        path = os.path.join(self.directory, artifact_dir_name(nodeid))
+        self._queue.put((path, grab(driver)))
+        return path
+
+    def _write_all(self):
+        """Write queued artifacts until :meth:`close` is called."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write(*item)
+            except Exception:  # pylint:disable=broad-except
+                logger.exception('Failed to save failure artifacts')
+
+    def _write(self, path, grabbed):
+        """Write the artifacts of a test that fit in the budget."""
+        for name in ARTIFACTS:
+            if name not in grabbed:
+                continue
+            data = encode(name, grabbed[name])
+            if self.used + len(data) > self.budget:
+                self.dropped += 1
+                continue
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, name), 'wb') as f:
+                f.write(data)
+            self.used += len(data)
+
+    def close(self):
+        """Wait until every queued artifact is written."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.dropped:
+            logger.warning(
+                'Dropped %d failure artifacts over the %d bytes budget',
+                self.dropped, self.budget)
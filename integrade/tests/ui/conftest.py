@@ -1,51 +1,70 @@
 """Collection of fixtures representing reusable UI steps for UI tests."""
-import atexit
 import logging
 import os
-import time
 
 import pytest
 
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 
-from widgetastic.browser import Browser
-
+from integrade import tracing
 from integrade.config import get_config
 from integrade.injector import inject_aws_cloud_account, inject_instance_data
-from integrade.tests.utils import create_user_account, get_auth
-from integrade.utils import base_url
+from integrade.tests.utils import (
+    create_user_account,
+    get_auth,
+    wait_for_account_report,
+)
+from integrade.utils import DAY, base_url, day_start, utc_timestamp
 
+from .artifacts import FailureArtifacts
+from .pool import BrowserPool
 from .utils import (
-    fill_input_by_label,
-    find_element_by_text,
+    install_network_counter,
+    wait_for_network_idle,
     wait_for_page_text,
 )
-from .views import LoginView
+from .views import AccountListView, AddAccountView, LoginView, browser_for
 from ...utils import gen_password, uuid4
 
 
 logger = logging.getLogger(__name__)
+# These globals are per process. When the suite is sharded with pytest-xdist
+# every worker is its own process, so each worker gets its own UI user and
+# browser pool without any extra coordination.
 USER = None
+AUTH = None
 CLOUD_ACCOUNT_NAME = 'First Account'
 
 
-DRIVERS = {}
 BROWSERS = os.environ.get('UI_BROWSER', 'Chrome').split(',')
+POOL = None
+# Where the UI keeps the auth token of the logged in user, see
+# ui_token_login. Cleared if injecting the token does not log the user in, so
+# the following tests go straight to the login form.
+AUTH_TOKEN_KEY = os.environ.get('UI_AUTH_TOKEN_KEY', 'cloudigrade_token')
+AUTH_TOKEN_STORAGE = os.environ.get('UI_AUTH_TOKEN_STORAGE', 'cookie')
+LOGIN_TEXT = 'Log In to Your Account'
+# Where and how many megabytes of screenshots, DOM and console logs of failed
+# tests to save, see the failure_artifacts fixture.
+ARTIFACTS = None
+ARTIFACTS_DIR = os.environ.get('UI_ARTIFACTS_DIR', 'ui-artifacts')
+ARTIFACTS_BUDGET = float(os.environ.get('UI_ARTIFACTS_BUDGET', 100))
 
 
 @pytest.fixture()
 def new_session(request, scope='function'):
-    """Close current browser session to force a new one to start.
+    """Reset the browser session to start from a clean state.
+
+    The cookies and storage of the browser are cleared, which logs the user
+    out, without relaunching the browser.
 
     new_session must come _before_ browser_session in the fixture list of any
     test that depends on it.
     """
-    browser = BROWSERS[0]
-    if browser in DRIVERS:
-        DRIVERS[browser].close()
-        del DRIVERS[browser]
+    if POOL is not None:
+        POOL.reset()
 
 
 def _sauce_ondemand_url(saucelabs_user, saucelabs_key):
@@ -54,72 +73,127 @@ def _sauce_ondemand_url(saucelabs_user, saucelabs_key):
         saucelabs_user, saucelabs_key)
 
 
-@pytest.fixture()
-def browser_session(request, scope='function'):
-    """Adjust the selenium fixture's browser size."""
+def _launch_browser():
+    """Launch the browser configured for the UI tests."""
     use_saucelabs = os.environ.get('UI_USE_SAUCELABS', False)
     use_remote = os.environ.get('UI_USE_REMOTE', False)
     browser = BROWSERS[0]
-    testsfailed = request.session.testsfailed
 
-    if browser in DRIVERS:
-        yield DRIVERS[browser]
+    if use_saucelabs or browser in (
+        'MicrosoftEdge',
+        'InternetExplorer',
+    ):
+        cap = {
+            'browserName': browser,
+        }
+        user = os.environ['SAUCELABS_USERNAME']
+        key = os.environ['SAUCELABS_API_KEY']
+        url = _sauce_ondemand_url(user, key)
+        driver = webdriver.Remote(desired_capabilities=cap,
+                                  command_executor=url)
+
+    # Use selenium remote driver to connect to containerized browsers on CI
+    elif use_remote:
+        caps = webdriver.DesiredCapabilities
+        cap = getattr(caps, browser.upper()).copy()
+        driver = webdriver.Remote(
+            command_executor='http://selenium:4444/wd/hub',
+            desired_capabilities=cap,
+        )
+
+    elif browser == 'Firefox':
+        opt = webdriver.FirefoxOptions()
+        if os.environ.get('UITEST_SHOW', 'No').lower() != 'yes':
+            opt.add_argument('--headless')
+        driver = webdriver.Firefox(options=opt)
+    elif browser == 'Chrome':
+        opt = webdriver.ChromeOptions()
+        if os.environ.get('UITEST_SHOW', 'No').lower() != 'yes':
+            opt.add_argument('--headless')
+        opt.add_argument('--no-sandbox')
+        opt.add_argument('--disable-dev-shm-usage')
+        driver = webdriver.Chrome(options=opt)
+
+    driver.set_window_size(1200, 800)
+    install_network_counter(driver)
+    return driver
+
+
+@pytest.fixture(scope='session', autouse=True)
+def browser_pool(request):
+    """Start launching the browsers of the UI tests in the background.
+
+    Browsers are launched while the first test sets up its data, and quit at
+    the end of the test session. Nothing is launched if none of the collected
+    tests uses a browser, like the API smoke tests.
+    """
+    global POOL
+    POOL = BrowserPool(
+        _launch_browser, int(os.environ.get('UI_POOL_SIZE', 1)))
+    if any('browser_session' in getattr(item, 'fixturenames', ())
+           for item in request.session.items):
+        POOL.prewarm()
+    yield POOL
+    POOL.close()
+    POOL = None
+
+
+@pytest.fixture(scope='session', autouse=True)
+def failure_artifacts():
+    """Save the screenshot, DOM and console log of the failed UI tests.
+
+    They are saved under ``UI_ARTIFACTS_DIR``, in a directory per test, up to
+    a total of ``UI_ARTIFACTS_BUDGET`` megabytes. Set ``UI_ARTIFACTS_DIR`` to
+    an empty string to save nothing.
+    """
+    global ARTIFACTS
+    if not ARTIFACTS_DIR:
+        yield None
+        return
+    ARTIFACTS = FailureArtifacts(
+        ARTIFACTS_DIR, int(ARTIFACTS_BUDGET * 1024 * 1024))
+    yield ARTIFACTS
+    ARTIFACTS.close()
+    ARTIFACTS = None
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Capture the artifacts of the browser of a failed test.
+
+    The page is captured as soon as the test, or its setup, fails, before
+    the browser is reset and handed to the next test.
+    """
+    outcome = yield
+    report = outcome.get_result()
+    driver = getattr(item, 'ui_driver', None)
+    if (report.failed and report.when in ('setup', 'call')
+            and driver is not None and ARTIFACTS is not None):
+        try:
+            path = ARTIFACTS.capture(driver, item.nodeid)
+        except Exception:  # pylint:disable=broad-except
+            logger.exception('Failed to capture failure artifacts')
+        else:
+            report.sections.append(('UI failure artifacts', path))
 
-    else:
-        if use_saucelabs or browser in (
-            'MicrosoftEdge',
-            'InternetExplorer',
-        ):
-            cap = {
-                'browserName': browser,
-            }
-            user = os.environ['SAUCELABS_USERNAME']
-            key = os.environ['SAUCELABS_API_KEY']
-            url = _sauce_ondemand_url(user, key)
-            driver = webdriver.Remote(desired_capabilities=cap,
-                                      command_executor=url)
-
-        # Use selenium remote driver to connect to containerized browsers on CI
-        elif use_remote:
-            caps = webdriver.DesiredCapabilities
-            cap = getattr(caps, browser.upper()).copy()
-            driver = webdriver.Remote(
-                command_executor='http://selenium:4444/wd/hub',
-                desired_capabilities=cap,
-            )
-
-        elif browser == 'Firefox':
-            opt = webdriver.FirefoxOptions()
-            if os.environ.get('UITEST_SHOW', 'No').lower() != 'yes':
-                opt.add_argument('--headless')
-            driver = webdriver.Firefox(options=opt)
-        elif browser == 'Chrome':
-            opt = webdriver.ChromeOptions()
-            if os.environ.get('UITEST_SHOW', 'No').lower() != 'yes':
-                opt.add_argument('--headless')
-            opt.add_argument('--no-sandbox')
-            opt.add_argument('--disable-dev-shm-usage')
-            driver = webdriver.Chrome(options=opt)
-
-        driver.set_window_size(1200, 800)
-
-        @atexit.register
-        def clean_up():
-            try:
-                driver.close()
-            except WebDriverException:
-                pass
-
-        DRIVERS[browser] = driver
-        yield driver
 
-    if testsfailed < request.session.testsfailed:
-        # lets rebuild the browser session to be safe...
-        try:
-            DRIVERS[browser].close()
-        except WebDriverException:
-            pass
-        del DRIVERS[browser]
+@pytest.fixture()
+def browser_session(request, browser_pool, scope='function'):
+    """Borrow a browser from the pool for the duration of a test.
+
+    The browser keeps its state, like the logged in user, from one test to
+    the next, unless the test fails. Then it is reset, so a broken page does
+    not leak into the next test.
+    """
+    testsfailed = request.session.testsfailed
+    driver = browser_pool.acquire()
+    # Where pytest_runtest_makereport finds the browser of a failed test.
+    request.node.ui_driver = driver
+    try:
+        yield driver
+    finally:
+        browser_pool.release(
+            driver, reset=testsfailed < request.session.testsfailed)
 
 
 @pytest.fixture
@@ -128,15 +202,84 @@ def cloud_account(ui_user, drop_account_data):
     return inject_aws_cloud_account(ui_user['id'], name=CLOUD_ACCOUNT_NAME)
 
 
+class CloudAccountData(object):
+    """Inject data into a cloud account, and refresh the UI to show it.
+
+    See the cloud_account_data fixture.
+    """
+
+    def __init__(self, cloud_account, user, auth):
+        """Inject into ``cloud_account``, owned by ``user``."""
+        self.cloud_account = cloud_account
+        self.user = user
+        self.auth = auth
+        # The IDs of the injected instances, by AWS account ID.
+        self.instances = {}
+        # When the first injected event happened, as a timestamp.
+        self.start = None
+
+    def __call__(self, tag, events, **kwargs):
+        """Inject an instance of an image with a tag and its events.
+
+        If a ``name`` is given, the instance is injected into a new cloud
+        account with that name instead.
+        """
+        account = self.cloud_account
+        name = kwargs.pop('name', None)
+        if name:
+            account = inject_aws_cloud_account(self.user['id'], name=name)
+        injected = inject_instance_data(account['id'], tag, events, **kwargs)
+        self.instances.setdefault(account['aws_account_id'], set()).add(
+            injected['instance_id'])
+        for event in events:
+            if isinstance(event, int):
+                # Days ago, the remote end counts them from its own today.
+                when = day_start(days=-event - 1)
+            elif event is not None:
+                when = utc_timestamp(event) - DAY
+            else:
+                continue
+            self.start = when if self.start is None else min(self.start, when)
+        return injected
+
+    def wait_until_reported(self, timeout=30):
+        """Wait until the accounts report counts every injected instance."""
+        if self.start is None:
+            return
+        for aws_account_id, instances in self.instances.items():
+            with tracing.span('wait_until_reported', 'wait'):
+                reported = wait_for_account_report(
+                    self.auth,
+                    aws_account_id,
+                    len(instances),
+                    self.start,
+                    timeout=timeout,
+                )
+            assert reported, (
+                f'The accounts report did not count the {len(instances)} '
+                f'instances injected in {aws_account_id} in {timeout}s')
+
+    def refresh_when_reported(self, driver, timeout=30):
+        """Refresh the browser once the reports include the injected data.
+
+        Instead of refreshing right after injecting data, and hoping the UI
+        already shows it, poll the accounts report the UI is built from until
+        it counts every injected instance, then refresh once.
+        """
+        self.wait_until_reported(timeout)
+        driver.refresh()
+
+
 @pytest.fixture
-def cloud_account_data(cloud_account, ui_user):
+def cloud_account_data(cloud_account, ui_user, ui_user_auth):
     """Create a factory to create cloud account data.
 
     This fixture creates a factory (a function) which will insert data into a
     newly created cloud account. Repeated calls will insert the data into the
-    same cloud account. Data is inserted with a given image tag and a series
-    of instance events, given in either `datetime` objects or day offsets from
-    the current time.
+    same cloud account, unless a ``name`` is given to insert it into a new
+    cloud account with that name. Data is inserted with a given image tag and
+    a series of instance events, given in either `datetime` objects or day
+    offsets from the current time.
 
     Create one instance with a RHEL image that was powered on 5 days ago:
 
@@ -150,19 +293,18 @@ def cloud_account_data(cloud_account, ui_user):
         stop = datetime(2018, 9, 14)
         for i in range(3):
             cloud_account_data("", [start, stop], ec2_ami_id=image_id)
+
+    Then refresh the browser as soon as the data shows up in the reports:
+
+        cloud_account_data.refresh_when_reported(browser_session)
     """
-    def factory(tag, events, **kwargs):
-        name = kwargs.pop('name', None)
-        if name:
-            inject_aws_cloud_account(ui_user['id'], name=name)
-        inject_instance_data(cloud_account['id'], tag, events, **kwargs)
-    return factory
+    return CloudAccountData(cloud_account, ui_user, ui_user_auth)
 
 
 @pytest.fixture()
 def ui_user():
     """Create a user for use in a UI test."""
-    global USER
+    global USER, AUTH
     if USER:
         return USER
     else:
@@ -173,13 +315,87 @@ def ui_user():
             'email': username,
             'password': password,
         })
-        get_auth(user)
+        auth = get_auth(user)
         logger.debug('user: %s / %s', username, password)
 
         USER = user
+        AUTH = auth
         return user
 
 
+@pytest.fixture()
+def ui_user_auth(ui_user):
+    """Return the auth of the UI user, to use with the API."""
+    return AUTH
+
+
+def _login_outcome(username):
+    """Wait condition telling whether the page is logged in or out."""
+    def _(driver):
+        body = driver.find_element_by_tag_name('body')
+        text = body.get_attribute('innerText')
+        if username in text:
+            return 'in'
+        elif LOGIN_TEXT in text:
+            return 'out'
+    return _
+
+
+def _needs_login(selenium):
+    """Tell whether the browser is on the login page or no page at all."""
+    return (
+        not selenium.current_url.startswith('http') or
+        LOGIN_TEXT in selenium.page_source
+    )
+
+
+@pytest.fixture()
+def ui_token_login(request, browser_session, ui_user, ui_user_auth):
+    """Fixture factory to log in by injecting the auth token of the UI user.
+
+    Filling in the login form takes seconds, storing the token the UI keeps
+    after logging in, in the cookie or storage named by
+    ``UI_AUTH_TOKEN_STORAGE`` and ``UI_AUTH_TOKEN_KEY``, takes one page load.
+
+    Returns a callable returning whether the user got logged in. If not, the
+    caller falls back to the login form, and so will every following test.
+    Tests of the login itself always use the form, by setting
+    ``UI_FORM_LOGIN = True`` in their module.
+    """
+    selenium = browser_session
+
+    def _():
+        global AUTH_TOKEN_KEY
+        if not AUTH_TOKEN_KEY or getattr(request.module, 'UI_FORM_LOGIN', 0):
+            return False
+
+        # Cookies and storage can only be set for the page being visited.
+        selenium.get(base_url(get_config()))
+        token = ui_user_auth.token
+        if AUTH_TOKEN_STORAGE == 'cookie':
+            selenium.add_cookie(
+                {'name': AUTH_TOKEN_KEY, 'value': token, 'path': '/'})
+        else:
+            selenium.execute_script(
+                'window[arguments[0]].setItem(arguments[1], arguments[2])',
+                AUTH_TOKEN_STORAGE, AUTH_TOKEN_KEY, token)
+        selenium.refresh()
+
+        wait = WebDriverWait(selenium, 30)
+        try:
+            logged_in = wait.until(
+                _login_outcome(ui_user['username'])) == 'in'
+        except TimeoutException:
+            logged_in = False
+        if not logged_in:
+            logger.warning(
+                'Injecting the auth token in %s %r did not log in, using '
+                'the login form instead', AUTH_TOKEN_STORAGE, AUTH_TOKEN_KEY)
+            AUTH_TOKEN_KEY = None
+        return logged_in
+    return _
+
+
 @pytest.fixture()
 def ui_loginpage_empty(browser_session, ui_user):
     """Fixture factory to navigate to the login page."""
@@ -187,14 +403,14 @@ def ui_loginpage_empty(browser_session, ui_user):
 
     def _():
         selenium.get(base_url(get_config()))
-        assert selenium.title == 'Cloud Meter', selenium.page_source
+        assert selenium.title == 'Cloud Meter'
 
-        browser = Browser(selenium)
-        login = LoginView(browser)
+        browser = browser_for(selenium)
+        login = browser.view(LoginView)
 
         # User is directed to the login page, not the dashboard
         wait = WebDriverWait(selenium, 30)
-        wait.until(wait_for_page_text('Log In to Your Account'))
+        wait.until(wait_for_page_text(LOGIN_TEXT))
 
         return browser, login
     return _
@@ -211,19 +427,20 @@ def ui_loginpage(ui_loginpage_empty, ui_user):
 
 
 @pytest.fixture
-def ui_dashboard(browser_session, ui_loginpage, ui_user):
+def ui_dashboard(browser_session, ui_loginpage, ui_token_login, ui_user):
     """Fixture to navigate to the dashboard by logging in."""
     selenium = browser_session
     if 'Welcome to Cloud Meter' in selenium.page_source:
-        browser = Browser(selenium)
+        browser = browser_for(selenium)
         login = None
-        return browser, LoginView(browser)
-    elif 'Login to Your Account' in selenium.page_source:
-        browser, login = ui_loginpage()
-    elif not selenium.current_url.startswith('http'):
+        return browser, browser.view(LoginView)
+    elif _needs_login(selenium) and ui_token_login():
+        browser = browser_for(selenium)
+        login = None
+    elif _needs_login(selenium):
         browser, login = ui_loginpage()
     else:
-        browser = Browser(selenium)
+        browser = browser_for(selenium)
         login = None
 
     wait = WebDriverWait(selenium, 30)
@@ -237,24 +454,27 @@ def ui_dashboard(browser_session, ui_loginpage, ui_user):
         try:
             wait.until(wait_for_page_text(text))
         except TimeoutException as e:
-            e.msg = f'{text} not found in page: {selenium.page_source}'
+            e.msg = f'{text} not found in page'
+            raise
 
     return browser, login
 
 
 @pytest.fixture
-def ui_acct_list(browser_session, ui_loginpage, ui_user):
+def ui_acct_list(browser_session, ui_loginpage, ui_token_login, ui_user):
     """Fixture to navigate to the account list by logging in."""
     selenium = browser_session
     if 'Welcome to Cloud Meter' in selenium.page_source:
-        browser = Browser(selenium)
-        return browser, LoginView(browser)
-    elif 'Login to Your Account' in selenium.page_source:
-        browser, login = ui_loginpage()
-    elif not selenium.current_url.startswith('http'):
+        browser = browser_for(selenium)
+        return browser, browser.view(LoginView)
+    elif _needs_login(selenium) and ui_token_login():
+        browser = browser_for(selenium)
+        login = None
+        WebDriverWait(selenium, 10).until(wait_for_page_text('Accounts'))
+    elif _needs_login(selenium):
         browser, login = ui_loginpage()
     else:
-        browser = Browser(selenium)
+        browser = browser_for(selenium)
         login = None
 
     if login:
@@ -276,28 +496,24 @@ def ui_addacct_page1(browser_session, ui_dashboard):
     browser, login = ui_dashboard
 
     browser.refresh()
-    time.sleep(0.25)
-
-    btn_add_account = find_element_by_text(selenium, 'Add Account')
-    btn_add_account.click()
+    assert wait_for_network_idle(selenium)
 
-    dialog = selenium.find_element_by_css_selector('[role=dialog]')
+    browser.view(AccountListView).add_account.click()
+    dialog = browser.view(AddAccountView)
 
     return {
-        'dialog': dialog,
-        'dialog_next': find_element_by_text(dialog, 'Next'),
+        'view': dialog,
+        'dialog': browser.element(dialog),
+        'dialog_next': browser.element(dialog.next),
     }
 
 
 @pytest.fixture
-def ui_addacct_page2(browser_session, ui_addacct_page1):
+def ui_addacct_page2(ui_addacct_page1):
     """Navigate to the second page of the Add Account dialog."""
-    selenium = browser_session
-    profile_name = 'My Account'
-    dialog = ui_addacct_page1['dialog']
-
-    fill_input_by_label(selenium, dialog, 'Account Name', profile_name)
-    ui_addacct_page1['dialog_next'].click()
+    dialog = ui_addacct_page1['view']
+    dialog.account_name.fill('My Account')
+    dialog.next.click()
 
     return ui_addacct_page1
 
@@ -305,12 +521,10 @@ def ui_addacct_page2(browser_session, ui_addacct_page1):
 @pytest.fixture
 def ui_addacct_page3(ui_addacct_page2):
     """Navigate to the 3rd page of the dialog, with the ARN field."""
-    dialog = ui_addacct_page2['dialog']
-    dialog_next = ui_addacct_page2['dialog_next']
-
-    dialog_next.click()
+    dialog = ui_addacct_page2['view']
+    dialog.next.click()
 
-    dialog_add = find_element_by_text(dialog, 'Add')
+    dialog_add = dialog.browser.element(dialog.add)
     assert dialog_add.get_attribute('disabled')
 
     ui_addacct_page2['dialog_add'] = dialog_add
@@ -0,0 +1,170 @@
+"""Reuse browser sessions across UI tests.
+
+Launching a browser takes seconds, resetting one takes a few milliseconds. A
+:class:`BrowserPool` keeps WebDriver sessions alive for the whole test session
+and hands them out to tests one at a time. It launches them in the background
+ahead of time. When a test needs a clean browser, for example after a test
+failed or to log in again, the session is reset with :func:`reset_driver`
+instead of being relaunched.
+
+Pools are per process. When the suite is sharded with pytest-xdist every
+worker has its own pool, sized with ``UI_POOL_SIZE``.
+"""
+import logging
+import threading
+
+from selenium.common.exceptions import WebDriverException
+
+from integrade import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def reset_driver(driver):
+    """Reset the state of a browser session without relaunching the browser.
+
+    Delete the cookies and the local and session storage of the current page,
+    then navigate to a blank page.
+    """
+    driver.delete_all_cookies()
+    try:
+        driver.execute_script(
+            'window.localStorage.clear(); window.sessionStorage.clear()')
+    except WebDriverException:
+        # Blank and data pages have no storage to clear.
+        pass
+    driver.get('about:blank')
+
+
+class BrowserPool(object):
+    """A pool of up to ``size`` browser sessions shared by the tests.
+
+    :param factory: A callable launching a new browser and returning its
+        WebDriver.
+    :param size: The most browsers the pool launches. :meth:`acquire` waits
+        for a browser to be released once they are all in use.
+    """
+
+    def __init__(self, factory, size=1):
+        """Create an empty pool, browsers are launched when needed."""
+        self.factory = factory
+        self.size = size
+        self._drivers = []
+        self._idle = []
+        # Browsers launched or being launched, never more than size.
+        self._launched = 0
+        self._cond = threading.Condition()
+
+    def _launch(self):
+        """Launch a browser, counted in ``_launched`` by the caller."""
+        try:
+            with tracing.span('launch_browser', 'ui'):
+                driver = self.factory()
+        except BaseException:
+            with self._cond:
+                self._launched -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._drivers.append(driver)
+        return driver
+
+    def _launch_idle(self):
+        """Launch a browser in the background and make it available."""
+        try:
+            driver = self._launch()
+        except Exception:  # pylint:disable=broad-except
+            # The next acquire launches a browser itself and fails loudly.
+            logger.exception('Failed to launch a browser in the background')
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify_all()
+
+    def prewarm(self, count=None):
+        """Start launching browsers in the background.
+
+        :param count: How many browsers the pool should have, defaults to
+            and can't exceed its size.
+        """
+        count = self.size if count is None else min(count, self.size)
+        threads = []
+        with self._cond:
+            while self._launched < count:
+                self._launched += 1
+                threads.append(
+                    threading.Thread(target=self._launch_idle, daemon=True))
+        for thread in threads:
+            thread.start()
+
+    def acquire(self):
+        """Return a browser for the exclusive use of the caller.
+
+        The browser released last is handed out first, so a single test
+        process keeps reusing the same, already logged in, browser. If none
+        is available, a new one is launched as long as the pool is not full.
+        Otherwise, wait for one to be launched or released.
+        """
+        with self._cond:
+            while not self._idle:
+                if self._launched < self.size:
+                    self._launched += 1
+                    break
+                self._cond.wait()
+            else:
+                return self._idle.pop()
+        return self._launch()
+
+    def release(self, driver, reset=False):
+        """Give a browser back to the pool.
+
+        :param reset: Whether to reset its state first, see
+            :func:`reset_driver`. A browser that fails to reset is discarded
+            and replaced in the background.
+        """
+        if reset:
+            try:
+                reset_driver(driver)
+            except WebDriverException:
+                logger.warning('Discarding a browser that failed to reset')
+                self.discard(driver)
+                return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify_all()
+
+    def discard(self, driver):
+        """Quit a broken browser and launch a replacement in the background."""
+        with self._cond:
+            if driver not in self._drivers:
+                return
+            self._drivers.remove(driver)
+            if driver in self._idle:
+                self._idle.remove(driver)
+            self._launched -= 1
+            self._cond.notify_all()
+        _quit(driver)
+        self.prewarm(self._launched + 1)
+
+    def reset(self):
+        """Reset every browser not in use."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self.release(driver, reset=True)
+
+    def close(self):
+        """Quit every browser of the pool."""
+        with self._cond:
+            drivers, self._drivers, self._idle = self._drivers, [], []
+            self._launched -= len(drivers)
+        for driver in drivers:
+            _quit(driver)
+
+
+def _quit(driver):
+    """Quit a browser, ignoring the errors of browsers already gone."""
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass
@@ -8,7 +8,6 @@
 :testtype: functional
 :upstream: yes
 """
-import time
 from random import randint
 
 import pytest
@@ -31,7 +30,10 @@ from .utils import (
     find_elements_by_text,
     get_el_text,
     return_url,
+    wait_for_count,
+    wait_for_network_idle,
 )
+from .views import AccountListView, browser_for
 
 
 def product_id_tag_present(driver, tag):
@@ -41,7 +43,7 @@ def product_id_tag_present(driver, tag):
 
     Currently only can safely identify the tag if there is only one account.
     """
-    time.sleep(0.5)
+    assert wait_for_network_idle(driver)
     results = driver.find_elements_by_xpath(
         '//div[contains(@class,\'list-view-pf-main-info\')]'
         f'//*[text()=\'{tag}\']'
@@ -64,8 +66,8 @@ def test_empty(cloud_account_data, browser_session, ui_acct_list):
         Only accounts with usage have detail views.
     """
     selenium = browser_session
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=1)
-    account.click()
+    accounts = browser_for(selenium).view(AccountListView)
+    accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=1)
     assert find_element_by_text(
         selenium,
         'No instances available',
@@ -116,17 +118,14 @@ def test_hours_image(events, cloud_account_data, browser_session,
         instance_id=instance_id,
         ec2_ami_id=ec2_ami_id,
     )
-    selenium.refresh()
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=2)
+    cloud_account_data.refresh_when_reported(selenium)
+    accounts = browser_for(selenium).view(AccountListView)
 
     with return_url(selenium):
-        account.click()
-        time.sleep(1)
+        detail = accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=2)
         assert find_element_by_text(selenium, ec2_ami_id, exact=False,
                                     timeout=0.5)
-        info_bar = browser_session.find_element_by_css_selector(
-            '.cloudmeter-list-view-card'
-        )
+        info_bar = detail.browser.element(detail.summary)
         assert find_element_by_text(info_bar, f'{hours}RHEL', exact=False), \
             f'seen: {info_bar.get_attribute("innerText")}, ' \
             f'expected: {hours} RHEL'
@@ -167,13 +166,12 @@ def test_image_tag(events, cloud_account_data, browser_session,
         events,
         instance_id=instance_id,
         ec2_ami_id=ec2_ami_id)
-    selenium.refresh()
+    cloud_account_data.refresh_when_reported(selenium)
     assert find_element_by_text(selenium, '1 Instances', timeout=1)
 
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=0.5)
+    accounts = browser_for(selenium).view(AccountListView)
     with return_url(selenium):
-        account.click()
-        time.sleep(1)
+        accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=0.5)
 
         # now in detail view
         # assert that product identification tags are correctly displayed
@@ -225,13 +223,12 @@ def test_image_flagging(cloud_account_data, browser_session,
         ec2_ami_id=ec2_ami_id,
         challenged=flagged,
     )
-    selenium.refresh()
+    cloud_account_data.refresh_when_reported(selenium)
     assert find_element_by_text(selenium, '1 Instances', timeout=1)
 
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=0.5)
+    accounts = browser_for(selenium).view(AccountListView)
     with return_url(selenium):
-        account.click()
-        time.sleep(1)
+        detail = accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=0.5)
 
         if 'rhel' == tag:
             label = 'RHEL'
@@ -247,21 +244,19 @@ def test_image_flagging(cloud_account_data, browser_session,
         else:
             check = 'Flag for review'
 
-        ctn = selenium.find_element_by_css_selector('.list-view-pf-main-info')
+        image = detail.image(ec2_ami_id)
+        ctn = image.browser.element(image.info)
         assert product_id_tag_present(selenium, label)
-        assert bool(ctn.find_elements_by_class_name('fa-flag')) == flagged
+        assert bool(image.flags()) == flagged
 
-        image_id_el = find_element_by_text(selenium, ec2_ami_id)
-        image_id_el.click()
-        time.sleep(0.1)
+        image.expand()
         info = elem_parent(
             find_element_by_text(ctn, f'{label}', exact=False)
         )
         tags_before = len(find_elements_by_text(ctn, label))
         hours_before = get_el_text(info)
 
-        find_element_by_text(selenium, check, selector='label').click()
-        time.sleep(1)
+        image.flag(check)
 
         info = elem_parent(
             find_element_by_text(ctn, f'{label}', exact=False)
@@ -269,7 +264,7 @@ def test_image_flagging(cloud_account_data, browser_session,
         tags_after = len(find_elements_by_text(ctn, label))
         hours_after = get_el_text(info)
 
-        assert bool(ctn.find_elements_by_class_name('fa-flag')) != flagged
+        assert bool(image.flags()) != flagged
         assert tags_after == tags_before
         assert hours_before != hours_after
 
@@ -312,46 +307,37 @@ def test_flag_icons_on_challenged_accounts(cloud_account_data, browser_session,
         ec2_ami_id=ec2_ami_id,
         challenged=flagged,
     )
-    selenium.refresh()
-    time.sleep(0.5)
+    cloud_account_data.refresh_when_reported(selenium)
+    assert wait_for_network_idle(selenium)
     # There are no flags on the account when nothing has been challenged
     ctn = selenium.find_element_by_css_selector(long_css_selector)
     assert bool(ctn.find_elements_by_class_name('fa-flag')) == flagged
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=0.5)
+    accounts = browser_for(selenium).view(AccountListView)
     with return_url(selenium):
-        account.click()
-        time.sleep(1)
+        detail = accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=0.5)
 
         # Challenge current tag
         check = 'Flag for review'
-        image_id_el = find_element_by_text(selenium, ec2_ami_id)
-        image_id_el.click()
-        time.sleep(0.1)
-        find_element_by_text(selenium, check, selector='label').click()
+        image = detail.image(ec2_ami_id)
+        image.expand()
+        image.flag(check)
 
     # Go back to accounts page and see that flagging matches
     # (currently one flagged)
-    time.sleep(1)
-    ctn = selenium.find_element_by_css_selector(long_css_selector)
-    flags = ctn.find_elements_by_class_name('fa-flag')
+    flags = wait_for_count(selenium, f'{long_css_selector} .fa-flag', 1)
     assert bool(flags) != flagged
     assert len(flags) == 1
 
     # Challenge the other tag (so both are challenged)
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=0.5)
     with return_url(selenium):
-        account.click()
-        time.sleep(1)
-        image_id_el = find_element_by_text(selenium, ec2_ami_id)
-        image_id_el.click()
-        time.sleep(0.5)
-        find_element_by_text(selenium, check, selector='label').click()
+        detail = accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=0.5)
+        image = detail.image(ec2_ami_id)
+        image.expand()
+        image.flag(check)
 
     # Go back to accounts page and see that flagging matches
     # (currently two flagged)
-    time.sleep(1)
-    ctn = selenium.find_element_by_css_selector(long_css_selector)
-    flags = ctn.find_elements_by_class_name('fa-flag')
+    flags = wait_for_count(selenium, f'{long_css_selector} .fa-flag', 2)
     assert bool(flags) != flagged
     assert len(flags) == 2
 
@@ -365,33 +351,24 @@ def test_flag_icons_on_challenged_accounts(cloud_account_data, browser_session,
         instance_id='i-{}'.format(randint(1000, 99999)),
         ec2_ami_id=second_ec2_ami_id,
     )
-    selenium.refresh()
-    time.sleep(0.5)
-    account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME, timeout=0.5)
+    cloud_account_data.refresh_when_reported(selenium)
+    assert wait_for_network_idle(selenium)
     with return_url(selenium):
-        account.click()
-        time.sleep(1)
+        detail = accounts.open_account(CLOUD_ACCOUNT_NAME, timeout=0.5)
 
         # Unchallenge second flagged item in first image
-        image_id_el = find_element_by_text(selenium, ec2_ami_id)
-        image_id_el.click()
-        time.sleep(0.5)
-        find_element_by_text(selenium,
-                             'Flagged for review', selector='label').click()
-        time.sleep(1)
-        image_id_el.click()
-        time.sleep(0.5)
+        image = detail.image(ec2_ami_id)
+        image.expand()
+        image.flag('Flagged for review')
+        image.expand()
 
         # Challenge second item in second image
-        second_image_id_el = find_element_by_text(selenium, second_ec2_ami_id)
-        second_image_id_el.click()
-        time.sleep(0.5)
-        find_element_by_text(selenium, check, selector='label').click()
+        second_image = detail.image(second_ec2_ami_id)
+        second_image.expand()
+        second_image.flag(check)
 
     # Go back to the accounts page and be sure that both are flagged
-    time.sleep(1)
-    ctn = selenium.find_element_by_css_selector(long_css_selector)
-    flags = ctn.find_elements_by_class_name('fa-flag')
+    flags = wait_for_count(selenium, f'{long_css_selector} .fa-flag', 2)
     assert len(flags) == 2
 
 
@@ -407,18 +384,16 @@ def test_reused_image(cloud_account_data, browser_session, ui_acct_list):
 
         for _ in range(num_instances):
             cloud_account_data('rhel', events, ec2_ami_id=ec2_ami_id)
-        selenium.refresh()
-        account = find_element_by_text(selenium, CLOUD_ACCOUNT_NAME,
-                                       timeout=0.5)
+        cloud_account_data.refresh_when_reported(selenium)
         assert find_element_by_text(
             selenium,
             f'{num_instances} Instances',
             exact=False)
-        account.click()
-
-        time.sleep(1)
+        detail = browser_for(selenium).view(AccountListView).open_account(
+            CLOUD_ACCOUNT_NAME, timeout=0.5)
 
-        ctn = selenium.find_element_by_css_selector('.list-view-pf-main-info')
+        image = detail.image(ec2_ami_id)
+        ctn = image.browser.element(image.info)
         hours_el = find_element_by_text(ctn, f'RHEL', exact=False)
         hours_txt = hours_el.get_attribute('innerText')
 
@@ -477,7 +452,7 @@ def test_multiple_accounts(
             accts.append(acct)
 
         selenium.refresh()
-        time.sleep(1)
+        assert wait_for_network_idle(selenium)
 
         # inject instance activity for the account
         account = accts[active_account_indx]
@@ -488,24 +463,21 @@ def test_multiple_accounts(
             ec2_ami_id=ec2_ami_id
         )
         selenium.refresh()
-        time.sleep(1)
+        assert wait_for_network_idle(selenium)
 
+        accounts = browser_for(selenium).view(AccountListView)
         for indx in range(len(accts)):
             acct = accts[indx]
             if indx != active_account_indx:
-                account_bar = find_element_by_text(selenium, acct['name'])
-                account_bar.click()
+                accounts.open_account(acct['name'])
                 assert find_element_by_text(
                     selenium,
                     'No instances available',
                     exact=False)
 
-        account_bar = find_element_by_text(selenium, account['name'])
-        assert account_bar
-        account_bar.click()
-
-        time.sleep(1)
-        ctn = selenium.find_element_by_css_selector('.list-view-pf-main-info')
+        detail = accounts.open_account(account['name'])
+        image = detail.image(ec2_ami_id)
+        ctn = image.browser.element(image.info)
         hours_el = find_element_by_text(ctn, f'RHEL', exact=False)
         hours_txt = hours_el.get_attribute('innerText')
 
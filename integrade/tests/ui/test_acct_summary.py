@@ -12,14 +12,11 @@ import calendar
 import datetime
 import math
 import random
-import time
 
 from dateutil.relativedelta import relativedelta
 
 import pytest
 
-from selenium.webdriver.common.keys import Keys
-
 from integrade.tests import utils
 from integrade.utils import (
     get_expected_hours_in_past_30_days,
@@ -28,12 +25,15 @@ from integrade.utils import (
 
 from .utils import (
     element_has_text,
-    fill_input_by_placeholder,
     find_element_by_text,
     page_has_text,
     retry_w_timeout,
     return_url,
+    wait_for_chart,
+    wait_for_count,
+    wait_for_network_idle,
 )
+from .views import AccountListView, browser_for
 from ...injector import (
     inject_aws_cloud_account,
     inject_instance_data,
@@ -84,7 +84,7 @@ def test_summary_list_layout(cloud_account_data, browser_session,
         - Confirm both lengths are equal
     """
     cloud_account_data('', [15], name='x ' * 127)
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     page_has_text(browser_session, 'x x x x', timeout=30)
 
@@ -119,7 +119,7 @@ def test_running_start_times(start, cloud_account_data, browser_session,
           date filter
     """
     cloud_account_data('', [start])
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
     assert find_element_by_text(browser_session, '1 Images', timeout=1)
     assert find_element_by_text(browser_session, '1 Instances')
 
@@ -144,7 +144,7 @@ def test_running_tags(tag, cloud_account_data, browser_session, ui_acct_list):
     cloud_account_data(tag, [10])
     hours, spare_min, events = get_expected_hours_in_past_30_days([10, None])
     hours = round_hours(hours, spare_min)
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     assert find_element_by_text(browser_session, '1 Images', timeout=1)
     assert find_element_by_text(browser_session, '1 Instances')
@@ -152,9 +152,8 @@ def test_running_tags(tag, cloud_account_data, browser_session, ui_acct_list):
     for level in ('summary', 'detail'):
         with return_url(browser_session):
             if level == 'detail':
-                find_element_by_text(
-                    browser_session, 'First Account', timeout=1).click()
-                time.sleep(1)
+                browser_for(browser_session).view(
+                    AccountListView).open_account('First Account')
 
             if 'rhel' in tag:
                 # No spaces because there are not spaces between the DOM nodes,
@@ -186,7 +185,7 @@ def test_reused_image(cloud_account_data, browser_session, ui_acct_list):
     cloud_account_data('', [10], ec2_ami_id='image1')
     cloud_account_data('', [10], ec2_ami_id='image1')
 
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     assert find_element_by_text(browser_session, '1 Images', timeout=1)
     assert find_element_by_text(browser_session, '3 Instances')
@@ -210,9 +209,8 @@ def test_last_event_time(cloud_account_data, browser_session, ui_acct_list):
     expected = 'Created 9:51AM, August 10th 2018'
 
     cloud_account_data('', [when], ec2_ami_id='image1')
-    browser_session.refresh()
-    assert find_element_by_text(browser_session, expected, timeout=1), \
-        browser_session.page_source
+    cloud_account_data.refresh_when_reported(browser_session)
+    assert find_element_by_text(browser_session, expected, timeout=1)
 
 
 def test_account_name_filter(
@@ -237,27 +235,21 @@ def test_account_name_filter(
         cloud_account_data('', [10], ec2_ami_id='image1')
 
     inject_instance_data(acct2['id'], '', [10], ec2_ami_id='image1')
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     assert find_element_by_text(browser_session, 'First Account', timeout=1)
     assert find_element_by_text(browser_session, 'Second Account')
 
-    input = fill_input_by_placeholder(
-        browser_session, None,
-        'Filter by Name', 'Second')
-
-    input.send_keys(Keys.RETURN)
+    accounts = browser_for(browser_session).view(AccountListView)
+    accounts.filter_by_name('Second')
     assert not find_element_by_text(browser_session, 'First Account')
     assert find_element_by_text(browser_session, 'Second Account')
 
-    input = fill_input_by_placeholder(
-        browser_session, None,
-        'Filter by Name', 'First')
-    input.send_keys(Keys.RETURN)
+    accounts.filter_by_name('First')
     assert find_element_by_text(browser_session, 'First Account', timeout=1)
     assert not find_element_by_text(browser_session, 'Second Account')
 
-    find_element_by_text(browser_session, 'Clear All Filters').click()
+    accounts.clear_filters.click()
     assert find_element_by_text(browser_session, 'First Account', timeout=1)
     assert find_element_by_text(browser_session, 'Second Account')
 
@@ -317,7 +309,7 @@ def test_graph_modes(drop_account_data, cloud_account_data,
         'cpu': round_hours(hours1*4 + hours2*2, min1*4 + min2*2),
     }
 
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     # Find the graph card based on the product header
     def graph_card(header):
@@ -356,9 +348,8 @@ def test_graph_modes(drop_account_data, cloud_account_data,
             # and return back afterwards
             with return_url(browser_session):
                 if level == 'detail':
-                    find_element_by_text(
-                        browser_session, 'First Account', timeout=1).click()
-                    time.sleep(1)
+                    browser_for(browser_session).view(
+                        AccountListView).open_account('First Account')
 
                 # Starting with the default dimension for this product,
                 # walk through each via the dropdown menu on the appropriate
@@ -368,7 +359,7 @@ def test_graph_modes(drop_account_data, cloud_account_data,
                     if i > 0:
                         find_element_by_text(graph_card(header), dropdown,
                                              timeout=1).click()
-                        time.sleep(0.25)
+                        assert wait_for_chart(graph_card(header))
 
                     assert find_element_by_text(graph_card(header),
                                                 f'{hours[dim]}{tag}',
@@ -411,7 +402,7 @@ def test_account_date_filter(
     for i in range(3):
         cloud_account_data('', [start, end], ec2_ami_id='image2')
 
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     assert find_element_by_text(browser_session, '0 Images', timeout=1)
     assert find_element_by_text(browser_session, '0 Instances')
@@ -543,7 +534,7 @@ def test_summary_cards(cloud_account_data, browser_session, ui_acct_list):
     openshift_runtime += sum_usage(usage)
     rhel_runtime += sum_usage(usage)
 
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     # Convert runtime from seconds to hours
     rhel_runtime = int(rhel_runtime / 3600)
@@ -552,15 +543,14 @@ def test_summary_cards(cloud_account_data, browser_session, ui_acct_list):
     month_label = last_month.strftime('%Y %B')
     find_element_by_text(browser_session, 'Last 30 Days', timeout=2).click()
     find_element_by_text(browser_session, month_label, timeout=1).click()
-    time.sleep(1)
+    assert wait_for_network_idle(browser_session)
     summary_row = retry_w_timeout(
         1,
         browser_session.find_elements_by_css_selector,
         '.cloudmeter-list-view-card'
         )
-    cards = browser_session.find_elements_by_css_selector(
-        '.cloudmeter-utilization-graph'
-        )
+    cards = wait_for_count(
+        browser_session, '.cloudmeter-utilization-graph', 2)
     assert len(cards) == 2
     assert element_has_text(cards[0], f'{rhel_runtime} RHEL')
     assert element_has_text(cards[1], f'{openshift_runtime} RHOCP')
@@ -22,9 +22,7 @@ from integrade.tests import urls
 from integrade.tests.utils import get_auth
 
 from .utils import (
-    fill_input_by_label,
     find_element_by_text,
-    read_input_by_label,
     wait_for_page_text,
 )
 
@@ -48,14 +46,14 @@ def test_fill_name_and_clear(selenium, ui_addacct_page1, ui_user):
     :expectedresults: The "Next" button should only ever be enabled when the
         account name field is valid.
     """
-    dialog = ui_addacct_page1['dialog']
+    view = ui_addacct_page1['view']
     dialog_next = ui_addacct_page1['dialog_next']
 
     assert dialog_next.get_attribute('disabled')
-    input = fill_input_by_label(selenium, dialog, 'Account Name', 'My Account')
+    view.account_name.fill('My Account')
 
     assert not dialog_next.get_attribute('disabled')
-    input.clear()
+    view.account_name.fill('')
     assert dialog_next.get_attribute('disabled')
 
 
@@ -106,13 +104,13 @@ def test_account_name_required(options, browser_session, ui_addacct_page1):
     """
     selenium = browser_session
     name, expected, error, disabled = options
-    dialog = ui_addacct_page1['dialog']
+    view = ui_addacct_page1['view']
     dialog_next = ui_addacct_page1['dialog_next']
 
     assert dialog_next.get_attribute('disabled')
-    fill_input_by_label(selenium, dialog, 'Account Name', name)
+    view.account_name.fill(name)
 
-    assert read_input_by_label(selenium, dialog, 'Account Name') == expected
+    assert view.account_name.read() == expected
     assert bool(dialog_next.get_attribute('disabled')) == disabled
     if error:
         assert error in selenium.page_source
@@ -134,14 +132,14 @@ def test_cancel(drop_account_data, browser_session, ui_addacct_page3, ui_user):
         list API for verification with the given name and ARN.
     """
     selenium = browser_session
-    dialog = ui_addacct_page3['dialog']
+    view = ui_addacct_page3['view']
 
     assert ui_addacct_page3['dialog_add'].get_attribute('disabled')
 
     acct_arn = config.get_config()['aws_profiles'][0]['arn']
-    fill_input_by_label(selenium, dialog, 'ARN', acct_arn)
+    view.arn.fill(acct_arn)
 
-    find_element_by_text(dialog, 'Cancel').click()
+    view.cancel.click()
     find_element_by_text(selenium, 'Yes').click()
 
     pytest.raises(
@@ -180,7 +178,7 @@ def test_arn_mistakes(mistake,
         and is able to be corrected
     """
     selenium = browser_session
-    dialog = ui_addacct_page3['dialog']
+    view = ui_addacct_page3['view']
     wait = WebDriverWait(selenium, 15)
 
     assert ui_addacct_page3['dialog_add'].get_attribute('disabled')
@@ -193,16 +191,16 @@ def test_arn_mistakes(mistake,
         acct_arn = acct_arn.replace('iam::', 'iam:')
     elif mistake == 'whitespace_arn':
         acct_arn = f' {acct_arn} '
-    fill_input_by_label(selenium, dialog, 'ARN', acct_arn)
+    view.arn.fill(acct_arn)
 
     if mistake == 'fake_out_cancel':
-        find_element_by_text(dialog, 'Cancel').click()
+        view.cancel.click()
         find_element_by_text(selenium, 'No').click()
 
         # The add account dialog must still looks right after closed the cancel
         # dialog
-        value = read_input_by_label(selenium, None, 'ARN')
-        add = find_element_by_text(selenium, 'Add')
+        value = view.arn.read()
+        add = view.browser.element(view.add)
 
         assert value == acct_arn
         assert not add.get_attribute('disabled')
@@ -212,22 +210,19 @@ def test_arn_mistakes(mistake,
         assert 'You must enter a valid ARN' in selenium.page_source
 
         # The invalid ARN error must go away once the correct ARN is entered
-        fill_input_by_label(selenium, dialog, 'ARN', acct_arn_good,
-                            timeout=0.25)
+        view.arn.fill(acct_arn_good)
         assert 'You must enter a valid ARN' not in selenium.page_source
 
     elif mistake == 'invalid_arn2':
         # Trying to submit with an invalid ARN should display an error both on
         # the confirmation page and on the original form if you return
-        find_element_by_text(dialog, 'Add',
-                             timeout=0.25).click()
+        view.add.click()
         wait.until(wait_for_page_text('Invalid ARN.'))
-        find_element_by_text(dialog, 'Back').click()
+        view.back.click()
         wait.until(wait_for_page_text('Invalid ARN.'))
 
         # The error should be removed if you enter a correct ARN
-        fill_input_by_label(selenium, dialog, 'ARN', acct_arn_good,
-                            timeout=0.25)
+        view.arn.fill(acct_arn_good)
         assert find_element_by_text(selenium, 'Invalid ARN') is None
 
     elif mistake == 'whitespace_arn':
@@ -253,21 +248,21 @@ def test_incorrect_arn(drop_account_data, browser_session, ui_addacct_page3,
         then receive an error, after which they should not be able to continue.
     """
     selenium = browser_session
-    dialog = ui_addacct_page3['dialog']
+    view = ui_addacct_page3['view']
     dialog_add = ui_addacct_page3['dialog_add']
     wait = WebDriverWait(selenium, 10)
 
     acct_arn = 'arn:aws:iam::543234867065:role/Cloud-Meter-role-WRONG'
-    fill_input_by_label(selenium, dialog, 'ARN', acct_arn)
+    view.arn.fill(acct_arn)
     assert not dialog_add.get_attribute('disabled')
 
     dialog_add.click()
 
     wait.until(wait_for_page_text('Permission denied for ARN'))
 
-    assert find_element_by_text(dialog, 'Close').get_attribute('disabled')
-    assert not find_element_by_text(dialog, 'Next')
-    assert not find_element_by_text(dialog, 'Add')
+    assert view.browser.get_attribute('disabled', view.close)
+    assert not view.next.is_displayed
+    assert not view.add.is_displayed
 
 
 def test_aws_policy(drop_account_data,
@@ -313,7 +308,7 @@ def test_add_account(drop_account_data,
         list API for verification with the given name and ARN.
     """
     selenium = browser_session
-    dialog = ui_addacct_page3['dialog']
+    view = ui_addacct_page3['view']
     wait = WebDriverWait(selenium, 15)
 
     assert ui_addacct_page3['dialog_add'].get_attribute('disabled')
@@ -322,19 +317,19 @@ def test_add_account(drop_account_data,
     # The whitespace simulates some copy-and-paste behaviors
     acct_arn = ' ' + config.get_config()['aws_profiles'][0]['arn']
     acct_arn_good = acct_arn
-    fill_input_by_label(selenium, dialog, 'ARN', acct_arn)
+    view.arn.fill(acct_arn)
 
     # We also want to make sure you can go back and change a name
-    find_element_by_text(dialog, 'Back').click()
-    find_element_by_text(dialog, 'Back').click()
+    view.back.click()
+    view.back.click()
 
-    current_name = read_input_by_label(selenium, dialog, 'Account Name')
+    current_name = view.account_name.read()
     assert current_name == acct_name
     acct_name = 'Different Name'
-    fill_input_by_label(selenium, dialog, 'Account Name', acct_name)
+    view.account_name.fill(acct_name)
 
-    find_element_by_text(dialog, 'Next').click()
-    find_element_by_text(dialog, 'Next').click()
+    view.next.click()
+    view.next.click()
 
     # We want a list of current accounts so we can check our new account
     # afterwards
@@ -342,7 +337,8 @@ def test_add_account(drop_account_data,
     r = c.get(urls.CLOUD_ACCOUNT).json()
     accounts = [a for a in r['results'] if a['user_id'] == ui_user['id']]
 
-    find_element_by_text(dialog, 'Add', timeout=1).click()
+    view.add.wait_displayed(1)
+    view.add.click()
 
     try:
         wait = WebDriverWait(selenium, ACCT_CREATE_TIMEOUT)
@@ -357,7 +353,7 @@ def test_add_account(drop_account_data,
             'message to indicate successful creation.'
         )
 
-    find_element_by_text(dialog, 'Close').click()
+    view.close.click()
     sleep(0.25)
 
     # We don't see the welcome screen anymore
@@ -0,0 +1,191 @@
+"""Smoke tests of the UI expectations, checked without a browser.
+
+These tests inject the same data as the browser tests, and check the texts
+the UI would show for it against the reports the UI is built from, see
+:mod:`integrade.tests.ui.api_view`. They run in a fraction of the time, so
+they cover many more combinations of tags and events. Run them on their own
+with::
+
+    py.test integrade/tests/ui/test_api_smoke.py
+
+:caseautomation: automated
+:casecomponent: ui
+:caseimportance: high
+:caselevel: integration
+:requirement: Cloud Meter
+:testtype: functional
+:upstream: yes
+"""
+from random import randint
+
+import pytest
+
+from integrade.tests.utils import get_time_range
+from integrade.utils import format_timestamp, utc_timestamp
+
+from .api_view import AccountSummaryView, format_hours, runtime_seconds
+from .conftest import CLOUD_ACCOUNT_NAME
+
+TAGS = ('', 'rhel', 'openshift', 'rhel,openshift')
+TAG_NAMES = ('No Tag', 'RHEL', 'Openshift', 'RHEL and Openshift')
+
+
+def expected_hours(tag, hours):
+    """Return the RHEL and RHOCP texts of an image tagged ``tag``."""
+    return {
+        '{}RHEL'.format(hours if 'rhel' in tag else 0),
+        '{}RHOCP'.format(hours if 'openshift' in tag else 0),
+    }
+
+
+@pytest.fixture
+def report_window():
+    """Return the start and end of the reports, as timestamps.
+
+    The expected hours are computed over the same window the reports are
+    requested for.
+    """
+    return tuple(
+        utc_timestamp(t) for t in get_time_range(formatted=False))
+
+
+def window_hours(events, report_window):
+    """Return the hours of an instance with ``events`` in the window."""
+    return format_hours(runtime_seconds(events, *report_window))
+
+
+@pytest.fixture
+def summary_view(cloud_account_data, ui_user_auth, report_window):
+    """Return a factory of the account summary list, once data is reported."""
+    start, end = (format_timestamp(t) for t in report_window)
+
+    def _():
+        cloud_account_data.wait_until_reported()
+        return AccountSummaryView(ui_user_auth, start=start, end=end)
+    return _
+
+
+def test_empty(cloud_account_data, summary_view):
+    """Account summaries show 0 images, instances and hours without data.
+
+    :id: 67f682c5-6a3b-4311-a24b-cc9e1e50b707
+    :description: An account without any observed instances should show 0
+        counts and hours.
+    :steps:
+        1) Add a cloud account
+        2) Request the accounts report like the UI
+    :expectedresults:
+        The account summary shows 0 images, instances, RHEL and RHOCP hours
+    """
+    texts = summary_view().texts(CLOUD_ACCOUNT_NAME)
+    assert {'0 Images', '0 Instances', '0RHEL', '0RHOCP'} <= texts, texts
+
+
+@pytest.mark.parametrize('tag', TAGS, ids=TAG_NAMES)
+@pytest.mark.parametrize('start', (45, 31, 30, 29, 28, 15, 2))
+def test_running(start, tag, cloud_account_data, summary_view,
+                 report_window):
+    """Instances left running count once, with the hours of their tags.
+
+    :id: 0d0f25d0-6aa6-4901-a8f9-a2f34fd5b84d
+    :description: An instance started in the past and not stopped yet should
+        be counted in the summary with its image, whatever the tags of the
+        image, and its hours in the report window should count for its
+        tags.
+    :steps:
+        1) Add a cloud account
+        2) Create an instance of a tagged image started some days ago
+        3) Request the accounts and images reports like the UI
+    :expectedresults:
+        - The account summary counts 1 image and 1 instance
+        - The RHEL and RHOCP hours of the account and its image are the
+          hours of the instance for the tags of the image, 0 otherwise
+    """
+    ec2_ami_id = 'ami-{}'.format(randint(1000, 99999))
+    hours = window_hours([start], report_window)
+    cloud_account_data(tag, [start], ec2_ami_id=ec2_ami_id)
+
+    summary = summary_view()
+    texts = summary.texts(CLOUD_ACCOUNT_NAME)
+    assert {'1 Images', '1 Instances'} <= texts, texts
+    assert expected_hours(tag, hours) <= texts, texts
+
+    detail = summary.detail(CLOUD_ACCOUNT_NAME)
+    texts = detail.texts(ec2_ami_id)
+    assert expected_hours(tag, hours) <= texts, texts
+
+
+def test_reused_image(cloud_account_data, summary_view):
+    """An image used by multiple instances only counts once in the summary.
+
+    :id: 9b1106f8-bb80-4381-87b6-7ef487bf0c42
+    :description: Multiple instances using the same image should not cause
+        the image to be counted multiple times.
+    :steps:
+        1) Add a cloud account
+        2) Create data for three instances with the same AMI ID
+        3) Request the accounts report like the UI
+    :expectedresults:
+        There should be 3 instances and only 1 image
+    """
+    for _ in range(3):
+        cloud_account_data('', [10], ec2_ami_id='image1')
+
+    texts = summary_view().texts(CLOUD_ACCOUNT_NAME)
+    assert {'1 Images', '3 Instances'} <= texts, texts
+
+
+def test_account_names(cloud_account_data, summary_view):
+    """Every account of the user is listed by name, even very long names.
+
+    :id: 58d86b35-ceb8-4f24-a766-9e50ff9c6586
+    :description: The account summary list should include every account, by
+        name, including accounts with long names.
+    :steps:
+        1) Add a cloud account, and another one with a long name
+        2) Create an instance in the account with the long name
+        3) Request the accounts report like the UI
+    :expectedresults:
+        Both accounts are listed with their names, and the instance is
+        counted in the account with the long name only
+    """
+    long_name = 'x ' * 127
+    cloud_account_data('', [15], name=long_name)
+
+    summary = summary_view()
+    texts = summary.texts(CLOUD_ACCOUNT_NAME)
+    assert {CLOUD_ACCOUNT_NAME, '0 Instances'} <= texts, texts
+    texts = summary.texts(long_name)
+    assert {long_name, '1 Images', '1 Instances'} <= texts, texts
+
+
+@pytest.mark.parametrize('tag', TAGS, ids=TAG_NAMES)
+@pytest.mark.parametrize(
+    'events', (
+        [2, 1],
+        [45, 25],
+        [45, 29, 15, 14, 1],
+    )
+)
+def test_image_hours(events, tag, cloud_account_data, summary_view,
+                     report_window):
+    """The account detail view lists each image with its hours.
+
+    :id: 44314e51-c279-4fad-8574-988d7a5fe784
+    :description: Test the images report the account detail view is built
+        from shows the hours of each image for its tags.
+    :steps:
+        1) Given a user and cloud account, mock usage for an image.
+        2) Request the images report of the account like the UI
+    :expectedresults:
+        The image is listed in the detail view with the hours it ran for its
+        tags, and 0 hours for the other products.
+    """
+    ec2_ami_id = 'ami-{}'.format(randint(1000, 99999))
+    hours = window_hours(events, report_window)
+    cloud_account_data(tag, events, ec2_ami_id=ec2_ami_id)
+
+    detail = summary_view().detail(CLOUD_ACCOUNT_NAME)
+    texts = detail.texts()
+    assert ec2_ami_id in texts, texts
+    assert expected_hours(tag, hours) <= detail.texts(ec2_ami_id), texts
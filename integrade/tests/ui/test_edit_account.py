@@ -15,6 +15,7 @@ from .utils import (
     find_element_by_text,
     page_has_text,
 )
+from .views import AccountListView, browser_for
 from ...injector import (
     inject_aws_cloud_account,
     inject_instance_data,
@@ -23,10 +24,8 @@ from ...injector import (
 
 def open_account_menu(browser_session, name):
     """Open the menu for a given account by name."""
-    path = "./ancestor::*[contains(@class, 'list-group-item')]"
-    el = find_element_by_text(browser_session, name)
-    el = el.find_element_by_xpath(path)
-    el.find_element_by_class_name('dropdown-toggle').click()
+    accounts = browser_for(browser_session).view(AccountListView)
+    accounts.account(name).menu.click()
 
 
 def test_edit_account_name(drop_account_data, browser_session, ui_dashboard,
@@ -83,7 +82,7 @@ def test_account_delete(
         cloud_account_data('', [10], ec2_ami_id='image1')
 
     inject_instance_data(acct2['id'], '', [10], ec2_ami_id='image1')
-    browser_session.refresh()
+    cloud_account_data.refresh_when_reported(browser_session)
 
     find_element_by_text(browser_session, 'Second Account')
 
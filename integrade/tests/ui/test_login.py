@@ -21,6 +21,9 @@ from .utils import find_element_by_text, wait_for_input_value, \
 
 logger = logging.getLogger(__name__)
 
+# Log in through the form, which is what these tests are about, rather than
+# by injecting an auth token.
+UI_FORM_LOGIN = True
 
 CHECK_VALID = 'return document.getElementById("email").matches(":valid")'
 
@@ -130,7 +133,7 @@ def test_logout(new_session, browser_session, ui_dashboard, ui_user):
     assert not logout or not logout.is_displayed()
     menu = find_element_by_text(browser_session, ui_user['username'])
     if not menu:
-        raise ValueError(browser_session.page_source)
+        raise ValueError(f'No user menu {ui_user["username"]!r} in page')
     assert menu.is_displayed(), browser_session.get_window_size()
     menu.click()
     wait.until(wait_for_page_text('Logout'))
@@ -3,11 +3,49 @@ import time
 
 from selenium.common.exceptions import (
     InvalidElementStateException,
+    JavascriptException,
     StaleElementReferenceException,
+    TimeoutException,
     WebDriverException,
 )
+from selenium.webdriver.remote.webelement import WebElement
 
-from ..conftest import timemetric
+from integrade import tracing
+from integrade.utils import poll
+
+SCRIPT_TIMEOUT = 30
+"""The WebDriver default script timeout, in seconds."""
+
+
+def _wait_in_page(driver, script, timeout, *args):
+    """Run a script waiting in the page for up to ``timeout`` seconds.
+
+    The script is given ``args`` followed by the time left in milliseconds,
+    and calls back with its result. If the page navigates away while the
+    script is waiting, it is run again on the new page for the time left.
+
+    The script timeout of the driver is set for each run, and set back to
+    :data:`SCRIPT_TIMEOUT` once done.
+
+    :returns: The result of the script, or None if time ran out before it
+        could call back.
+    """
+    end = time.monotonic() + timeout
+
+    def run():
+        remaining = max(0, end - time.monotonic())
+        # The script waits in the page, give it a little longer to answer.
+        driver.set_script_timeout(remaining + 1)
+        try:
+            return driver.execute_async_script(
+                script, *args, int(remaining * 1000))
+        except (JavascriptException, TimeoutException):
+            return None
+
+    try:
+        return poll(run, timeout, until=lambda result: result is not None)
+    finally:
+        driver.set_script_timeout(SCRIPT_TIMEOUT)
 
 
 class wait_for_input_value(object):
@@ -49,13 +87,180 @@ class wait_for_result(object):
 
     def __call__(self, driver):
         """Check if the expected check appears in the page yet."""
-        start = time.time()
-        end = start + self.timeout
-        while time.time() < end:
-            retval = self.func(*self.args, **self.kwargs)
-            if retval:
-                return retval
-        return None
+        name = getattr(self.func, '__name__', 'wait_for_result')
+        with tracing.span(name, 'wait'):
+            retval = poll(
+                lambda: self.func(*self.args, **self.kwargs), self.timeout)
+        return retval or None
+
+
+# Functions shared by the scripts the UI helpers run in the page. pageToken()
+# changes whenever the page navigates, either to a new document or to another
+# route of the single page app. describe() returns what the helpers need to
+# know about an element right now: its depth below body, its innerText with
+# whitespace collapsed and whether it is visible.
+_ELEMENT_INFO_JS = """
+function pageToken() {
+    if (!window.__integradePage) {
+        window.__integradePage = Date.now() + '-' + Math.random()
+    }
+    return window.__integradePage + ' ' + location.href
+}
+
+function describe(el) {
+    var depth = 1
+    if (!/^(html|body)$/i.test(el.tagName)) {
+        var n = el.parentNode
+        while (n && n.tagName && !/^(html|body)$/i.test(n.tagName)) {
+            depth++
+            n = n.parentNode
+        }
+    }
+    return {
+        depth: depth,
+        text: (el.innerText || '').split(/\\s+/).filter(Boolean).join(' '),
+        visible: el.offsetParent !== null,
+    }
+}
+"""
+
+DESCRIBE_ELEMENTS_JS = _ELEMENT_INFO_JS + """
+return arguments[0].map(describe)
+"""
+
+PAGE_STATE_JS = _ELEMENT_INFO_JS + """
+var texts = arguments[0].map((el) => el.isConnected && el.textContent)
+return [pageToken(), texts]
+"""
+
+
+def _get_driver(element):
+    """Return the driver an element, or a driver, belongs to."""
+    while isinstance(element, WebElement):
+        element = element.parent
+    return element
+
+
+def describe_elements(elements):
+    """Return the depth, text and visibility of a list of elements.
+
+    Everything is read in a single ``execute_script`` call, instead of one
+    WebDriver call per element and per ancestor. Nothing is cached, since the
+    UI changes texts and visibility in place without navigating.
+
+    :param elements: A list of WebElements, all of the same page.
+    :returns: A list with a dictionary for each element, with its ``depth``
+        counting from body, its ``text``, which is its innerText with
+        whitespace collapsed, and whether it is ``visible``.
+    """
+    if not elements:
+        return []
+    driver = _get_driver(elements[0])
+    return driver.execute_script(DESCRIBE_ELEMENTS_JS, elements)
+
+
+class ElementCache(object):
+    """Elements located in a page, kept while the page shows them unchanged.
+
+    Checking cached elements are still valid takes a single
+    ``execute_script`` call. Once the page navigates, as told by a token
+    changing on every navigation, the whole cache is cleared. Elements which
+    were detached from the document, or whose text changed, are dropped:
+    the UI may render different content in the same elements, like the
+    buttons of a wizard going from one step to the next.
+
+    :param driver: The driver of the page.
+    """
+
+    def __init__(self, driver):
+        """Start empty."""
+        self.driver = driver
+        self._page = None
+        self._elements = {}
+
+    def _state(self, elements):
+        """Return the page token and the text of each attached element."""
+        return self.driver.execute_script(PAGE_STATE_JS, elements)
+
+    def get(self, key):
+        """Return the elements cached under ``key``, or None."""
+        if key not in self._elements:
+            return None
+        elements, texts = self._elements[key]
+        page, current = self._state(elements)
+        if page != self._page:
+            self.clear()
+            return None
+        if current != texts:
+            del self._elements[key]
+            return None
+        return elements
+
+    def put(self, key, elements):
+        """Cache the elements just located for ``key``.
+
+        Nothing is cached when none were found, they may show up later.
+        """
+        if not elements:
+            return
+        page, texts = self._state(elements)
+        if page != self._page:
+            self.clear()
+            self._page = page
+        if all(text is not False for text in texts):
+            self._elements[key] = (elements, texts)
+
+    def clear(self):
+        """Forget every cached element."""
+        self._elements.clear()
+
+
+def _locator_path(widget):
+    """Return the resolved locators of a widget and its locatable parents.
+
+    Widgets of parametrized views are created anew on each access, so they
+    are told apart by where they point to, not by identity.
+    """
+    path = []
+    while widget is not None:
+        locator = widget.__locator__()
+        if isinstance(locator, dict):
+            locator = tuple(sorted(locator.items()))
+        elif not isinstance(locator, str):
+            locator = repr(locator)
+        path.append(locator)
+        widget = widget.locatable_parent
+    return tuple(path)
+
+
+class CachedElementsMixin(object):
+    """Make a widgetastic browser reuse the elements its widgets located.
+
+    Widgets locate their element, and the elements of every parent view,
+    each time they are used. Here, the elements located for a widget are
+    kept in the :class:`ElementCache` of the browser, its ``element_cache``,
+    keyed by the locators of the widget and of its parent. Elements looked
+    up by locator, within an element, or filtered by visibility, are always
+    looked up again, since more of them may show up without navigating.
+    """
+
+    def elements(self, locator, parent=None, check_visibility=False,
+                 *args, **kwargs):
+        """Locate the elements of a widget, from the cache if possible."""
+        if (check_visibility or not hasattr(locator, '__locator__') or
+                parent is not None and not hasattr(parent, '__locator__')):
+            return super().elements(
+                locator, parent, check_visibility, *args, **kwargs)
+        key = (
+            _locator_path(locator),
+            None if parent is None else _locator_path(parent),
+        )
+        elements = self.element_cache.get(key)
+        if elements is None:
+            elements = super().elements(
+                locator, parent, check_visibility, *args, **kwargs)
+            self.element_cache.put(key, elements)
+        return elements
 
 
 def get_element_depth(element):
@@ -64,31 +269,119 @@ def get_element_depth(element):
     Used to find the most specific element out of a set of matching
     elements for a condition where an element and its ancestors might match.
     """
-    depth = 1
-    if element.tag_name.lower() in ('html', 'body'):
-        return depth
-    next_element = element.find_element_by_xpath('..')
-    while next_element.tag_name.lower() not in ('html', 'body'):
-        depth += 1
-        assert depth < 100
-
-        next_element = next_element.find_element_by_xpath('..')
-    return depth
+    return describe_elements([element])[0]['depth']
 
 
 def get_el_text(e):
-    """Get the inner text of a WebElement and cache for quicker re-lookup."""
+    """Get the inner text of a WebElement, with whitespace collapsed."""
     try:
-        try:
-            return e.__innerText
-        except AttributeError:
-            text = ' '.join(e.get_attribute('innerText').split())
-            e.__innerText = text
-            return e.__innerText
+        return describe_elements([e])[0]['text']
     except StaleElementReferenceException:
         return ''
 
 
+# Search for elements by their whitespace-collapsed text, in the page. If none
+# is found right away, a MutationObserver searches again whenever the page
+# changes, at most once per animation frame, and the elements are returned as
+# soon as they show up. This replaces polling the page from Python with one
+# WebDriver call per search.
+FIND_ELEMENTS_BY_TEXT_JS = """
+var ctx = arguments[0]
+var text = normalize(arguments[1])
+var exact = arguments[2]
+var selector = arguments[3]
+var timeout = arguments[4]
+var done = arguments[arguments.length - 1]
+
+function depth(top, el) {
+    var n = el.parentNode
+    var d = 0
+    while (n && n != top) {
+        d++
+        n = n.parentNode
+    }
+    return d
+}
+
+function normalize(content) {
+    return content.replace(/\\s+/g, ' ').trim()
+}
+
+function search() {
+    var root = ctx || document.documentElement
+    if (normalize(root.textContent).indexOf(text) < 0) {
+        return []
+    }
+
+    // Match each element against its whole text, like XPath's contains(.),
+    // so text split across sibling nodes is found. An element whose text
+    // lacks the text has no descendant holding it either, so only descend
+    // into the elements that contain it instead of checking the whole page.
+    var matches = []
+    var pending = [root]
+    while (pending.length) {
+        var el = pending.pop()
+        var content = normalize(el.textContent)
+        if (content.indexOf(text) < 0) {
+            continue
+        }
+        var check = !exact || content == text
+        var visible = el.offsetParent !== null
+        if (el !== ctx && check && el.matches(selector) && visible) {
+            matches.push({
+                el: el,
+                length: content.length,
+                depth: depth(document.body, el),
+            })
+        }
+        pending.push(...el.children)
+    }
+
+    // The most specific elements first: the shortest, then the deepest.
+    matches.sort((a, b) => (a.length - b.length) || (b.depth - a.depth))
+    return matches.map((match) => match.el)
+}
+
+function finish(found) {
+    done(found)
+}
+
+var found = search()
+if (found.length || timeout <= 0) {
+    finish(found)
+    return
+}
+
+var scheduled = false
+var timer = null
+var observer = new MutationObserver(() => {
+    if (scheduled) {
+        return
+    }
+    scheduled = true
+    requestAnimationFrame(() => {
+        scheduled = false
+        var found = search()
+        if (found.length) {
+            observer.disconnect()
+            clearTimeout(timer)
+            finish(found)
+        }
+    })
+})
+observer.observe(ctx || document.documentElement, {
+    attributes: true,
+    characterData: true,
+    childList: true,
+    subtree: true,
+})
+timer = setTimeout(() => {
+    observer.disconnect()
+    finish(search())
+}, timeout)
+"""
+
+
 def find_element_by_text(driver, text, *args, **kwargs):
     """Find an element which contains the given text.
 
@@ -108,93 +401,43 @@ def find_element_by_text(driver, text, *args, **kwargs):
     - fail_hard=False   If True, raise exception on failure to locate
     - exact=True        Only locate elements that exactly match the text. If
                         False, locate elements which contain the text somewhere
-                        in their content. (See n parameter description for the
-                        affects on specificity)
-    - timeout=0.1       Time to spend re-checking for text to appear on page.
-                        Larger values behave as a "wait for..." search for the
-                        text.
+                        in their content.
+    - selector='*'      Only locate elements matching this CSS selector.
+    - timeout=None      Time to wait for the text to appear on page, 5 seconds
+                        by default.
 
     """
     fail_hard = kwargs.pop('fail_hard', False)
     elements = find_elements_by_text(driver, text, *args, **kwargs)
-    # elements.sort(key=lambda e: (len(get_el_text(e)), -get_element_depth(e)))
 
     if fail_hard and not elements:
-        raise ValueError(
-            'Did not find in page: %r\n%s' %
-            (text, driver.page_source)
-        )
+        raise ValueError('Did not find in page: %r' % text)
     elif elements:
         return elements[0]
 
 
 def find_elements_by_text(driver, text,
-                          n=0,
                           exact=True,
                           selector='*',
                           timeout=None):
-    """Find an element which contains the given text."""
-    if driver.__class__.__name__ == 'WebElement':
+    """Find the elements which contain the given text.
+
+    See :func:`find_element_by_text` for the parameters.
+
+    :returns: The elements found, the most specific first, or None.
+    """
+    if isinstance(driver, WebElement):
         element = driver
-        while driver.__class__.__name__ == 'WebElement':
-            driver = driver._parent
+        driver = _get_driver(element)
     else:
         element = None
 
-    start = time.time()
-    end = start + (timeout or 5)
-
-    with timemetric('find_elements_by_text()'):
-        while time.time() < end:
-            elements = driver.execute_script("""
-            var ctx = arguments[0]
-            var text = arguments[1]
-            var exact = arguments[2]
-            var selector = arguments[3]
-
-            function depth(top, el) {
-                var n = el.parentNode
-                var d = 0
-                while (n && n != top) {
-                    d++
-                    n = n.parentNode
-                }
-                return d
-            }
-
-            var all = (ctx || document).querySelectorAll(selector)
-            var check = (el) => el.textContent.indexOf(text) > -1
-            if (exact) {
-                check = (el) => el.textContent.trim() == text
-            }
-
-            var elements = Array.prototype.filter.call(all, check)
-            elements = Array.prototype.filter.call(elements,
-                (el) => el.offsetParent !== null
-            )
-
-            elements.sort((a, b) => {
-                if (a.textContent.length < b.textContent.length) {
-                    return true
-                } else if (a.textContent.length > b.textContent.length) {
-                    return false
-                } else {
-                    return depth(document.body, a) < depth(document.body, b)
-                }
-            })
-
-            /* uncomment for debugging */
-            /*window.last_results = {
-                target: ctx,
-                all: all,
-                elements: elements,
-            }*/ /* uncomment for debugging */
-
-            return elements
-            """, element, text, exact, selector)
-
-            if elements:
-                return elements
+    with tracing.span('find_elements_by_text', 'ui', text=text):
+        result = _wait_in_page(
+            driver, FIND_ELEMENTS_BY_TEXT_JS, timeout or 5,
+            element, text, exact, selector)
+    if result:
+        return result
 
 
 def fill_input_by_label(driver, element, label, value, timeout=None):
@@ -220,36 +463,6 @@ def fill_input_by_label(driver, element, label, value, timeout=None):
     return input
 
 
-def fill_input_by_placeholder(driver, element, label, value):
-    """Click on a field label and enter text to the associated input."""
-    css_sel = '[placeholder="%s"]' % label
-    input = (element or driver).find_element_by_css_selector(css_sel)
-    input.clear()
-    input.send_keys(value)
-    return input
-
-
-def read_input_by_label(driver, element, label):
-    """Click on a field label and read text from the associated input."""
-    value = None
-
-    @retry_w_timeout(1)
-    def _():
-        nonlocal value
-
-        el = find_element_by_text(element or driver, label, selector='label')
-        try:
-            el.click()
-        except WebDriverException as e:
-            return e
-        input = driver.execute_script('return document.activeElement')
-        value = input.get_attribute('value')
-
-        return value
-
-    return value
-
-
 def retry_w_timeout(t, func=None, *args, **kwargs):
     """Retry a function until it returns truthy or a timeout occures."""
     if func is None:
@@ -257,15 +470,17 @@ def retry_w_timeout(t, func=None, *args, **kwargs):
             return retry_w_timeout(t, func, *args, **kwargs)
         return dec
     else:
-        start = time.time()
-        end = start
-        while end - start < t:
-            retval = func(*args, **kwargs)
-            if retval and not isinstance(retval, BaseException):
-                return retval
-            end = time.time()
+        name = getattr(func, '__name__', 'retry_w_timeout')
+        with tracing.span(name, 'wait'):
+            retval = poll(
+                lambda: func(*args, **kwargs),
+                t,
+                until=lambda r: r and not isinstance(r, BaseException),
+            )
         if isinstance(retval, BaseException):
             raise retval
+        elif retval:
+            return retval
 
 
 def _page_has_text(driver, text):
@@ -291,6 +506,223 @@ def element_has_text(element, text, timeout=5):
     return retry_w_timeout(timeout, _element_has_text, element, text)
 
 
+# Count the fetch and XHR requests of the page, to tell when it stops talking
+# to the API. Requests already running when the counter is installed are not
+# counted, install_network_counter() installs it before any script of the
+# page runs where the browser allows it.
+NETWORK_COUNTER_JS = """
+(function () {
+    if (window.__integradeNetwork) {
+        return
+    }
+    var net = window.__integradeNetwork = {pending: 0, last: Date.now()}
+    function start() {
+        net.pending++
+        net.last = Date.now()
+    }
+    function end() {
+        net.pending = Math.max(0, net.pending - 1)
+        net.last = Date.now()
+    }
+    if (window.fetch) {
+        var fetch = window.fetch
+        window.fetch = function () {
+            start()
+            return fetch.apply(this, arguments).then(
+                (response) => {
+                    end()
+                    return response
+                },
+                (error) => {
+                    end()
+                    throw error
+                }
+            )
+        }
+    }
+    var send = XMLHttpRequest.prototype.send
+    XMLHttpRequest.prototype.send = function () {
+        start()
+        this.addEventListener('loadend', end)
+        try {
+            return send.apply(this, arguments)
+        } catch (error) {
+            end()
+            throw error
+        }
+    }
+})()
+"""
+
+WAIT_FOR_NETWORK_IDLE_JS = NETWORK_COUNTER_JS + """
+var idle = arguments[0]
+var timeout = arguments[1]
+var done = arguments[arguments.length - 1]
+var net = window.__integradeNetwork
+var start = Date.now()
+var end = start + timeout
+
+function check() {
+    var now = Date.now()
+    // Requests started by whatever the caller just did may not have started
+    // yet, so the page must stay quiet for a while after the call too.
+    var quiet = now - Math.max(net.last, start)
+    if (!net.pending && document.readyState == 'complete' && quiet >= idle) {
+        done(true)
+    } else if (now >= end) {
+        done(false)
+    } else {
+        setTimeout(check, net.pending ? 50 : Math.max(10, idle - quiet))
+    }
+}
+check()
+"""
+
+# Wait until an element, or the chart drawn in it, stops changing: until its
+# position, size and content are the same for a while.
+WAIT_FOR_STABLE_JS = """
+var el = arguments[0]
+var selector = arguments[1]
+var stable = arguments[2]
+var timeout = arguments[3]
+var done = arguments[arguments.length - 1]
+var end = Date.now() + timeout
+var last = null
+var since = Date.now()
+
+function drawn(chart) {
+    var shapes = chart.querySelectorAll('path, rect, circle, line')
+    return Array.prototype.some.call(shapes, (shape) => {
+        var box = shape.getBBox()
+        return box.width > 0 || box.height > 0
+    })
+}
+
+function snapshot() {
+    var target = el
+    if (selector) {
+        target = el.querySelector(selector)
+        if (!target || !drawn(target)) {
+            return null
+        }
+    }
+    var rect = target.getBoundingClientRect()
+    return [
+        rect.top, rect.left, rect.width, rect.height,
+        selector ? target.innerHTML : target.innerText,
+    ].join('|')
+}
+
+function check() {
+    if (!el.isConnected) {
+        done(false)
+        return
+    }
+    var now = Date.now()
+    var current = snapshot()
+    if (current === null || current !== last) {
+        last = current
+        since = now
+    } else if (now - since >= stable) {
+        done(true)
+        return
+    }
+    if (now >= end) {
+        done(false)
+    } else {
+        setTimeout(check, 20)
+    }
+}
+check()
+"""
+
+
+def install_network_counter(driver):
+    """Count the requests of every page the browser loads from now on.
+
+    Only browsers speaking the Chrome DevTools protocol can run a script
+    before the scripts of a page. Elsewhere the counter is installed by
+    :func:`wait_for_network_idle` when it first runs on a page.
+    """
+    try:
+        driver.execute_cdp_cmd(
+            'Page.addScriptToEvaluateOnNewDocument',
+            {'source': NETWORK_COUNTER_JS})
+    except (AttributeError, WebDriverException):
+        pass
+
+
+def check_waited(done, what):
+    """Raise a TimeoutException unless a wait for ``what`` is ``done``.
+
+    The wait helpers return whether the condition was met, check their
+    result with this where the caller can't go on without it.
+    """
+    if not done:
+        raise TimeoutException(f'Timed out waiting for {what}')
+
+
+def wait_for_network_idle(driver, idle=0.5, timeout=10):
+    """Wait until the page is loaded and made no request for a while.
+
+    The page must stay quiet for at least ``idle`` seconds after the call,
+    so requests triggered by a click or navigation right before have time to
+    start.
+
+    :param idle: How many seconds without any fetch or XHR request running
+        make the page idle.
+    :returns: Whether the page went idle before the timeout.
+    """
+    with tracing.span('wait_for_network_idle', 'wait'):
+        return bool(_wait_in_page(
+            driver, WAIT_FOR_NETWORK_IDLE_JS, timeout, int(idle * 1000)))
+
+
+def wait_for_element_stable(element, stable=0.2, timeout=5):
+    """Wait until an element stops moving, resizing and changing its text.
+
+    Use it after expanding, collapsing or otherwise animating parts of the
+    page.
+
+    :param stable: How many seconds the element must stay the same.
+    :returns: Whether the element was stable before the timeout.
+    """
+    driver = _get_driver(element)
+    with tracing.span('wait_for_element_stable', 'wait'):
+        return bool(_wait_in_page(
+            driver, WAIT_FOR_STABLE_JS, timeout,
+            element, None, int(stable * 1000)))
+
+
+def wait_for_chart(element, selector='svg', stable=0.3, timeout=5):
+    """Wait until a chart is drawn in an element and its transitions ended.
+
+    :param element: The element containing the chart, like a graph card.
+    :param selector: A CSS selector matching the chart in the element.
+    :param stable: How many seconds the chart must stay the same.
+    :returns: Whether the chart was drawn before the timeout.
+    """
+    driver = _get_driver(element)
+    with tracing.span('wait_for_chart', 'wait'):
+        return bool(_wait_in_page(
+            driver, WAIT_FOR_STABLE_JS, timeout,
+            element, selector, int(stable * 1000)))
+
+
+def wait_for_count(driver, selector, count, timeout=5):
+    """Wait until exactly ``count`` elements match a CSS selector.
+
+    :param driver: The driver, or an element to search in.
+    :returns: The matching elements, as of the last check.
+    """
+    with tracing.span('wait_for_count', 'wait', selector=selector):
+        return poll(
+            lambda: driver.find_elements_by_css_selector(selector),
+            timeout,
+            until=lambda elements: len(elements) == count,
+        )
+
+
 def elem_parent(elem):
     """Return the parent of a given element."""
     return elem.find_element_by_xpath('..')
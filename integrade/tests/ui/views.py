@@ -1,8 +1,70 @@
-"""Cloudigrade views."""
-from widgetastic.widget import TextInput, View
+"""Cloudigrade views.
+
+Get views with :meth:`CachedBrowser.view`, from the browser bound to a driver
+by :func:`browser_for`. Both are created once per driver and reused by every
+test the driver of the pool serves, and the elements their widgets locate are
+reused until the page navigates or changes them.
+"""
+import weakref
+
+from selenium.webdriver.common.keys import Keys
+
+from widgetastic.browser import Browser
+from widgetastic.utils import ParametrizedLocator
+from widgetastic.widget import ParametrizedView, Text, TextInput, View
+from widgetastic.xpath import quote
 
 from widgetastic_patternfly import Button
 
+from .utils import (
+    CachedElementsMixin,
+    ElementCache,
+    check_waited,
+    wait_for_element_stable,
+    wait_for_network_idle,
+)
+
+_BROWSERS = weakref.WeakKeyDictionary()
+"""The browser bound to each driver, dropped along with the driver."""
+
+
+class CachedBrowser(CachedElementsMixin, Browser):
+    """A browser whose widgets reuse the elements they already located.
+
+    The elements located for a widget are cached until the page navigates or
+    re-renders them, see
+    :class:`integrade.tests.ui.utils.CachedElementsMixin`.
+    """
+
+    def __init__(self, selenium, *args, **kwargs):
+        """Bind to ``selenium``, with an empty cache."""
+        super().__init__(selenium, *args, **kwargs)
+        self.element_cache = ElementCache(selenium)
+        self._views = {}
+
+    def view(self, view_class):
+        """Return the instance of ``view_class`` bound to this browser."""
+        if view_class not in self._views:
+            self._views[view_class] = view_class(self)
+        return self._views[view_class]
+
+
+def browser_for(driver):
+    """Return the browser bound to ``driver``, created on first use.
+
+    The browser only holds a weak proxy of the driver, so both are dropped
+    once the driver is.
+    """
+    browser = _BROWSERS.get(driver)
+    if browser is None:
+        browser = _BROWSERS[driver] = CachedBrowser(weakref.proxy(driver))
+    return browser
+
+
+def _labeled_input(label):
+    """Return the locator of the input labeled ``label``."""
+    return f'.//input[@id=//label[normalize-space(.)="{label}"]/@for]'
+
 
 class LoginView(View):
     """Login Form UI. Helper to test login form behavior."""
@@ -10,3 +72,98 @@ class LoginView(View):
     login = Button('Log In', classes=[Button.PRIMARY])
     username = TextInput(locator='#email')
     password = TextInput(locator='#password')
+
+
+class AccountListView(View):
+    """The account summary list, shown once logged in."""
+
+    add_account = Button('Add Account')
+    filter = TextInput(locator='.//input[@placeholder="Filter by Name"]')
+    clear_filters = Text('.//*[normalize-space(.)="Clear All Filters"]')
+
+    class account(ParametrizedView):
+        """The summary row of the account named ``name``."""
+
+        PARAMETERS = ('name',)
+        ROOT = ParametrizedLocator(
+            './/*[contains(@class, "list-group-item")]'
+            '[.//*[normalize-space(.)={name|quote}]]')
+
+        name = Text(ParametrizedLocator(
+            './/*[normalize-space(.)={name|quote}]'))
+        menu = Text('.//*[contains(@class, "dropdown-toggle")]')
+
+    def filter_by_name(self, name):
+        """Filter the accounts listed by ``name``."""
+        self.filter.fill(name)
+        self.browser.send_keys(Keys.RETURN, self.filter)
+        check_waited(
+            wait_for_network_idle(self.browser.selenium),
+            f'the accounts filtered by {name!r} to load')
+
+    def open_account(self, name, timeout=5):
+        """Open the detail view of the account named ``name``."""
+        account = self.account(name)
+        account.name.wait_displayed(timeout)
+        account.name.click()
+        check_waited(
+            wait_for_network_idle(self.browser.selenium),
+            f'the detail view of the account {name!r} to load')
+        return self.browser.view(AccountDetailView)
+
+
+class AccountDetailView(View):
+    """The detail view of an account, listing the images it ran."""
+
+    summary = Text('.//*[contains(@class, "cloudmeter-list-view-card")]')
+
+    class image(ParametrizedView):
+        """The row of the image ``ec2_ami_id``."""
+
+        PARAMETERS = ('ec2_ami_id',)
+        ROOT = ParametrizedLocator(
+            './/*[contains(@class, "list-group-item")]'
+            '[.//*[normalize-space(.)={ec2_ami_id|quote}]]')
+
+        ec2_ami_id = Text(ParametrizedLocator(
+            './/*[normalize-space(.)={ec2_ami_id|quote}]'))
+        info = Text('.//*[contains(@class, "list-view-pf-main-info")]')
+
+        def expand(self):
+            """Show or hide the tags of the image, by clicking its ID."""
+            self.ec2_ami_id.click()
+            check_waited(
+                wait_for_element_stable(self.browser.element(self.info)),
+                f'the image {self.context["ec2_ami_id"]!r} to expand or '
+                'collapse')
+
+        def flag(self, label):
+            """Click the flag checkbox labeled ``label`` of the image.
+
+            The image must be expanded first, see :meth:`expand`.
+            """
+            self.browser.click(
+                f'.//label[normalize-space(.)={quote(label)}]', parent=self)
+            check_waited(
+                wait_for_network_idle(self.browser.selenium),
+                f'the {label!r} flag of the image '
+                f'{self.context["ec2_ami_id"]!r} to be saved')
+
+        def flags(self):
+            """Return how many of the tags of the image are flagged."""
+            return len(self.browser.elements(
+                './/*[contains(@class, "fa-flag")]', parent=self.info))
+
+
+class AddAccountView(View):
+    """The Add Account dialog, through all its pages."""
+
+    ROOT = '//*[@role="dialog"]'
+
+    account_name = TextInput(locator=_labeled_input('Account Name'))
+    arn = TextInput(locator=_labeled_input('ARN'))
+    back = Button('Back')
+    next = Button('Next')
+    add = Button('Add')
+    cancel = Button('Cancel')
+    close = Button('Close')
@@ -1,12 +1,20 @@
 """Utilities functions for tests."""
 import calendar
 import copy
-from datetime import datetime, time, timedelta, timezone
+from datetime import datetime, timezone
 from multiprocessing import Pool
 
 from integrade import api, config, injector
 from integrade.tests import aws_utils, urls
-from integrade.utils import gen_password, uuid4
+from integrade.utils import (
+    DAY,
+    day_start,
+    format_timestamp,
+    gen_password,
+    local_utc_offset,
+    poll,
+    uuid4
+)
 
 
 _SENTINEL = object()
@@ -149,15 +157,64 @@ def get_auth(user=None):
 
 
 def get_time_range(offset=0, formatted=True):
-    """Create start/end time for parameters to account report API."""
-    fmt = '%Y-%m-%dT%H:%MZ'
-    tomorrow = datetime.now().date() + timedelta(days=1 + offset)
-    end = datetime.combine(tomorrow, time(4, 0, 0))
-    start = end - timedelta(days=30)
+    """Create start/end time for parameters to account report API.
+
+    The range is the 30 days ending at 4 AM UTC on the day after the local
+    date, moved ``offset`` days in the future, or in the past if negative.
+
+    :returns: The start and end formatted for the API, or as naive UTC
+        datetimes if ``formatted`` is False.
+    """
+    utc_offset = local_utc_offset()
+    # The local midnight, moved to the same date in UTC.
+    end = day_start(days=1 + offset, utc_offset=utc_offset) + utc_offset
+    end += 4 * 60 * 60
+    start = end - 30 * DAY
     if formatted:
-        return start.strftime(fmt), end.strftime(fmt)
+        return format_timestamp(start), format_timestamp(end)
     else:
-        return start, end
+        return tuple(
+            datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None)
+            for t in (start, end)
+        )
+
+
+def wait_for_account_report(auth, aws_account_id, instances, start,
+                            end=None, timeout=30):
+    """Wait until the accounts report counts the instances of an account.
+
+    Data injected in the database is only worth looking for in the UI once
+    the reports the UI is built from include it. Poll the accounts report, as
+    the UI requests it, until it does.
+
+    :param auth: The auth of the user owning the account.
+    :param aws_account_id: The AWS account ID of the cloud account.
+    :param instances: How many instances the report should count, at least.
+    :param start: The start of the report, as a timestamp. It should be
+        before the first event of every instance.
+    :param end: The end of the report, defaults to the end of today.
+    :returns: The overview of the account in the report, or None if it did
+        not count the instances before the timeout.
+    """
+    client = api.Client(authenticate=False)
+    params = {
+        'start': format_timestamp(start),
+        'end': format_timestamp(day_start(days=1) if end is None else end),
+    }
+
+    def overview():
+        response = client.get(urls.REPORT_ACCOUNTS, params=params, auth=auth)
+        for account in response.json()['cloud_account_overviews']:
+            if account['cloud_account_id'] == aws_account_id:
+                return account
+
+    def counted(account):
+        return account is not None and account['instances'] >= instances
+
+    account = poll(
+        overview, timeout, until=counted, interval=0.1, max_interval=1)
+    if counted(account):
+        return account
 
 
 def utc_dt(*args, **kwargs):
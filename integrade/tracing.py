@@ -0,0 +1,173 @@
+"""Record where the time of a test run goes.
+
+Code that does something slow, like talking to the API, running code in the
+cloudigrade pod or waiting for the UI, wraps that work in a :class:`span`. Each
+span records when it started and ended, what kind of work it was and which
+test was running at the time. At the end of the run the recorded spans can be
+summarized or exported as plain JSON or in the `Chrome trace format`_, which
+can be loaded in ``chrome://tracing`` or https://ui.perfetto.dev.
+
+Example::
+
+    >>> from integrade import tracing
+    >>> with tracing.span('drop_account_data', category='remote'):
+    ...     drop_account_data()
+    >>> tracing.totals()
+    {'drop_account_data': 1.53}
+
+.. _Chrome trace format:
+    https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+MAX_SPANS = int(os.environ.get('INTEGRADE_TRACE_MAX_SPANS', 100000))
+"""How many spans are kept for exporting, later spans are only totaled."""
+
+# Recorded spans. This is intentionally a global so spans from every client,
+# helper and fixture end up in the same place without passing a recorder
+# around. The totals are kept apart so they stay right once MAX_SPANS spans
+# were recorded and later ones are dropped.
+_SPANS = []
+_TOTALS = {}
+_DROPPED = 0
+_LOCK = threading.Lock()
+_CONTEXT = {'test': None}
+
+
+class span(object):
+    """Context manager and decorator recording a span of time.
+
+    :param name: What is being timed, like ``GET /api/v1/account/``.
+    :param category: The kind of work, like ``http``, ``remote``, ``aws`` or
+        ``ui``. Used to group spans when summarizing or viewing a trace.
+    :param tags: Any extra information worth keeping with the span. More tags
+        can be added while the span is open with :meth:`tag`.
+    """
+
+    def __init__(self, name, category='default', **tags):
+        """Remember what is being timed."""
+        self.name = name
+        self.category = category
+        self.tags = tags
+
+    def tag(self, **tags):
+        """Add tags to the span, for example the result of the timed work."""
+        self.tags.update(tags)
+
+    def __enter__(self):
+        """Mark the time at the start of the span."""
+        self.test = _CONTEXT['test']
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        """Record the span."""
+        global _DROPPED  # pylint:disable=global-statement
+        duration = time.perf_counter() - self._perf_start
+        if exc_type is not None:
+            self.tags['error'] = exc_type.__name__
+        key = (self.category, self.name)
+        with _LOCK:
+            _TOTALS[key] = _TOTALS.get(key, 0) + duration
+            if len(_SPANS) >= MAX_SPANS:
+                _DROPPED += 1
+                return
+            _SPANS.append({
+                'name': self.name,
+                'category': self.category,
+                'start': self.start,
+                'duration': duration,
+                'test': self.test,
+                'pid': os.getpid(),
+                'thread': threading.get_ident(),
+                'tags': self.tags,
+            })
+
+    def __call__(self, func):
+        """Record a span for every call of the decorated function."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(self.name, self.category, **self.tags):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def set_test(nodeid):
+    """Tag the spans recorded from now on with the given test node ID."""
+    _CONTEXT['test'] = nodeid
+
+
+def spans():
+    """Return a copy of the spans recorded so far."""
+    return list(_SPANS)
+
+
+def dropped():
+    """Return how many spans were dropped once MAX_SPANS were recorded."""
+    return _DROPPED
+
+
+def clear():
+    """Forget every recorded span."""
+    global _DROPPED  # pylint:disable=global-statement
+    with _LOCK:
+        del _SPANS[:]
+        _TOTALS.clear()
+        _DROPPED = 0
+
+
+def totals(category=None):
+    """Return the total number of seconds spent in each named span.
+
+    Dropped spans are counted too.
+
+    :param category: If given, only sum spans of this category.
+    """
+    result = {}
+    with _LOCK:
+        for (cat, name), duration in _TOTALS.items():
+            if category is None or cat == category:
+                result[name] = result.get(name, 0) + duration
+    return result
+
+
+def chrome_trace():
+    """Return the recorded spans as a Chrome trace format dictionary."""
+    events = []
+    for s in _SPANS:
+        args = dict(s['tags'])
+        if s['test']:
+            args['test'] = s['test']
+        events.append({
+            'name': s['name'],
+            'cat': s['category'],
+            'ph': 'X',
+            'ts': int(s['start'] * 1e6),
+            'dur': int(s['duration'] * 1e6),
+            'pid': s['pid'],
+            'tid': s['thread'],
+            'args': args,
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def export(path, fmt='json'):
+    """Write the recorded spans to ``path``.
+
+    :param path: Where to write the spans.
+    :param fmt: Either ``json``, for a plain list of spans, or ``chrome``, for
+        the Chrome trace format.
+    """
+    if fmt == 'chrome':
+        data = chrome_trace()
+    elif fmt == 'json':
+        data = spans()
+    else:
+        raise ValueError(f'Unknown trace format {fmt!r}.')
+    with open(path, 'w') as f:
+        json.dump(data, f, default=str)
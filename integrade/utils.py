@@ -5,13 +5,66 @@ import secrets
 import string
 import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from urllib.parse import urlunparse
 
 from flaky import flaky as _flaky
 
 
-def get_expected_hours_in_past_30_days(events):
+DAY = 24 * 60 * 60
+"""Seconds in a day. There are no leap seconds in epoch time."""
+
+API_DATETIME_FORMAT = '%Y-%m-%dT%H:%MZ'
+
+
+def utc_timestamp(value=None):
+    """Return integer seconds since the epoch.
+
+    All the time math in integrade is done on these integers, which are the
+    same in every timezone, and only converted from and to datetimes at the
+    edges.
+
+    :param value: A datetime, taken to be in UTC if naive like the report API
+        does, a timestamp, or None for now.
+    """
+    if value is None:
+        return int(time.time())
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def local_utc_offset(when=None):
+    """Return the local timezone offset from UTC in seconds at ``when``."""
+    return time.localtime(utc_timestamp(when)).tm_gmtoff
+
+
+def day_start(when=None, days=0, utc_offset=0):
+    """Return the timestamp of a midnight.
+
+    :param when: The reference time, see :func:`utc_timestamp`.
+    :param days: How many days after the day of ``when``, negative for days
+        before it.
+    :param utc_offset: The offset from UTC in seconds of the timezone of the
+        midnight, UTC by default.
+    """
+    local = utc_timestamp(when) + utc_offset
+    return local - local % DAY + days * DAY - utc_offset
+
+
+def overlap(on, off, start, end):
+    """Return how many seconds ``[on, off)`` and ``[start, end)`` overlap."""
+    return max(0, min(off, end) - max(on, start))
+
+
+def format_timestamp(value, fmt=API_DATETIME_FORMAT):
+    """Format a timestamp in UTC, by default as the report API expects."""
+    return datetime.fromtimestamp(value, timezone.utc).strftime(fmt)
+
+
+def get_expected_hours_in_past_30_days(events, now=None, utc_offset=None):
     """Given a list of events, return the number of hours of runtime.
 
     A list terminating in None will indicate that the instance is still
@@ -19,6 +72,11 @@ def get_expected_hours_in_past_30_days(events):
     was turned on 12 days ago, turned off 10 days ago, turned on 2 days ago,
     and is still running.
 
+    See :func:`get_time_lapsed_in_past_30_days` for the other arguments.
+
+    While the UTC date is already tomorrow but the local date is still
+    today, one day less is counted, never going below zero.
+
     :returns: tuple of (hours, minutes, events). Only whole hours are
         displayed by UI, but several instances of the same image may accumulate
         enough minutes to form extra hours. This should be handled by the
@@ -26,51 +84,52 @@ def get_expected_hours_in_past_30_days(events):
         integrade.injector.inject_instance_data does not use or understand
         None objects in the list of events.
     """
-    hours = 0
-    spare_min = 0
-    utc_tomorrow = datetime.utcnow().date() > datetime.now().date()
+    now = utc_timestamp(now)
+    if utc_offset is None:
+        utc_offset = local_utc_offset(now)
+    utc_tomorrow = now // DAY > (now + utc_offset) // DAY
+    seconds = 0
     for i in range(1, len(events), 2):
-        start = events[i - 1]
-        end = events[i]
-        these_hours, these_min = get_time_lapsed_in_past_30_days(start, end)
-        hours += these_hours
-        spare_min += these_min
+        hours, minutes = get_time_lapsed_in_past_30_days(
+            events[i - 1], events[i], now, utc_offset)
+        seconds += (hours * 60 + minutes) * 60
     if None in events:
         events.remove(None)
     if utc_tomorrow:
-        hours = hours - 24
-    return hours, spare_min, events
+        seconds = max(0, seconds - DAY)
+    hours, minutes = divmod(seconds // 60, 60)
+    return hours, minutes, events
 
 
-def get_time_lapsed_in_past_30_days(start, end):
+def get_time_lapsed_in_past_30_days(start, end, now=None, utc_offset=None):
     """Get the number of hours and minutes in the past 30 days.
 
     The result is the number of hours and minutes of runtime total expected.
 
-    None as the end argument indicates the instance is still running. start is
-    capped at 30.
-
     The start and end arguments are an int number of days in the past in which
     the start or end event took place. For example, start and end values of 10
     and 3, respectively, would mean the machine was started 10 days ago and
     ended 3 days ago, and had run for 1 week (7 days, the difference of start
-    and end).
+    and end). None as the end argument indicates the instance is still
+    running.
+
+    Events happen at midnight UTC, like
+    :func:`integrade.injector.inject_instance_data` creates them. The past 30
+    days start at midnight 30 days ago in the timezone of the browser showing
+    them, and end now.
+
+    :param now: The current time, see :func:`utc_timestamp`.
+    :param utc_offset: The offset from UTC in seconds of the timezone of the
+        browser. Defaults to the local timezone.
     """
-    utc_offset_hours = 0
-    if start > 30:
-        start = 30
-    if start == 30:
-        utc_offset_hours = (time.localtime().tm_gmtoff) / (60 * 60)
-    if end is None:
-        utc_offset_hours -= (time.localtime().tm_gmtoff) / (60 * 60)
-        hours = (start * 24) + utc_offset_hours + time.localtime().tm_hour
-        spare_min = time.localtime().tm_min
-        return int(hours), int(spare_min)
-    elif end > 30:
-        end = 30
-    hours = (start - end) * 24
-
-    return int(max(0, hours)), 0
+    now = utc_timestamp(now)
+    if utc_offset is None:
+        utc_offset = local_utc_offset(now)
+    window_start = day_start(now, -30, utc_offset)
+    on = day_start(now, -start)
+    off = now if end is None else day_start(now, -end)
+    minutes = overlap(on, off, window_start, now) // 60
+    return divmod(minutes, 60)
 
 
 def round_hours(hours, minutes):
@@ -83,6 +142,32 @@ def base_url(cfg):
     return urlunparse((cfg['scheme'], cfg['base_url'], '', '', '', ''))
 
 
+def poll(func, timeout, until=bool, interval=0.05, max_interval=0.5,
+         backoff=1.5):
+    """Call ``func`` until its result satisfies ``until`` or time runs out.
+
+    Instead of calling ``func`` in a tight loop, which hammers the WebDriver
+    or the API and keeps a core busy, sleep between calls. The pause starts
+    short, so conditions that are met quickly are noticed quickly, and grows
+    up to ``max_interval`` the longer the wait.
+
+    :param func: The function to call, without arguments.
+    :param timeout: How many seconds to keep trying. ``func`` is always called
+        at least once.
+    :param until: A predicate telling whether a result is final.
+    :returns: The last result of ``func``, which does not satisfy ``until``
+        if time ran out.
+    """
+    end = time.monotonic() + timeout
+    while True:
+        retval = func()
+        remaining = end - time.monotonic()
+        if until(retval) or remaining <= 0:
+            return retval
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
 def gen_password(length=20):
     """Generate a random password with letters, digits and punctuation."""
     chars = string.ascii_letters + string.digits + string.punctuation
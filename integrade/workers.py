@@ -0,0 +1,142 @@
+"""Coordinate shared resources between pytest-xdist worker processes.
+
+When the suite is sharded with ``pytest -n``, every worker is a separate
+process with its own copy of module globals such as the config cache or the
+UI user. That is fine for state that is cheap to recreate, but some resources
+are finite and must not be used by two workers at once, such as the customer
+AWS profiles, or are expensive enough that only one worker should create them,
+such as the super user.
+
+This module provides two primitives for that, both backed by lock files in a
+directory shared by all workers of a single test run:
+
+* :func:`claim_slot` gives each worker an exclusive slot out of a fixed number
+  of slots, for example an index into ``cfg['aws_profiles']``.
+* :func:`shared_value` computes a JSON serializable value once per test run
+  and hands the same value to every worker.
+
+Outside of xdist both primitives degrade to their single process behavior, so
+callers do not need to care how the suite is being run.
+"""
+import fcntl
+import json
+import os
+import tempfile
+
+WORKER_ENV = 'PYTEST_XDIST_WORKER'
+WORKER_COUNT_ENV = 'PYTEST_XDIST_WORKER_COUNT'
+TESTRUN_ENV = 'PYTEST_XDIST_TESTRUNUID'
+
+# Lock files held by this process. They are intentionally kept open for the
+# life of the process: the operating system releases the locks when a worker
+# exits, even if it crashes, so slots are never leaked between runs.
+_HELD_SLOTS = {}
+
+
+def worker_id():
+    """Return the xdist worker id, like ``gw0``, or ``master`` if unsharded."""
+    return os.environ.get(WORKER_ENV, 'master')
+
+
+def is_worker():
+    """Return True if this process is an xdist worker."""
+    return WORKER_ENV in os.environ
+
+
+def worker_count():
+    """Return the number of xdist workers in this test run."""
+    return int(os.environ.get(WORKER_COUNT_ENV, 1))
+
+
+def worker_index():
+    """Return the numeric index of this worker, counting from 0."""
+    wid = worker_id()
+    if wid.startswith('gw'):
+        return int(wid[2:])
+    return 0
+
+
+def coordination_dir():
+    """Return the directory used to coordinate the workers of this test run.
+
+    All workers of a run share the ``PYTEST_XDIST_TESTRUNUID``, so the
+    directory is unique to the run and stale files from previous runs are
+    never consulted.
+    """
+    run_id = os.environ.get(TESTRUN_ENV, 'local-{}'.format(os.getpid()))
+    path = os.path.join(tempfile.gettempdir(), 'integrade-{}'.format(run_id))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def claim_slot(name, count):
+    """Claim an exclusive slot out of ``count`` slots named ``name``.
+
+    The first free slot is claimed, trying first the slot matching this
+    worker's index so assignments are stable when there are enough slots for
+    every worker. Repeated calls with the same name return the slot already
+    held by this process.
+
+    :param name: A string identifying the pool of slots, like ``aws_profile``.
+    :param count: The number of slots in the pool.
+    :returns: The claimed slot index, or ``None`` if all slots are taken by
+        other workers or ``count`` is 0.
+    """
+    if name in _HELD_SLOTS:
+        return _HELD_SLOTS[name][0]
+    if count <= 0:
+        return None
+    if not is_worker():
+        return 0
+    start = worker_index() % count
+    for offset in range(count):
+        slot = (start + offset) % count
+        path = os.path.join(
+            coordination_dir(), '{}-{}.lock'.format(name, slot))
+        lock_file = open(path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        lock_file.write(worker_id())
+        lock_file.flush()
+        _HELD_SLOTS[name] = (slot, lock_file)
+        return slot
+    return None
+
+
+def shared_value(name, factory):
+    """Return a value computed once and shared by all workers of a test run.
+
+    The first worker to ask for ``name`` calls ``factory`` while holding a lock
+    and stores the result. Every other worker waits for the lock and reads the
+    stored result instead of calling ``factory`` itself.
+
+    :param name: A string identifying the value.
+    :param factory: A callable returning a JSON serializable value.
+    :returns: The value returned by ``factory`` in whichever process ran it.
+    """
+    if not is_worker():
+        return factory()
+    directory = coordination_dir()
+    value_path = os.path.join(directory, '{}.json'.format(name))
+    with open(os.path.join(directory, '{}.lock'.format(name)), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(value_path):
+                with open(value_path) as f:
+                    return json.load(f)
+            value = factory()
+            with open(value_path, 'w') as f:
+                json.dump(value, f)
+            return value
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def release_slots():
+    """Release every slot held by this process."""
+    for slot, lock_file in _HELD_SLOTS.values():
+        lock_file.close()
+    _HELD_SLOTS.clear()
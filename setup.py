@@ -23,6 +23,12 @@ setup(
         'Programming Language :: Python :: 3.6',
         'Topic :: Software Development :: Quality Assurance'
     ],
+    entry_points={
+        'console_scripts': [
+            'integrade-benchmark=integrade.benchmark:main',
+            'integrade-load=integrade.load:main',
+        ],
+    },
     description=(
         'A GPL-licensed Python library that facilitates functional testing of '
         'cloudigrade.'
@@ -43,6 +49,7 @@ setup(
         'boto3',
         'click',
         'flaky',
+        'numpy',
         'pytest',
         'pytest-selenium',
         'python-dateutil',
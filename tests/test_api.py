@@ -309,3 +309,316 @@ def test_token_auth():
     assert changed_request is request
     assert 'Authorization' in request.headers
     assert request.headers['Authorization'] == f'{header_format} {token}'
+
+
+def test_endpoint_name():
+    """Test requests to the same endpoint share a name."""
+    assert api.endpoint_name('GET', 'http://example.com/api/v1/') == (
+        'GET /api/v1/')
+    assert api.endpoint_name(
+        'DELETE', 'http://example.com/api/v1/account/42/?x=1') == (
+        'DELETE /api/v1/account/{id}/')
+
+
+def test_percentile():
+    """Test percentiles are computed by nearest rank."""
+    samples = list(range(1, 101))
+    assert api.percentile(samples, 50) == 50
+    assert api.percentile(samples, 95) == 95
+    assert api.percentile(samples, 99) == 99
+    assert api.percentile([3], 99) == 3
+    assert api.percentile([], 50) is None
+
+
+def test_request_stats_summary():
+    """Test latencies, sizes and statuses are summarized per endpoint."""
+    stats = api.RequestStats()
+    for i in range(1, 11):
+        stats.record('GET', f'http://example.com/api/v1/account/{i}/',
+                     200, i / 10, 100)
+    stats.record('GET', 'http://example.com/api/v1/account/1/', 404, 20, 5)
+    stats.record('POST', 'http://example.com/api/v1/account/', 201, 0.01, 7)
+    summary = stats.summary()
+    assert set(summary) == {
+        'GET /api/v1/account/{id}/', 'POST /api/v1/account/'}
+    get = summary['GET /api/v1/account/{id}/']
+    assert get['count'] == 11
+    assert get['p50'] == 0.6
+    assert get['p95'] == 20
+    assert get['max'] == 20
+    assert get['bytes'] == 1005
+    assert get['statuses'] == {200: 10, 404: 1}
+    assert get['histogram']['0.1'] == 1
+    assert get['histogram']['inf'] == 1
+    assert sum(get['histogram'].values()) == 11
+    stats.clear()
+    assert stats.summary() == {}
+
+
+def test_request_stats_merge():
+    """Test the statistics of several processes can be merged."""
+    worker = api.RequestStats()
+    worker.record('GET', 'http://example.com/api/v1/account/1/', 200, 1, 10)
+    worker.record_retry('GET', 'http://example.com/api/v1/account/1/')
+    stats = api.RequestStats()
+    stats.record('GET', 'http://example.com/api/v1/account/2/', 404, 3, 5)
+    stats.merge(worker.dump())
+    stats.merge(worker.dump())
+    get = stats.summary()['GET /api/v1/account/{id}/']
+    assert get['count'] == 3
+    assert get['max'] == 3
+    assert get['bytes'] == 25
+    assert get['statuses'] == {200: 2, 404: 1}
+    assert get['retries'] == 2
+    assert worker.summary()['GET /api/v1/account/{id}/']['count'] == 1
+
+
+def test_client_records_stats(good_response):
+    """Test the client records every request and logs slow ones."""
+    good_response.headers = {'Content-Length': '12'}
+    good_response.request.headers = {'Authorization': 'Token secret'}
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(
+            stats=api.RequestStats(), slow_request_threshold=-1)
+        with patch.object(requests, 'request', return_value=good_response):
+            with patch.object(api.logger, 'warning') as warning:
+                client.get('account/3/')
+    stats, = client.stats().values()
+    assert stats['count'] == 1
+    assert stats['bytes'] == 12
+    assert stats['statuses'] == {200: 1}
+    message = warning.call_args[0][0] % warning.call_args[0][1:]
+    assert 'Slow request' in message
+    assert 'secret' not in message
+    assert "'Authorization': '********'" in message
+
+
+def test_client_records_connection_errors():
+    """Test requests failing without a response are recorded too."""
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(stats=api.RequestStats())
+        with patch.object(requests, 'request') as request:
+            request.side_effect = requests.exceptions.ConnectionError()
+            with patch.object(api.time, 'sleep'):
+                with pytest.raises(requests.exceptions.ConnectionError):
+                    client.get('account/')
+    stats, = client.stats().values()
+    assert stats['statuses'] == {None: 4}
+    assert stats['retries'] == 3
+
+
+def mock_status_response(status_code, headers=None):
+    """Return a mock response with the given status code and headers."""
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.request = mock_request()
+    return response
+
+
+def test_retry_after():
+    """Test the Retry-After header is parsed as seconds or an HTTP date."""
+    assert api.retry_after(None) is None
+    assert api.retry_after(mock_status_response(503)) is None
+    assert api.retry_after(
+        mock_status_response(503, {'Retry-After': '7'})) == 7
+    assert api.retry_after(
+        mock_status_response(503, {'Retry-After': 'soon'})) is None
+    assert api.retry_after(mock_status_response(503, {
+        'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0
+
+
+def test_retry_policy():
+    """Test which attempts are retried and how long to wait for them."""
+    retry = api.Retry(total=2, backoff=1, max_delay=3)
+    assert retry.can_retry('get', 0)
+    assert retry.can_retry('DELETE', 1)
+    assert not retry.can_retry('GET', 2)
+    assert not retry.can_retry('POST', 0)
+    for attempt, limit in ((0, 1), (1, 2), (5, 3)):
+        assert 0 <= retry.delay(attempt) <= limit
+    assert retry.delay(0, mock_status_response(
+        503, {'Retry-After': '2'})) == 2
+    assert retry.delay(0, mock_status_response(
+        503, {'Retry-After': '60'})) is None
+
+
+@pytest.mark.parametrize('method', ['GET', 'PUT', 'DELETE'])
+def test_request_retries_transient_errors(method, good_response):
+    """Test idempotent requests are retried until they succeed."""
+    unavailable = mock_status_response(503, {'Retry-After': '1'})
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(stats=api.RequestStats())
+        with patch.object(requests, 'request') as request:
+            request.side_effect = [
+                requests.exceptions.ConnectionError(),
+                unavailable,
+                good_response,
+            ]
+            with patch.object(api.time, 'sleep') as sleep:
+                assert client.request(method, 'http://a/b/') is good_response
+    assert request.call_count == 3
+    assert sleep.call_count == 2
+    assert sleep.call_args[0] == (1,)
+    unavailable.close.assert_called_once_with()
+    stats, = client.stats().values()
+    assert stats['statuses'] == {None: 1, 503: 1, 200: 1}
+    assert stats['retries'] == 2
+
+
+def test_request_does_not_retry_post():
+    """Test non idempotent requests are never retried."""
+    unavailable = mock_status_response(503)
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(response_handler=api.echo_handler)
+        with patch.object(requests, 'request', return_value=unavailable):
+            with patch.object(api.time, 'sleep') as sleep:
+                assert client.post('account/', {}) is unavailable
+    assert not sleep.called
+
+
+def test_request_retry_budget():
+    """Test the retry budget can be overridden per request."""
+    unavailable = mock_status_response(502)
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(response_handler=api.echo_handler)
+        with patch.object(requests, 'request', return_value=unavailable) as r:
+            with patch.object(api.time, 'sleep'):
+                client.get('account/', retry=api.Retry(total=1))
+    assert r.call_count == 2
+    assert 'retry' not in r.call_args[1]
+
+
+def cached_response(status_code=200, headers=None):
+    """Return a mock response suitable for caching."""
+    response = mock_status_response(status_code, headers)
+    response.json = Mock(return_value={'results': []})
+    return response
+
+
+def test_response_cache_lru():
+    """Test the least recently used responses are dropped first."""
+    cache = api.ResponseCache(maxsize=2)
+    cache.store('a', cached_response())
+    cache.store('b', cached_response())
+    assert cache.get('a') is not None
+    cache.store('c', cached_response())
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    cache.clear()
+    assert cache.get('a') is None
+
+
+def test_response_cache_key():
+    """Test cache keys depend on the URL, parameters and credentials."""
+    key = api.ResponseCache.key
+    assert key('u', params={'a': 1, 'b': 2}) == key(
+        'u', params={'b': 2, 'a': 1})
+    assert key('u', params={'a': 1}) != key('u', params={'a': 2})
+    assert key('u', auth=api.TokenAuth('x')) == key(
+        'u', auth=api.TokenAuth('x'))
+    assert key('u', auth=api.TokenAuth('x')) != key(
+        'u', auth=api.TokenAuth('y'))
+    assert key('u', headers={'Authorization': 'Token x'}) != key(
+        'u', headers={'Authorization': 'Token y'})
+
+
+def test_client_cache_fresh_hit():
+    """Test fresh cached responses are returned without a request."""
+    response = cached_response()
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(cache=api.ResponseCache())
+        with patch.object(requests, 'request', return_value=response) as r:
+            assert client.get('report/', params={'a': 1}) is response
+            assert client.get('report/', params={'a': 1}) is response
+            assert client.get('report/', params={'a': 2}) is response
+    assert r.call_count == 2
+
+
+def test_client_cache_revalidation():
+    """Test stale responses are revalidated with ETag and Last-Modified."""
+    response = cached_response(headers={
+        'ETag': '"v1"',
+        'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT',
+    })
+    not_modified = cached_response(304)
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(cache=api.ResponseCache(ttl=0))
+        with patch.object(requests, 'request') as r:
+            r.side_effect = [response, not_modified]
+            assert client.get('report/') is response
+            assert client.get('report/') is response
+    headers = r.call_args[1]['headers']
+    assert headers['If-None-Match'] == '"v1"'
+    assert headers['If-Modified-Since'] == 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+
+def test_client_cache_invalidated_by_mutations(good_response):
+    """Test mutating requests from the client drop every cached response."""
+    response = cached_response()
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        cache = api.ResponseCache()
+        client = api.Client(cache=cache)
+        with patch.object(requests, 'request', return_value=response):
+            client.get('report/')
+            assert len(cache) == 1
+            client.post('account/', {})
+            assert len(cache) == 0
+            client.get('report/', stream=True)
+            assert len(cache) == 0
+
+
+def test_stream_handler():
+    """Test the stream handler yields list items and closes the response."""
+    response = mock_status_response(200)
+    response.iter_content.return_value = [
+        b'{"count": 2, "results": [{"id"', b': 1}, {"id": 2}]}']
+    with patch.object(config, '_CONFIG', VALID_CONFIG):
+        client = api.Client(response_handler=api.stream_handler('results'))
+        with patch.object(requests, 'request', return_value=response) as r:
+            items = client.get('instance/')
+    assert r.call_args[1]['stream'] is True
+    assert list(items) == [{'id': 1}, {'id': 2}]
+    response.close.assert_called_once_with()
+
+
+def test_stream_handler_raises(bad_response_valid_json):
+    """Test the stream handler checks the status code first."""
+    with pytest.raises(requests.exceptions.HTTPError):
+        api.stream_handler('results')(bad_response_valid_json)
+
+
+def test_response_error_is_lazy(bad_response_valid_json):
+    """Test the error message is only built when it is needed."""
+    with pytest.raises(api.ResponseError) as exc_info:
+        api.raise_error_for_status(bad_response_valid_json)
+    assert exc_info.value.response is bad_response_valid_json
+    assert not bad_response_valid_json.json.called
+    message = str(exc_info.value)
+    assert str(exc_info.value) is message
+    assert bad_response_valid_json.json.call_count == 1
+    assert 'response code : 404' in message
+
+
+def test_response_error_details(bad_response_invalid_json):
+    """Test the error details are available as a dictionary."""
+    bad_response_invalid_json.request.method = 'POST'
+    error = api.ResponseError(response=bad_response_invalid_json)
+    assert error.details == {
+        'method': 'POST',
+        'path': '/example/path/',
+        'body': '{"Test Body"}',
+        'headers': {'Authorization': '********'},
+        'status_code': 404,
+        'text': '<No JSON!>',
+    }
+
+
+def test_response_error_caps_bodies(bad_response_invalid_json):
+    """Test large bodies are capped in the error message."""
+    bad_response_invalid_json.text = 'x' * 10000
+    bad_response_invalid_json.request.body = 'y' * 10000
+    error = api.ResponseError(response=bad_response_invalid_json)
+    message = str(error)
+    assert len(message) < 3 * api.ResponseError.max_body_length
+    assert 'more characters)' in message
+    assert len(error.details['text']) == 10000
@@ -0,0 +1,82 @@
+"""Unit tests for :mod:`integrade.benchmark`."""
+from unittest import mock
+
+import pytest
+
+from integrade import benchmark
+
+
+def results(times, build=None):
+    """Return benchmark results with the given ``{size: median}`` times."""
+    return {
+        'build': build,
+        'repeat': 1,
+        'events': 10,
+        'results': [
+            {'size': size, 'report': 'accounts', 'window': 30,
+             'timings': [median], 'median': median, 'min': median}
+            for size, median in times.items()
+        ],
+    }
+
+
+def test_make_instances_deterministic():
+    """The same seed always describes the same instances."""
+    first = benchmark.make_instances(20, events=4, seed=3)
+    second = benchmark.make_instances(20, events=4, seed=3)
+    assert [i['instance_id'] for i in first] == [
+        i['instance_id'] for i in second]
+    assert [i['ec2_ami_id'] for i in first] == [
+        i['ec2_ami_id'] for i in second]
+    assert len(first) == 20
+    assert len({i['ec2_ami_id'] for i in first}) <= 2
+    for instance in first:
+        assert len(instance['events']) == 4
+        assert instance['events'] == sorted(instance['events'])
+
+
+def test_run():
+    """Every report is timed for every size and window."""
+    client = mock.Mock()
+    seeder = mock.Mock(return_value={'auth': 'auth', 'account_id': 9})
+    data = benchmark.run(
+        sizes=(10, 100), windows=(1, 30), repeat=2, client=client,
+        seeder=seeder, build='test')
+    assert seeder.call_count == 2
+    assert client.get.call_count == 2 * 2 * 3 * 2
+    assert len(data['results']) == 2 * 2 * 3
+    assert data['build'] == 'test'
+    images_params = [
+        c[1]['params'] for c in client.get.call_args_list
+        if c[0][0] == benchmark.REPORTS['images']]
+    assert all(p['account_id'] == 9 for p in images_params)
+
+
+def test_scaling_exponents():
+    """Exponents measure how time grows with the dataset size."""
+    exponents = benchmark.scaling_exponents(
+        results({10: 0.1, 100: 1.0, 1000: 100.0}))
+    (a, b, linear), (c, d, quadratic) = exponents[('accounts', 30)]
+    assert (a, b, c, d) == (10, 100, 100, 1000)
+    assert linear == pytest.approx(1)
+    assert quadratic == pytest.approx(2)
+
+
+def test_compare_flags_superlinear():
+    """Only the superlinear pair of sizes is flagged."""
+    finding, = benchmark.compare(
+        None, results({10: 0.1, 100: 0.2, 1000: 20.0}))
+    assert finding['kind'] == 'superlinear'
+    assert finding['sizes'] == [100, 1000]
+    assert 'superlinearly' in benchmark.format_finding(finding)
+
+
+def test_compare_flags_regressions():
+    """Timings slower than the baseline by the threshold are flagged."""
+    baseline = results({10: 0.1, 100: 0.1})
+    current = results({10: 0.11, 100: 0.2})
+    finding, = benchmark.compare(baseline, current)
+    assert finding['kind'] == 'regression'
+    assert finding['size'] == 100
+    assert finding['ratio'] == pytest.approx(2)
+    assert 'regressed' in benchmark.format_finding(finding)
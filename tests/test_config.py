@@ -112,6 +112,47 @@ def test_negative_get_config_missing():
                     assert 'AWS access key id' in msg
 
 
+def profile_env():
+    """Return an environment with two AWS profiles and a token."""
+    env = {
+        'CLOUDIGRADE_TOKEN': utils.uuid4(),
+        'CLOUDIGRADE_BASE_URL': 'example.com',
+    }
+    for name in ('CUSTOMER1', 'CUSTOMER2'):
+        env[f'CLOUDIGRADE_ROLE_{name}'] = '{}:{}:{}'.format(
+            utils.uuid4(), int(time.time()), utils.uuid4())
+        env[f'AWS_ACCESS_KEY_ID_{name}'] = utils.uuid4()
+    return env
+
+
+def test_get_config_worker_profile():
+    """Each pytest-xdist worker sees the AWS profile it claimed first."""
+    with mock.patch.object(config, '_CONFIG', None):
+        with mock.patch.dict(os.environ, profile_env(), clear=True):
+            with mock.patch.object(
+                    config.workers, 'claim_slot', return_value=1):
+                cfg = config.get_config()
+    assert [p['name'] for p in cfg['aws_profiles']] == [
+        'CUSTOMER2', 'CUSTOMER1']
+
+
+def test_get_config_too_many_workers():
+    """Workers left without an AWS profile only fail once they use one."""
+    with mock.patch.object(config, '_CONFIG', None):
+        with mock.patch.dict(os.environ, profile_env(), clear=True):
+            with mock.patch.object(
+                    config.workers, 'claim_slot', return_value=None):
+                with mock.patch.object(
+                        config.workers, 'worker_count', return_value=3):
+                    cfg = config.get_config()
+    assert cfg['aws_profiles'] == []
+    assert list(cfg['aws_profiles']) == []
+    with pytest.raises(
+            exceptions.MissingConfigurationError,
+            match=r'workers \(3\) than AWS profiles \(2\)'):
+        cfg['aws_profiles'][0]
+
+
 def test_get_aws_image_config():
     """Test that the aws image config function parses the yaml correctly."""
     aws_image_config = yaml.load(MOCK_AWS_CONFIG)
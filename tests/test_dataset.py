@@ -0,0 +1,118 @@
+"""Unit tests for :mod:`integrade.dataset`."""
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from integrade import dataset
+from integrade.dataset import DAY, Dataset
+
+NOW = datetime(2018, 1, 31, tzinfo=timezone.utc)
+
+
+def test_reproducible():
+    """The same spec, seed and reference time give the same dataset."""
+    first = Dataset({'instances': 20}, seed=3, now=NOW)
+    second = Dataset({'instances': 20}, seed=3, now=NOW)
+    other = Dataset({'instances': 20}, seed=4, now=NOW)
+    assert first.accounts == second.accounts
+    account = first.accounts[0]
+    assert list(first.instances(account)) == list(
+        second.instances(second.accounts[0]))
+    assert account['aws_account_id'] != other.accounts[0]['aws_account_id']
+
+
+def test_events():
+    """Events alternate on and off in the past, some are left running."""
+    data = Dataset({'instances': 50, 'cycles': 4, 'running': 0.5}, now=NOW)
+    lengths = set()
+    for instance in data.instances(data.accounts[0]):
+        events = instance['events']
+        assert events == sorted(events)
+        assert events[0] >= datetime(2018, 1, 1, tzinfo=timezone.utc)
+        assert events[-1] < NOW
+        lengths.add(len(events))
+    assert lengths == {7, 8}
+
+
+def test_unknown_spec_key():
+    """Typos in the spec are not silently ignored."""
+    with pytest.raises(ValueError):
+        Dataset({'instance': 10})
+
+
+def test_challenged_images_lose_their_tags():
+    """Challenged images do not count towards their tags."""
+    data = Dataset(
+        {'challenged': 1, 'tags': {'rhel,openshift': 1}}, now=NOW)
+    assert all(i['tags'] == () for i in data.accounts[0]['images'])
+
+
+def test_inject_streams_batches():
+    """Every account is created and its instances injected in batches."""
+    data = Dataset({'accounts': 2, 'instances': 5}, now=NOW)
+    with mock.patch.object(dataset, 'injector') as injector:
+        injector.inject_aws_cloud_account.side_effect = [{'id': 1}, {'id': 2}]
+        accounts = data.inject(7, batch_size=2)
+    assert accounts == [{'id': 1}, {'id': 2}]
+    calls = injector.inject_bulk_instance_data.call_args_list
+    assert [(c[0][0], len(c[0][1])) for c in calls] == [
+        (1, 2), (1, 2), (1, 1), (2, 2), (2, 2), (2, 1)]
+
+
+def test_expected_reports_agree():
+    """The daily, accounts and images expectations add up to each other."""
+    data = Dataset(
+        {'instances': 40, 'memory': {2: 1}, 'vcpu': {4: 1}}, now=NOW)
+    start = NOW.timestamp() - 10 * DAY
+    end = NOW.timestamp() + DAY
+    daily = data.expected_daily_usage(start, end)
+    totals = data.expected_accounts(start, end)[
+        data.accounts[0]['aws_account_id']]
+    images = data.expected_images(data.accounts[0], start, end)
+
+    assert len(daily['daily_usage']) == 11
+    assert daily['daily_usage'][0]['date'] == '2018-01-21T00:00:00Z'
+    for tag in dataset.TAGS:
+        runtime = sum(
+            d[f'{tag}_runtime_seconds'] for d in daily['daily_usage'])
+        assert runtime == totals[f'{tag}_runtime_seconds']
+        assert totals[f'{tag}_memory_seconds'] == 2 * runtime
+        assert totals[f'{tag}_vcpu_seconds'] == 4 * runtime
+        assert daily[f'instances_seen_with_{tag}'] == totals[
+            f'{tag}_instances']
+        for day in daily['daily_usage']:
+            assert day[f'{tag}_runtime_seconds'] <= (
+                day[f'{tag}_instances'] * DAY)
+    assert totals['images'] == len(images)
+    assert totals['instances'] == sum(
+        i['instances_seen'] for i in images.values())
+
+
+def test_expected_usage_of_one_instance():
+    """The usage of a single instance is split across days."""
+    data = Dataset({'instances': 1, 'cycles': 1, 'running': 0,
+                    'tags': {'rhel': 1}, 'memory': {1: 1}}, now=NOW)
+    instance = data.instance(data.accounts[0], 0)
+    on, off = (int(e.timestamp()) for e in instance['events'])
+    start = NOW.timestamp() - 30 * DAY
+    daily = data.expected_daily_usage(start, NOW)['daily_usage']
+    seconds = [d['rhel_runtime_seconds'] for d in daily]
+    assert sum(seconds) == off - on
+    assert sum(d['rhel_instances'] for d in daily) == (
+        (off - 1 - start) // DAY - (on - start) // DAY + 1)
+    assert all(d['openshift_instances'] == 0 for d in daily)
+
+
+def test_index_by_account():
+    """Runs can be indexed by account, matching the expected totals."""
+    data = Dataset({'accounts': 3, 'instances': 10}, now=NOW)
+    start = NOW.timestamp() - 10 * DAY
+    by_account = data.index('account').query(start, NOW)
+    for account in data.accounts:
+        images = data.expected_images(account, start, NOW)
+        assert by_account[account['aws_account_id']][
+            'runtime_seconds'] == pytest.approx(
+                sum(i['runtime_seconds'] for i in images.values()))
+    with pytest.raises(ValueError):
+        data.index('region')
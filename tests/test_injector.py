@@ -1,25 +1,84 @@
 """Test the injector utility used to run remote code."""
+import io
+import subprocess
+import sys
 from unittest.mock import patch
 
 import pytest
 
-from integrade import injector
+from integrade import config, injector
+from integrade.exceptions import RemoteResultTooLarge
 
 
-def test_data_injection():
+# Django's "manage.py shell" execs the script read from stdin inside a
+# function, so the names the script defines at its top level are locals.
+DJANGO_SHELL = """
+import sys
+def handle():
+    exec(sys.stdin.read())
+handle()
+"""
+
+
+@pytest.fixture(params=('module', 'django_shell'))
+def local_python(request):
+    """Run the "remote" code in a local Python process instead of the pod.
+
+    The code runs both at the top level of a module and the way Django's
+    shell runs it.
+    """
+    if request.param == 'module':
+        command = [sys.executable, '-']
+    else:
+        command = [sys.executable, '-c', DJANGO_SHELL]
+    with patch.object(config, '_CONFIG', {'openshift_prefix': 'test-'}):
+        with patch('integrade.injector.which', return_value=True):
+            with patch('integrade.injector._remote_command',
+                       return_value=command):
+                yield
+
+
+def test_data_injection(local_python):
     """The code gets data injected into it."""
-    code = 'global result;result = x + 1'
+    assert injector.run_remote_python('return x + 1', x=41) == 42
+
+
+@pytest.mark.parametrize('compression', ('gzip', 'zstd', 'none'))
+def test_large_result(local_python, compression):
+    """Large results are streamed back, ignoring anything printed before."""
+    result = injector.run_remote_python(
+        'print("noise")\nreturn list(range(count))',
+        count=100000, compression=compression)
+    assert result == list(range(100000))
+
+
+def test_result_size_cap(local_python):
+    """Results larger than the cap are rejected with a clear error."""
+    with pytest.raises(RemoteResultTooLarge):
+        injector.run_remote_python(
+            'return b"x" * size', size=100000, max_size=10000)
 
-    with patch('integrade.injector.subprocess.run') as run:
-        run.return_value.returncode = 0
-        run.return_value.stdout = b''
-        injector.run_remote_python(code, x=41)
 
-    args, kwargs = run.call_args
-    code = kwargs['input'].decode('utf8')
-    globals = {}
-    exec(code, globals)
-    assert globals['result'] == 42
+def test_uncompressed_size_cap():
+    """Uncompressed frames larger than the cap are not read at all."""
+    stream = io.BytesIO(
+        injector.RESULT_MARKER + b'n' + injector.FRAME_HEADER.pack(10 ** 9))
+    reader = injector._ResultReader(stream, 10000)
+    with pytest.raises(RemoteResultTooLarge):
+        reader.load()
+
+
+def test_timeout(local_python):
+    """Remote code taking longer than the timeout is killed."""
+    with pytest.raises(subprocess.TimeoutExpired):
+        injector.run_remote_python('import time\ntime.sleep(10)', timeout=0.5)
+
+
+def test_remote_failure(local_python, capsys):
+    """Exceptions raised remotely are reported."""
+    with pytest.raises(RuntimeError):
+        injector.run_remote_python('raise ValueError("boom")')
+    assert 'boom' in capsys.readouterr().out
 
 
 def test_requires_oc():
@@ -30,3 +89,248 @@ def test_requires_oc():
             with pytest.raises(EnvironmentError):
                 injector.run_remote_python('code')
     assert not run.called
+
+
+def test_bulk_injection_batches():
+    """Bulk injection makes one remote call per batch of instances."""
+    instances = [{'image_type': 'rhel', 'events': [3, 1]} for _ in range(5)]
+    with patch('integrade.injector.run_remote_python') as run:
+        run.side_effect = lambda script, acct_id, batch: [
+            {'image_id': 1, 'instance_id': 2} for _ in batch]
+        result = injector.inject_bulk_instance_data(
+            7, instances, batch_size=2)
+    assert len(result) == 5
+    assert [len(c[1]['batch']) for c in run.call_args_list] == [2, 2, 1]
+    batch = run.call_args_list[0][1]['batch']
+    assert all(i['instance_id'] and i['ec2_ami_id'] for i in batch)
+    assert 'instance_id' not in instances[0]
+
+
+FAKE_MODELS = """
+from datetime import datetime, timezone
+
+
+class QuerySet(object):
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self
+
+    def filter(self, **kwargs):
+        return self
+
+    def distinct(self):
+        return self
+
+    def order_by(self, *fields):
+        return self
+
+    def values_list(self, *fields):
+        return self
+
+    def iterator(self):
+        return iter(self.rows)
+
+
+class AwsInstanceEvent(object):
+    objects = QuerySet([
+        (1, 5, datetime(2018, 1, 1, tzinfo=timezone.utc), 'power_on', 't2'),
+        (1, 5, datetime(2018, 1, 2, tzinfo=timezone.utc), 'power_off', 't2'),
+        (2, None, datetime(2018, 1, 3, tzinfo=timezone.utc), 'power_on', 'm5'),
+    ])
+
+
+class AwsMachineImage(object):
+    objects = QuerySet([
+        (5, 'ami-5', 'inspected', '{"rhel_release_files_found": true}',
+         False, False, True),
+        (6, 'ami-6', 'pending', None, True, False, False),
+    ])
+"""
+
+
+@pytest.fixture
+def fake_models(local_python, tmpdir, monkeypatch):
+    """Make the "remote" code import fake cloudigrade models."""
+    package = tmpdir.mkdir('account')
+    package.join('__init__.py').write('')
+    package.join('models.py').write(FAKE_MODELS)
+    monkeypatch.setenv('PYTHONPATH', str(tmpdir))
+
+
+def test_query_account_events(fake_models):
+    """Events are returned as compact columns."""
+    events = injector.query_account_events(1)
+    assert list(events['instance_id']) == [1, 1, 2]
+    assert list(events['image_id']) == [5, 5, -1]
+    assert list(events['occurred_at']) == [1514764800, 1514851200, 1514937600]
+    assert list(events['power_on']) == [1, 0, 1]
+    assert [events['instance_types'][i] for i in events['instance_type']] == [
+        't2', 't2', 'm5']
+
+
+def test_query_images(fake_models):
+    """Images and their inspection state are returned as columns."""
+    images = injector.query_images(1)
+    assert list(images['id']) == [5, 6]
+    assert images['ec2_ami_id'] == ['ami-5', 'ami-6']
+    assert [images['statuses'][i] for i in images['status']] == [
+        'inspected', 'pending']
+    assert list(images['rhel_detected']) == [1, 0]
+    assert list(images['openshift_detected']) == [0, 1]
+    assert list(images['openshift_challenged']) == [1, 0]
+
+
+FAKE_DJANGO_DB = """
+from contextlib import contextmanager
+
+
+class transaction(object):
+    atomic = staticmethod(contextmanager(lambda: (yield)))
+"""
+
+FAKE_INJECTION_MODELS = """
+import os
+from itertools import count
+
+IDS = count(1)
+
+
+class Field(object):
+    def __init__(self, attname):
+        self.attname = attname
+
+
+class Meta(object):
+    def __init__(self, fields=('id',), parents=None, local_fields=()):
+        self.pk = Field(fields[0])
+        self.concrete_fields = [Field(f) for f in fields]
+        self.local_concrete_fields = [Field(f) for f in local_fields]
+        self.parents = parents or {}
+
+
+class State(object):
+    adding = True
+    db = None
+
+
+class Manager(object):
+    db = 'default'
+
+    def __init__(self, model):
+        self.model = model
+        self.saved = {}
+        self.inserted = []
+
+    def get(self, id):
+        return self.model(id=id)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        key = tuple(kwargs.items())
+        if key in self.saved:
+            return self.saved[key], False
+        obj = self.saved[key] = self.model(**dict({'id': next(IDS)}, **kwargs))
+        return obj, True
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        obj.save()
+        return obj
+
+    def filter(self, ec2_instance_id__in):
+        return [AwsInstance(id=0, ec2_instance_id='i-old')]
+
+    def bulk_create(self, objs):
+        assert not self.model._meta.parents
+        for obj in objs:
+            obj.save()
+
+    def _insert(self, objs, fields, using):
+        for obj in objs:
+            assert all(getattr(obj, f.attname) is not None for f in fields)
+        self.inserted.extend(objs)
+
+
+class Model(object):
+    _meta = Meta()
+    aws_account_id = '123'
+
+    def __init__(self, **kwargs):
+        self.id = None
+        self._state = State()
+        self.__dict__.update(kwargs)
+
+    @property
+    def pk(self):
+        return getattr(self, self._meta.pk.attname)
+
+    def save(self):
+        assert 'BULK_ONLY' not in os.environ or not self._meta.parents, (
+            'Multi-table inherited models must be bulk inserted')
+        self.id = next(IDS)
+
+
+def models(*names):
+    for name in names:
+        model = globals()[name] = type(name, (Model,), {})
+        model.objects = model._base_manager = Manager(model)
+
+
+models('Account', 'AwsEC2InstanceDefinitions', 'AwsMachineImage',
+       'Instance', 'InstanceEvent', 'AwsInstance', 'AwsInstanceEvent')
+AwsMachineImage.INSPECTED = 'inspected'
+Instance._meta = Meta(('id', 'account'))
+AwsInstance._meta = Meta(
+    ('instance_ptr_id', 'id', 'account', 'ec2_instance_id', 'region'),
+    {Instance: Field('instance_ptr_id')},
+    ('instance_ptr_id', 'ec2_instance_id', 'region'),
+)
+InstanceEvent._meta = Meta(('id', 'instance', 'event_type'))
+AwsInstanceEvent._meta = Meta(
+    ('instanceevent_ptr_id', 'id', 'instance', 'event_type', 'instance_type'),
+    {InstanceEvent: Field('instanceevent_ptr_id')},
+    ('instanceevent_ptr_id', 'instance_type'),
+)
+
+
+def create(**kwargs):
+    assert 'BULK_ONLY' not in os.environ, 'Events must be bulk created'
+    return Manager.create(AwsInstanceEvent.objects, **kwargs)
+
+
+AwsInstanceEvent.objects.create = create
+"""
+
+
+@pytest.fixture
+def fake_django(local_python, tmpdir, monkeypatch):
+    """Make the "remote" code import fake Django and cloudigrade models."""
+    django = tmpdir.mkdir('django')
+    django.join('__init__.py').write('')
+    django.mkdir('db').join('__init__.py').write(FAKE_DJANGO_DB)
+    package = tmpdir.mkdir('account')
+    package.join('__init__.py').write('')
+    package.join('models.py').write(FAKE_INJECTION_MODELS)
+    monkeypatch.setenv('PYTHONPATH', str(tmpdir))
+
+
+def test_bulk_injection(fake_django, monkeypatch):
+    """Images are shared by ID, and existing instances are reused."""
+    monkeypatch.setenv('BULK_ONLY', '1')
+    result = injector.inject_bulk_instance_data(7, [
+        {'image_type': 'rhel', 'events': [3, 1], 'ec2_ami_id': 'ami-1'},
+        {'image_type': 'rhel', 'events': [2], 'ec2_ami_id': 'ami-1'},
+        {'image_type': '', 'events': [2], 'instance_id': 'i-old'},
+    ])
+    assert result[0]['image_id'] == result[1]['image_id']
+    assert result[2]['image_id'] != result[0]['image_id']
+    assert len({r['instance_id'] for r in result}) == 3
+    assert result[2]['instance_id'] == 0
+
+
+def test_instance_injection(fake_django):
+    """Single instances create their image like bulk injection does."""
+    result = injector.inject_instance_data(
+        7, 'rhel', [3, 1], ec2_ami_id='ami-1', instance_id='i-1')
+    assert result['image_id'] and result['instance_id']
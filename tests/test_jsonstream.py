@@ -0,0 +1,72 @@
+"""Unit tests for :mod:`integrade.jsonstream`."""
+import json
+
+import pytest
+
+from integrade import jsonstream
+
+
+def chunked(data, size):
+    """Split ``data`` into chunks of ``size``."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+DOCUMENT = {
+    'count': 3,
+    'next': None,
+    'results': [
+        {'id': 1, 'name': 'café', 'tags': ['rhel'], 'ok': True},
+        {'id': 12345, 'runtime': 86400.5, 'nested': {'results': [1]}},
+        [1, 'two', None],
+    ],
+    'after': 'x' * 100,
+}
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 64, 100000])
+@pytest.mark.parametrize('as_bytes', [True, False])
+def test_iter_items(size, as_bytes):
+    """Items are decoded the same whatever the chunk boundaries are."""
+    data = json.dumps(DOCUMENT, indent=1)
+    if as_bytes:
+        data = data.encode('utf8')
+    others = {}
+    items = jsonstream.iter_items(chunked(data, size), 'results', others)
+    assert list(items) == DOCUMENT['results']
+    assert others == {'count': 3, 'next': None, 'after': 'x' * 100}
+
+
+def test_iter_items_numbers_split_across_chunks():
+    """Numbers are not cut short at the end of a chunk."""
+    chunks = ['{"daily_usage": [12', '345, 6', '.5e', '3]}']
+    assert list(jsonstream.iter_items(chunks, 'daily_usage')) == [
+        12345, 6500.0]
+
+
+def test_iter_items_is_incremental():
+    """Items are yielded before the rest of the document is read."""
+    def chunks():
+        yield '{"results": [{"id": 1}, '
+        raise AssertionError('Read too far')
+
+    items = jsonstream.iter_items(chunks(), 'results')
+    assert next(items) == {'id': 1}
+
+
+@pytest.mark.parametrize('data', ['{}', '{"results": []}', '{"count": 0}'])
+def test_iter_items_empty(data):
+    """Empty or missing lists yield nothing."""
+    assert list(jsonstream.iter_items([data], 'results')) == []
+
+
+@pytest.mark.parametrize('data', [
+    '[1, 2]',
+    '{"results": 1}',
+    '{"results": [1 2]}',
+    '{"results": [1, 2]',
+    '{"results": [{"id": 1',
+])
+def test_iter_items_invalid(data):
+    """Invalid or truncated documents raise ValueError."""
+    with pytest.raises(ValueError):
+        list(jsonstream.iter_items(chunked(data, 3), 'results'))
@@ -0,0 +1,206 @@
+"""Unit tests for :mod:`integrade.load`."""
+from unittest import mock
+
+import pytest
+
+from integrade import api, load
+from integrade.tests import urls
+
+
+def fake_client(stats):
+    """Return a mock client answering like cloudigrade would."""
+    def get(path, **kwargs):
+        stats.record('GET', 'http://x' + path, 200, 0.01, 10)
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'results': [{'id': 7}]}
+        if path == urls.IMAGE:
+            response.status_code = 500
+        return response
+
+    def post(path, payload, **kwargs):
+        stats.record('POST', 'http://x' + path, 200, 0.02, 10)
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'auth_token': 'token'}
+        return response
+
+    client = mock.Mock()
+    client.get.side_effect = get
+    client.post.side_effect = post
+    return client
+
+
+CREDENTIALS = [{'username': 'u', 'password': 'p'}]
+
+
+def test_time_range():
+    """Report windows are 30 days long and end at midnight UTC."""
+    params = load._time_range(-10)
+    assert params['start'].endswith('T00:00Z')
+    assert params['end'].endswith('T00:00Z')
+    assert params['start'] < params['end']
+
+
+def test_start_delay():
+    """Users are started evenly over the ramp up period."""
+    run = load.LoadRun(5, 10, ramp=8, credentials=CREDENTIALS)
+    assert [run.start_delay(i) for i in range(5)] == [0, 2, 4, 6, 8]
+    assert load.LoadRun(1, 10, ramp=8, credentials=CREDENTIALS
+                        ).start_delay(0) == 0
+
+
+@pytest.mark.parametrize('weights', [{'nope': 1}, {'login': 0}])
+def test_invalid_weights(weights):
+    """Unknown scenarios or no weighted scenario at all are rejected."""
+    with pytest.raises(ValueError):
+        load.LoadRun(1, 1, weights=weights, credentials=CREDENTIALS)
+
+
+def test_run():
+    """A run reports throughput, endpoint statistics and error rates."""
+    run = load.LoadRun(
+        3, 0.2,
+        weights={'report_images': 1, 'list_images': 1},
+        credentials=CREDENTIALS,
+        client_factory=fake_client,
+    )
+    report = run.run()
+    assert report['users'] == 3
+    assert report['failed_logins'] == 0
+    assert report['requests'] > 6
+    assert report['throughput'] > 0
+    assert set(report['scenarios']) == {'report_images', 'list_images'}
+    assert report['scenarios']['report_images']['error_rate'] == 0
+    assert report['scenarios']['list_images']['error_rate'] == 1
+    assert 'POST /auth/token/create/' in report['endpoints']
+    assert 'GET /api/v1/report/images/' in report['endpoints']
+    text = load.format_report(report)
+    assert 'report_images' in text
+    assert 'GET /api/v1/report/images/' in text
+
+
+def test_run_skipped(caplog):
+    """Scenarios which can not run yet are skipped, not timed or run."""
+    def client_factory(stats):
+        client = fake_client(stats)
+        client.get.side_effect = None
+        client.get.return_value.json.return_value = {'results': []}
+        return client
+
+    caplog.set_level('INFO', 'integrade.load')
+    run = load.LoadRun(
+        2, 0.1,
+        weights={'report_images': 1},
+        credentials=CREDENTIALS,
+        client_factory=client_factory,
+    )
+    report = run.run()
+    scenario = report['scenarios']['report_images']
+    assert scenario['runs'] == 0
+    assert scenario['skipped'] > 0
+    assert 'GET /api/v1/report/images/' not in report['endpoints']
+    logged = [r for r in caplog.records if r.name == 'integrade.load']
+    assert len(logged) == 1
+    assert 'no account of the user is known' in logged[0].getMessage()
+    assert f"{scenario['skipped']} skipped" in load.format_report(report)
+
+
+@pytest.mark.parametrize('env,credentials', (
+    ({}, [{'username': 'super', 'password': 'secret'}]),
+    ({'CLOUDIGRADE_TOKEN': 't', 'CLOUDIGRADE_USER': 'super',
+      'CLOUDIGRADE_PASSWORD': 'secret'},
+     [{'username': 'super', 'password': 'secret'}]),
+    ({'CLOUDIGRADE_TOKEN': 't'}, None),
+))
+def test_default_credentials(env, credentials, monkeypatch):
+    """Users log in as the super user, only if its credentials are known."""
+    for name in ('CLOUDIGRADE_TOKEN', 'CLOUDIGRADE_USER',
+                 'CLOUDIGRADE_PASSWORD'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    cfg = {'super_user_name': 'super', 'super_user_password': 'secret'}
+    with mock.patch.object(load.config, 'get_config', return_value=cfg):
+        if credentials is None:
+            with pytest.raises(ValueError, match='CLOUDIGRADE_TOKEN'):
+                load.LoadRun(1, 1)
+        else:
+            assert load.LoadRun(1, 1).credentials == credentials
+
+
+def test_run_exceptions(caplog):
+    """Exceptions are counted by type, the first of a scenario is logged."""
+    def client_factory(stats):
+        client = fake_client(stats)
+        client.get.side_effect = ConnectionError('refused')
+        return client
+
+    run = load.LoadRun(
+        2, 0.1,
+        weights={'list_images': 1},
+        credentials=CREDENTIALS,
+        client_factory=client_factory,
+    )
+    report = run.run()
+    scenario = report['scenarios']['list_images']
+    assert scenario['error_rate'] == 1
+    assert scenario['exceptions'] == {'ConnectionError': scenario['runs']}
+    assert report['login_exceptions'] == {}
+    logged = [r for r in caplog.records if r.name == 'integrade.load' and
+              r.levelname == 'ERROR']
+    assert len(logged) == 1
+    assert 'list_images' in logged[0].getMessage()
+    assert f"{scenario['runs']} ConnectionError" in load.format_report(report)
+
+
+def test_run_failed_logins():
+    """Users who can not log in are reported and do nothing else."""
+    client = mock.Mock()
+    client.post.return_value = mock.Mock(status_code=400)
+    run = load.LoadRun(2, 0.05, credentials=CREDENTIALS,
+                       client_factory=lambda stats: client)
+    report = run.run()
+    assert report['failed_logins'] == 2
+    assert report['login_exceptions'] == {}
+    assert not client.get.called
+
+    client.post.side_effect = TimeoutError()
+    report = load.LoadRun(2, 0.05, credentials=CREDENTIALS,
+                          client_factory=lambda stats: client).run()
+    assert report['failed_logins'] == 2
+    assert report['login_exceptions'] == {'TimeoutError': 2}
+    assert 'Logging in raised (2 TimeoutError)' in load.format_report(report)
+
+
+def test_default_client():
+    """Virtual users neither raise on errors nor retry them."""
+    stats = api.RequestStats()
+    with mock.patch.object(api, 'Client') as client:
+        load.LoadRun._default_client(stats)
+    kwargs = client.call_args[1]
+    assert kwargs['response_handler'] is api.echo_handler
+    assert kwargs['stats'] is stats
+    assert kwargs['retry'].total == 0
+
+
+def test_main(tmpdir):
+    """The command line options configure the run."""
+    from click.testing import CliRunner
+
+    output = str(tmpdir.join('report.json'))
+    report = {
+        'users': 2, 'elapsed': 1, 'requests': 0, 'throughput': 0,
+        'failed_logins': 0, 'login_exceptions': {}, 'scenarios': {},
+        'endpoints': {},
+    }
+    with mock.patch.object(load, 'LoadRun') as load_run:
+        load_run.return_value.run.return_value = report
+        result = CliRunner().invoke(load.main, [
+            '--users', '2', '--duration', '5', '--ramp', '1',
+            '--scenario', 'login=2', '--user', 'bob:s3:cret',
+            '--output', output,
+        ])
+    assert result.exit_code == 0, result.output
+    load_run.assert_called_once_with(
+        2, 5.0, 1.0, {'login': 2.0},
+        [{'username': 'bob', 'password': 's3:cret'}])
+    assert tmpdir.join('report.json').check()
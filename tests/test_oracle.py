@@ -0,0 +1,155 @@
+"""Unit tests for :mod:`integrade.oracle`."""
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+
+import pytest
+
+from integrade.oracle import DAY, Runs, instance_tags
+
+START = datetime(2018, 1, 7, tzinfo=timezone.utc)
+END = datetime(2018, 1, 10, tzinfo=timezone.utc)
+
+
+def at(day, hour=0):
+    """Return the timestamp of ``hour`` on the ``day`` of January 2018."""
+    return datetime(2018, 1, day, hour, tzinfo=timezone.utc).timestamp()
+
+
+def test_instance_tags():
+    """Tags come from the image type, unless challenged."""
+    assert instance_tags({'image_type': 'rhel,openshift'}) == (
+        'rhel', 'openshift')
+    assert instance_tags({'image_type': ''}) == ()
+    assert instance_tags({'image_type': 'rhel', 'challenged': True}) == ()
+
+
+def test_daily_usage():
+    """Runs are clipped to the window and split across days."""
+    runs = Runs.from_instances([
+        # RHEL from before the window to the middle of the second day.
+        {'image_type': 'rhel', 'events': [at(1), at(8, 12)], 'memory': 2},
+        # OpenShift twice on the first day and left running.
+        {'image_type': 'openshift', 'vcpu': 4,
+         'events': [at(7, 1), at(7, 2), at(7, 22)]},
+        # Never reported.
+        {'image_type': '', 'events': [at(7), at(9)]},
+    ], now=at(9, 6))
+    report = runs.daily_usage(START, END)
+    first, second, third = report['daily_usage']
+    assert first['date'] == '2018-01-07T00:00:00Z'
+    assert first['rhel_instances'] == 1
+    assert first['rhel_runtime_seconds'] == DAY
+    assert first['rhel_memory_seconds'] == 2 * DAY
+    assert first['openshift_instances'] == 1
+    assert first['openshift_runtime_seconds'] == 3 * 3600
+    assert first['openshift_vcpu_seconds'] == 4 * 3 * 3600
+    assert second['rhel_runtime_seconds'] == 12 * 3600
+    assert second['openshift_runtime_seconds'] == DAY
+    assert third['rhel_instances'] == 0
+    assert third['openshift_runtime_seconds'] == 6 * 3600
+    assert report['instances_seen_with_rhel'] == 1
+    assert report['instances_seen_with_openshift'] == 1
+
+
+def test_empty_window():
+    """A window without any runs reports no usage."""
+    runs = Runs.from_instances(
+        [{'image_type': 'rhel', 'events': [at(1), at(2)]}], now=at(20))
+    report = runs.daily_usage(START, END)
+    assert len(report['daily_usage']) == 3
+    assert all(d['rhel_instances'] == 0 for d in report['daily_usage'])
+    assert report['instances_seen_with_rhel'] == 0
+    assert runs.daily_usage(START, START)['daily_usage'] == []
+
+
+def test_matches_per_instance_computation():
+    """The vectorized usage matches adding up every run one by one."""
+    rng = random.Random(0)
+    instances = []
+    for _ in range(50):
+        events = sorted(rng.sample(range(int(at(1)), int(at(20))), 6))
+        instances.append({
+            'image_type': rng.choice(['rhel', 'openshift', '']),
+            'events': events[:rng.choice([5, 6])],
+            'vcpu': rng.choice([1, 2]),
+            'memory': rng.choice([1, 4]),
+        })
+    now = at(20)
+    start, end = at(5), at(15, 12)
+    runs = Runs.from_instances(instances, now)
+    runtime = runs.runtime(start, end)
+    report = runs.daily_usage(start, end)
+    for index, instance in enumerate(instances):
+        events = instance['events'] + [now] * (len(instance['events']) % 2)
+        expected = sum(
+            max(0, min(off, end) - max(on, start))
+            for on, off in zip(events[::2], events[1::2]))
+        assert runtime[index] == expected
+    for tag in ('rhel', 'openshift'):
+        tagged = [
+            i for i, instance in enumerate(instances)
+            if tag in instance['image_type']]
+        assert sum(
+            d[f'{tag}_runtime_seconds'] for d in report['daily_usage']
+        ) == sum(runtime[i] for i in tagged)
+        assert sum(
+            d[f'{tag}_memory_seconds'] for d in report['daily_usage']
+        ) == sum(runtime[i] * instances[i]['memory'] for i in tagged)
+        assert report[f'instances_seen_with_{tag}'] == sum(
+            1 for i in tagged if runtime[i] > 0)
+
+
+def random_runs(seed=0, count=200):
+    """Return the runs of ``count`` random instances."""
+    rng = random.Random(seed)
+    instances = []
+    for _ in range(count):
+        events = sorted(rng.sample(range(int(at(1)), int(at(28))), 4))
+        instances.append({
+            'image_type': rng.choice(['rhel', 'openshift', 'rhel,openshift']),
+            'events': events[:rng.choice([3, 4])],
+            'vcpu': rng.choice([1, 2]),
+            'memory': rng.choice([0.5, 4]),
+        })
+    return Runs.from_instances(instances, now=at(29))
+
+
+def test_index_matches_clipping():
+    """The index gives the same overlap as clipping every run."""
+    runs = random_runs()
+    index = runs.index()
+    rng = random.Random(1)
+    for _ in range(50):
+        start = rng.randrange(int(at(1)) - DAY, int(at(29)))
+        end = start + rng.randrange(1, 10 * DAY)
+        overlap = index.query(start, end)[None]
+        clipped, on, off = runs.clip(start, end)
+        assert overlap['runtime_seconds'] == pytest.approx(
+            (off - on).sum(), abs=1e-6)
+        assert overlap['vcpu_seconds'] == pytest.approx(
+            ((off - on) * runs.vcpu[runs.instance[clipped]]).sum(), abs=1e-6)
+        assert overlap['intervals'] == len(clipped)
+
+
+def test_index_by_tag_sweeps_windows():
+    """Arrays of windows are answered at once, per tag."""
+    runs = random_runs()
+    days = np.arange(at(1), at(28), DAY)
+    by_tag = runs.index('tag').query(days, days + DAY)
+    report = runs.daily_usage(at(1), at(28))
+    for tag in ('rhel', 'openshift'):
+        assert by_tag[tag]['memory_seconds'] == pytest.approx([
+            d[f'{tag}_memory_seconds'] for d in report['daily_usage']])
+
+
+def test_index_by_label():
+    """Runs can be grouped by any label of their instance."""
+    runs = random_runs(count=4)
+    index = runs.index(['a', 'b', 'a', 'b'])
+    runtime = runs.runtime(at(1), at(29))
+    overlap = index.query(at(1), at(29))
+    assert set(overlap) == {'a', 'b'}
+    assert overlap['a']['runtime_seconds'] == pytest.approx(
+        runtime[0] + runtime[2])
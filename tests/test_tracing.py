@@ -0,0 +1,119 @@
+"""Unit tests for :mod:`integrade.tracing`."""
+import json
+from unittest import mock
+
+import pytest
+
+from integrade import tracing
+from integrade.tests import aws_utils
+
+
+@pytest.fixture(autouse=True)
+def clean_spans():
+    """Start and end every test without any recorded spans."""
+    tracing.clear()
+    yield
+    tracing.clear()
+    tracing.set_test(None)
+
+
+def test_span_context_manager():
+    """Spans record their name, category, tags and the current test."""
+    tracing.set_test('tests/test_x.py::test_y')
+    with tracing.span('GET /api/v1/', 'http', method='GET') as span:
+        span.tag(status=200)
+    recorded, = tracing.spans()
+    assert recorded['name'] == 'GET /api/v1/'
+    assert recorded['category'] == 'http'
+    assert recorded['test'] == 'tests/test_x.py::test_y'
+    assert recorded['tags'] == {'method': 'GET', 'status': 200}
+    assert recorded['duration'] >= 0
+
+
+def test_span_records_errors():
+    """A span is recorded even if the timed code raises an exception."""
+    with pytest.raises(KeyError):
+        with tracing.span('boom'):
+            raise KeyError()
+    recorded, = tracing.spans()
+    assert recorded['tags'] == {'error': 'KeyError'}
+
+
+def test_span_decorator():
+    """Decorated functions record a span per call."""
+    @tracing.span('add', 'math')
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3
+    assert add(2, 3) == 5
+    assert [s['name'] for s in tracing.spans()] == ['add', 'add']
+    assert set(tracing.totals()) == {'add'}
+    assert tracing.totals(category='other') == {}
+
+
+def test_max_spans(monkeypatch):
+    """Spans over the limit are dropped, but still counted in the totals."""
+    monkeypatch.setattr(tracing, 'MAX_SPANS', 2)
+    for _ in range(3):
+        with tracing.span('a'):
+            pass
+    assert len(tracing.spans()) == 2
+    assert tracing.dropped() == 1
+    assert set(tracing.totals()) == {'a'}
+    tracing.clear()
+    assert tracing.dropped() == 0
+    assert tracing.totals() == {}
+
+
+def test_aws_call_spans():
+    """AWS API calls are recorded whether they answer or raise."""
+    model = mock.Mock()
+    model.name = 'DescribeImages'
+    model.service_model.service_name = 'ec2'
+    for end in (
+        lambda context: aws_utils._end_aws_span(
+            http_response=mock.Mock(status_code=200), context=context),
+        lambda context: aws_utils._fail_aws_span(
+            exception=TimeoutError(), context=context),
+    ):
+        context = {}
+        aws_utils._start_aws_span(model=model, context=context)
+        end(context)
+        assert context == {}
+    answered, raised = tracing.spans()
+    assert answered['name'] == raised['name'] == 'ec2.DescribeImages'
+    assert answered['tags'] == {'status': 200}
+    assert raised['tags'] == {'error': 'TimeoutError'}
+
+
+def test_export_json(tmpdir):
+    """Spans can be exported as a JSON list."""
+    with tracing.span('a'):
+        pass
+    path = str(tmpdir.join('trace.json'))
+    tracing.export(path)
+    with open(path) as f:
+        data = json.load(f)
+    assert [s['name'] for s in data] == ['a']
+
+
+def test_export_chrome(tmpdir):
+    """Spans can be exported in the Chrome trace format."""
+    tracing.set_test('test_a')
+    with tracing.span('a', 'ui', text='Add Account'):
+        pass
+    path = str(tmpdir.join('trace.json'))
+    tracing.export(path, 'chrome')
+    with open(path) as f:
+        data = json.load(f)
+    event, = data['traceEvents']
+    assert event['ph'] == 'X'
+    assert event['cat'] == 'ui'
+    assert event['args'] == {'text': 'Add Account', 'test': 'test_a'}
+
+
+def test_export_unknown_format(tmpdir):
+    """Unknown export formats are rejected."""
+    with pytest.raises(ValueError):
+        tracing.export(str(tmpdir.join('trace')), 'xml')
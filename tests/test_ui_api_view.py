@@ -0,0 +1,111 @@
+"""Unit tests for :mod:`integrade.tests.ui.api_view`."""
+from unittest import mock
+
+import pytest
+
+from integrade.tests import urls
+from integrade.tests.ui import api_view
+from integrade.utils import DAY
+
+
+def overview(**kwargs):
+    """Return an accounts report item, overridden by ``kwargs``."""
+    return dict({
+        'id': 1,
+        'cloud_account_id': '123456789012',
+        'name': 'First Account',
+        'images': 1,
+        'instances': 2,
+        'rhel_runtime_seconds': 3600.0,
+        'openshift_runtime_seconds': 0.0,
+    }, **kwargs)
+
+
+def test_format_hours():
+    """Hours are rounded up, and not available without a runtime."""
+    assert api_view.format_hours(0.0) == '0'
+    assert api_view.format_hours(3600.0) == '1'
+    assert api_view.format_hours(3601.0) == '2'
+    assert api_view.format_hours(None) == 'N/A'
+
+
+def test_runtime_seconds():
+    """Runtimes only count within the window, and until now."""
+    # 2018-11-15 16:20 UTC, and a window from 4 AM 29 days ago to tomorrow.
+    now = 1542298800
+    start = now - 29 * DAY - 12 * 60 * 60 - 20 * 60
+    end = start + 30 * DAY
+
+    def runtime(events):
+        return api_view.runtime_seconds(events, start, end, now)
+
+    assert runtime([2, 1]) == DAY
+    assert runtime([45, 30]) == 0
+    assert runtime([45, 25]) == 4 * DAY - 4 * 60 * 60
+    assert runtime([0]) == 16 * 60 * 60 + 20 * 60
+    assert runtime([45, 29, 15, 14, 1]) == runtime([45, 29]) + runtime(
+        [15, 14]) + runtime([1])
+    assert api_view.format_hours(runtime([45])) == str(29 * 24 + 13)
+
+
+def test_summary_texts():
+    """Counts and hours are formatted like the summary row."""
+    assert api_view.summary_texts(overview()) == {
+        'First Account', '1 Images', '2 Instances', '1RHEL', '0RHOCP'}
+    assert api_view.summary_texts(overview(
+        images=None,
+        instances=None,
+        rhel_runtime_seconds=None,
+        openshift_runtime_seconds=None,
+    )) == {
+        'First Account', 'N/A Images', 'N/A Instances', 'N/ARHEL',
+        'N/ARHOCP'}
+
+
+@pytest.mark.parametrize('rhel,openshift,expected', (
+    (False, False, {'0RHEL', '0RHOCP'}),
+    (True, False, {'2RHEL', '0RHOCP'}),
+    (False, True, {'0RHEL', '2RHOCP'}),
+    (True, True, {'2RHEL', '2RHOCP'}),
+))
+def test_image_texts(rhel, openshift, expected):
+    """Image hours only count for the products the image is tagged with."""
+    image = {
+        'ec2_ami_id': 'ami-1',
+        'rhel': rhel,
+        'openshift': openshift,
+        'runtime_seconds': 5400.0,
+    }
+    assert api_view.image_texts(image) == expected | {'ami-1'}
+
+
+def test_views():
+    """The detail view requests the images report over the same range."""
+    client = mock.Mock()
+    client.get.return_value.json.side_effect = [
+        {'cloud_account_overviews': [
+            overview(), overview(id=2, name='Second Account', images=0)]},
+        {'images': [{
+            'ec2_ami_id': 'ami-1',
+            'rhel': True,
+            'openshift': False,
+            'runtime_seconds': 3600.0,
+        }]},
+    ]
+    summary = api_view.AccountSummaryView(
+        'auth', start='start', end='end', client=client)
+    client.get.assert_called_once_with(
+        urls.REPORT_ACCOUNTS, params={'start': 'start', 'end': 'end'},
+        auth='auth')
+    assert '0 Images' in summary.texts('Second Account')
+    assert {'First Account', 'Second Account'} <= summary.texts()
+    with pytest.raises(KeyError):
+        summary.account('Third Account')
+
+    detail = summary.detail('Second Account')
+    client.get.assert_called_with(
+        urls.REPORT_IMAGES,
+        params={'start': 'start', 'end': 'end', 'account_id': 2},
+        auth='auth')
+    assert detail.texts('ami-1') == {'ami-1', '1RHEL', '0RHOCP'}
+    assert {'Second Account', 'ami-1'} <= detail.texts()
@@ -0,0 +1,58 @@
+"""Unit tests for :mod:`integrade.tests.ui.artifacts`."""
+import gzip
+import json
+from unittest import mock
+
+from integrade.tests.ui import artifacts
+
+
+def driver(page='<html></html>', screenshot=b'png' * 10):
+    """Return a fake driver whose console log is not supported."""
+    driver = mock.Mock()
+    driver.get_log.side_effect = artifacts.WebDriverException('no log')
+    driver.page_source = page
+    driver.get_screenshot_as_png.return_value = screenshot
+    return driver
+
+
+def test_artifact_dir_name():
+    """Node IDs are turned into a single directory name."""
+    assert artifacts.artifact_dir_name(
+        'integrade/tests/ui/test_acct_detail.py::test_image_tag[RHEL-events0]'
+    ) == 'integrade.tests.ui.test_acct_detail.py_test_image_tag_RHEL-events0'
+
+
+def test_capture(tmp_path):
+    """Artifacts are compressed and written, leaving out the missing ones."""
+    saver = artifacts.FailureArtifacts(str(tmp_path), 1024 * 1024)
+    path = saver.capture(driver(), 'tests/test_x.py::test_y')
+    saver.close()
+
+    assert sorted(p.name for p in tmp_path.joinpath(path).iterdir()) == [
+        'dom.html.gz', 'screenshot.png']
+    with gzip.open(f'{path}/dom.html.gz') as f:
+        assert f.read() == b'<html></html>'
+    assert tmp_path.joinpath(path, 'screenshot.png').read_bytes() == (
+        b'png' * 10)
+
+
+def test_console_log():
+    """Console logs are saved as compressed JSON."""
+    entries = [{'level': 'SEVERE', 'message': 'oops'}]
+    assert json.loads(gzip.decompress(
+        artifacts.encode('console.json.gz', entries))) == entries
+
+
+def test_budget(tmp_path):
+    """Artifacts over the budget are dropped, the smaller ones are kept."""
+    dom = artifacts.encode('dom.html.gz', '<html></html>')
+    saver = artifacts.FailureArtifacts(str(tmp_path), len(dom) + 10)
+    first = saver.capture(driver(), 'test_a')
+    second = saver.capture(driver(), 'test_b')
+    saver.close()
+
+    assert [p.name for p in tmp_path.joinpath(first).iterdir()] == [
+        'dom.html.gz']
+    assert not tmp_path.joinpath(second).exists()
+    assert saver.used == len(dom)
+    assert saver.dropped == 3
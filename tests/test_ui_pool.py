@@ -0,0 +1,83 @@
+"""Unit tests for :mod:`integrade.tests.ui.pool`."""
+import threading
+from unittest import mock
+
+from selenium.common.exceptions import WebDriverException
+
+from integrade.tests.ui import pool
+
+
+def test_reuses_browsers():
+    """The browser released last is handed out again, without relaunching."""
+    factory = mock.Mock(side_effect=lambda: mock.Mock())
+    browsers = pool.BrowserPool(factory, size=2)
+    first = browsers.acquire()
+    second = browsers.acquire()
+    assert first is not second
+    browsers.release(first)
+    browsers.release(second)
+    assert browsers.acquire() is second
+    assert factory.call_count == 2
+    second.delete_all_cookies.assert_not_called()
+
+
+def test_reset():
+    """Released browsers can be reset instead of relaunched."""
+    browsers = pool.BrowserPool(mock.Mock)
+    driver = browsers.acquire()
+    browsers.release(driver, reset=True)
+    driver.delete_all_cookies.assert_called_once_with()
+    driver.get.assert_called_once_with('about:blank')
+    assert browsers.acquire() is driver
+
+
+def test_reset_failure_replaces_browser():
+    """A browser which fails to reset is quit and replaced."""
+    factory = mock.Mock(side_effect=lambda: mock.Mock())
+    browsers = pool.BrowserPool(factory)
+    driver = browsers.acquire()
+    driver.delete_all_cookies.side_effect = WebDriverException('crashed')
+    browsers.release(driver, reset=True)
+    driver.quit.assert_called_once_with()
+    replacement = browsers.acquire()
+    assert replacement is not driver
+    assert factory.call_count == 2
+
+
+def test_prewarm_and_wait():
+    """Browsers launch in the background and acquire waits when full."""
+    launched = threading.Event()
+
+    def factory():
+        launched.wait(5)
+        return mock.Mock()
+
+    browsers = pool.BrowserPool(factory, size=1)
+    browsers.prewarm()
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(
+        browsers.acquire()))
+    thread.start()
+    launched.set()
+    thread.join(5)
+    assert len(acquired) == 1
+
+    # The pool is full, the next acquire waits for a release.
+    thread = threading.Thread(target=lambda: acquired.append(
+        browsers.acquire()))
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+    browsers.release(acquired[0])
+    thread.join(5)
+    assert acquired[1] is acquired[0]
+
+
+def test_close():
+    """Closing the pool quits every browser."""
+    browsers = pool.BrowserPool(mock.Mock, size=2)
+    drivers = [browsers.acquire(), browsers.acquire()]
+    browsers.release(drivers[0])
+    browsers.close()
+    for driver in drivers:
+        driver.quit.assert_called_once_with()
@@ -0,0 +1,246 @@
+"""Unit tests for :mod:`integrade.tests.ui.utils`."""
+from unittest import mock
+
+import pytest
+
+from integrade.tests.ui import utils
+
+
+@pytest.fixture
+def sleep():
+    """Record the pauses of polling instead of sleeping."""
+    clock = [0.0]
+
+    def _sleep(seconds):
+        clock[0] += seconds
+
+    with mock.patch('time.monotonic', lambda: clock[0]):
+        with mock.patch('time.sleep', side_effect=_sleep) as sleep:
+            yield sleep
+
+
+def test_poll_backs_off(sleep):
+    """Pauses between calls grow up to the maximum interval."""
+    func = mock.Mock(side_effect=[None] * 6 + ['done'])
+    assert utils.poll(
+        func, 10, interval=0.1, max_interval=0.3, backoff=2) == 'done'
+    assert func.call_count == 7
+    assert [c[0][0] for c in sleep.call_args_list] == pytest.approx(
+        [0.1, 0.2, 0.3, 0.3, 0.3, 0.3])
+
+
+def test_poll_timeout(sleep):
+    """The last result is returned when time runs out, without oversleeping."""
+    func = mock.Mock(return_value=0)
+    assert utils.poll(func, 1, interval=0.4, backoff=1) == 0
+    assert func.call_count == 4
+    assert sum(c[0][0] for c in sleep.call_args_list) == pytest.approx(1)
+
+
+def test_poll_calls_once(sleep):
+    """A zero timeout still calls the function."""
+    func = mock.Mock(return_value=None)
+    assert utils.poll(func, 0) is None
+    func.assert_called_once_with()
+    sleep.assert_not_called()
+
+
+def test_retry_w_timeout(sleep):
+    """Returned exceptions are retried and raised if they are the last."""
+    results = iter([ValueError(), 'ok'])
+    func = mock.Mock(side_effect=lambda: next(results))
+    assert utils.retry_w_timeout(1, func) == 'ok'
+
+    func = mock.Mock(return_value=ValueError('still failing'))
+    with pytest.raises(ValueError, match='still failing'):
+        utils.retry_w_timeout(1, func)
+    assert func.call_count > 1
+
+
+class WebElement(utils.WebElement):
+    """A Selenium WebElement of a fake driver."""
+
+
+class Driver(object):
+    """A fake driver describing elements of a page that may change."""
+
+    def __init__(self):
+        """Start on the first page."""
+        self.page = 'page-1'
+        self.execute_script = mock.Mock(side_effect=self._describe)
+
+    def _describe(self, script, elements):
+        return [
+            {'depth': e.id, 'text': f'{self.page} {e.id}', 'visible': True}
+            for e in elements
+        ]
+
+
+def test_describe_elements():
+    """Elements are described in one call, fresh every time."""
+    driver = Driver()
+    a, b = WebElement(driver, 1), WebElement(WebElement(driver, 0), 2)
+
+    infos = utils.describe_elements([a, b])
+    assert [i['depth'] for i in infos] == [1, 2]
+    assert driver.execute_script.call_count == 1
+    assert utils.get_element_depth(a) == 1
+    assert utils.get_el_text(b) == 'page-1 2'
+
+    # Text changed in place is seen right away.
+    driver.page = 'page-2'
+    assert utils.get_el_text(b) == 'page-2 2'
+    assert driver.execute_script.call_count == 4
+    assert not hasattr(b, '_integrade_info')
+
+
+def test_get_el_text_stale():
+    """Stale elements have no text."""
+    driver = Driver()
+    driver.execute_script.side_effect = utils.StaleElementReferenceException
+    assert utils.get_el_text(WebElement(driver, 1)) == ''
+
+
+def test_wait_in_page_navigation(sleep):
+    """Scripts interrupted by a navigation run again for the time left.
+
+    The script timeout is set back to the default afterwards.
+    """
+    driver = mock.Mock()
+    driver.execute_async_script.side_effect = [
+        utils.JavascriptException('document unloaded'), True]
+    assert utils.wait_for_network_idle(driver, timeout=3) is True
+    assert driver.execute_async_script.call_count == 2
+    first, second, restored = driver.set_script_timeout.call_args_list
+    assert first == mock.call(4)
+    assert second[0][0] < 4
+    assert restored == mock.call(utils.SCRIPT_TIMEOUT)
+
+
+def test_wait_for_count(sleep):
+    """Wait until the expected number of elements match."""
+    driver = mock.Mock()
+    driver.find_elements_by_css_selector.side_effect = [[1], [1, 2], [1]]
+    assert utils.wait_for_count(driver, '.fa-flag', 2) == [1, 2]
+    driver.find_elements_by_css_selector.assert_called_with('.fa-flag')
+
+
+def test_element_cache():
+    """Cached elements are kept until the page navigates or changes them."""
+    driver = mock.Mock()
+    driver.execute_script.return_value = ['page-1', ['Next']]
+    cache = utils.ElementCache(driver)
+    cache.put('empty', [])
+    assert cache.get('empty') is None
+    driver.execute_script.assert_not_called()
+
+    cache.put('a', ['a'])
+    cache.put('b', ['b'])
+    assert cache.get('a') == ['a']
+    driver.execute_script.assert_called_with(utils.PAGE_STATE_JS, ['a'])
+
+    # Detached elements are dropped, the others are kept.
+    driver.execute_script.return_value = ['page-1', [False]]
+    assert cache.get('a') is None
+    driver.execute_script.return_value = ['page-1', ['Next']]
+    assert cache.get('a') is None
+    assert cache.get('b') == ['b']
+
+    # So are elements rendering another text in place.
+    driver.execute_script.return_value = ['page-1', ['Add']]
+    assert cache.get('b') is None
+
+    # Navigating drops everything.
+    cache.put('b', ['b'])
+    driver.execute_script.return_value = ['page-2', ['Add']]
+    assert cache.get('b') is None
+    cache.put('b', ['b2'])
+    assert cache.get('b') == ['b2']
+
+
+class Widget(object):
+    """A fake widget, located within its locatable parent."""
+
+    def __init__(self, locator, locatable_parent=None):
+        """Point to ``locator``."""
+        self.locator = locator
+        self.locatable_parent = locatable_parent
+
+    def __locator__(self):
+        """Return the locator of the widget."""
+        return self.locator
+
+
+class Browser(object):
+    """A fake widgetastic browser, counting the elements it locates."""
+
+    def __init__(self):
+        """Start without locating anything."""
+        self.located = []
+
+    def elements(self, locator, parent=None, check_visibility=False):
+        """Locate a single element."""
+        self.located.append(locator)
+        return ['element']
+
+
+class CachedBrowser(utils.CachedElementsMixin, Browser):
+    """A fake browser reusing the elements it located."""
+
+    def __init__(self, driver):
+        """Cache the elements of the page of ``driver``."""
+        super().__init__()
+        self.element_cache = utils.ElementCache(driver)
+
+
+@pytest.fixture
+def page_driver():
+    """Return a fake driver showing the same page and texts."""
+    driver = mock.Mock()
+    driver.execute_script.return_value = ['page-1', ['text']]
+    return driver
+
+
+def test_locator_path():
+    """Widgets are told apart by their locators and those of their parents."""
+    row = Widget('.//row[@name="a"]')
+    assert utils._locator_path(Widget('.//name', row)) == (
+        './/name', './/row[@name="a"]')
+    assert utils._locator_path(Widget({'css': '.a', 'xpath': '..'})) == (
+        (('css', '.a'), ('xpath', '..')),)
+
+
+def test_cached_elements(page_driver):
+    """Widgets pointing to the same elements share them."""
+    browser = CachedBrowser(page_driver)
+    row = Widget('.//row[@name="a"]')
+
+    assert browser.elements(Widget('.//name', row)) == ['element']
+    assert browser.elements(Widget('.//name', Widget(row.locator))) == [
+        'element']
+    assert browser.elements(Widget('.//name'), parent=row) == ['element']
+    assert browser.elements(
+        Widget('.//name'), parent=Widget(row.locator)) == ['element']
+    assert len(browser.located) == 2
+
+    # Elements the page changed are located again.
+    page_driver.execute_script.return_value = ['page-1', ['other text']]
+    assert browser.elements(Widget('.//name', row)) == ['element']
+    assert len(browser.located) == 3
+
+
+def test_uncached_elements(page_driver):
+    """Locators, elements and visible elements are always looked up."""
+    browser = CachedBrowser(page_driver)
+    for _ in range(2):
+        browser.elements('.//name')
+        browser.elements(Widget('.//name'), parent='element')
+        browser.elements(Widget('.//name'), check_visibility=True)
+    assert len(browser.located) == 6
+
+
+def test_check_waited():
+    """Waits which timed out raise, telling what was waited for."""
+    utils.check_waited(True, 'nothing')
+    with pytest.raises(utils.TimeoutException, match='waiting for the page'):
+        utils.check_waited(False, 'the page')
@@ -0,0 +1,23 @@
+"""Unit tests for :mod:`integrade.tests.ui.views`."""
+import gc
+from unittest import mock
+
+import pytest
+
+try:
+    from integrade.tests.ui import views
+except ImportError as e:
+    pytest.skip(f'Cannot import the views: {e}', allow_module_level=True)
+
+
+def test_browser_for():
+    """A single browser is bound to each driver, and dropped with it."""
+    bound = len(views._BROWSERS)
+    driver = mock.Mock()
+    browser = views.browser_for(driver)
+    assert views.browser_for(driver) is browser
+    assert views.browser_for(mock.Mock()) is not browser
+
+    del driver, browser
+    gc.collect()
+    assert len(views._BROWSERS) == bound
@@ -2,97 +2,102 @@
 import os
 import string
 import time
-from datetime import date
+from datetime import datetime, timezone
 from unittest.mock import patch
 
 from integrade.utils import (
     base_url,
+    day_start,
     flaky,
+    format_timestamp,
     gen_password,
     get_expected_hours_in_past_30_days,
+    get_time_lapsed_in_past_30_days,
     round_hours,
+    utc_timestamp,
     uuid4
 )
 
 
+# 2018-11-15 16:20 UTC, which is 11:20 in EST and 2018-11-16 01:20 in JST.
+NOW = int(datetime(2018, 11, 15, 16, 20, tzinfo=timezone.utc).timestamp())
+EST = -5 * 60 * 60
+JST = 9 * 60 * 60
+
+
 def test_get_expected_hours_in_past_30_days():
     """Test that the utility calculates the hours correctly."""
-    # assert that days outside 30 window generate 0 hours
-    hours, spare_min, events = get_expected_hours_in_past_30_days([45, 30])
-    assert hours == 0
-    assert spare_min == 0
-    assert events == [45, 30]
+    def expected_hours(events, utc_offset=0):
+        return get_expected_hours_in_past_30_days(events, NOW, utc_offset)
 
-    hours, spare_min, events = get_expected_hours_in_past_30_days([45, 44])
-    assert hours == 0
-    assert spare_min == 0
-    assert events == [45, 44]
+    # assert that days outside 30 window generate 0 hours
+    assert expected_hours([45, 30]) == (0, 0, [45, 30])
+    assert expected_hours([45, 44]) == (0, 0, [45, 44])
 
     # assert that whole days in past work
-    hours, spare_min, events = get_expected_hours_in_past_30_days([2, 1])
-    assert hours == 24
-    assert spare_min == 0
-    assert events == [2, 1]
+    assert expected_hours([2, 1]) == (24, 0, [2, 1])
 
     # assert that multiple whole days in past work
-    hours, spare_min, events = get_expected_hours_in_past_30_days([6, 4, 2, 1])
-    assert hours == 72
-    assert spare_min == 0
-    assert events == [6, 4, 2, 1]
+    assert expected_hours([6, 4, 2, 1]) == (72, 0, [6, 4, 2, 1])
 
     # assert that when we cross the 30 day mark, we only get time
     # in period
-    hours, spare_min, events = get_expected_hours_in_past_30_days([40, 29])
-    assert hours == 24
-    assert spare_min == 0
-    assert events == [40, 29]
-
-    # assert that when an instance is still running, the timezone is accounted
-    # for because the browser makes the request in UTC of local time, so for
-    # example, if it is noon in EST, then it is 4pm in UTC
-
-    # offset is in seconds, convert to hours
-    utc_offset = (time.localtime().tm_gmtoff) / (60 * 60)
-    current_hours = time.localtime().tm_hour
-    current_min = time.localtime().tm_min
-    hours, spare_min, events = get_expected_hours_in_past_30_days([0, None])
-    assert hours == current_hours - utc_offset
-    assert spare_min == current_min
-    assert events == [0]
+    assert expected_hours([40, 29]) == (24, 0, [40, 29])
+
+    # assert that when an instance is still running, it ran until now in UTC
+    assert expected_hours([0, None]) == (16, 20, [0])
 
     # Now include previous whole days inside the time period
-    # offset is in seconds, convert to hours
-    utc_offset = (time.localtime().tm_gmtoff) / (60 * 60)
-    current_hours = time.localtime().tm_hour
-    current_min = time.localtime().tm_min
-    hours, spare_min, events = get_expected_hours_in_past_30_days(
-        [5, 4, 0, None])
-    assert hours == 24 + current_hours - utc_offset
-    assert spare_min == current_min
-    assert events == [5, 4, 0]
-
-    # assert that when an instance is still running, but started before the
-    # 30 days filter, the timezone is accounted for correctly. For example,
-    # if the requests were from a browser using the EST timezone, the
-    # beginning would be at 4 AM in UTC and the end is 4 hours later,
-    # they cancel out.
-
-    current_hours = time.localtime().tm_hour
-    current_min = time.localtime().tm_min
-    hours, spare_min, events = get_expected_hours_in_past_30_days([45, None])
-    # 24 hours for the past 30 days plus the hours today
-    assert hours == (24 * 30) + current_hours
-    assert spare_min == current_min
-    assert events == [45]
-
-    # assert that whole days are counted based on UTC time
-    with patch('integrade.utils.datetime') as datetime:
-        datetime.utcnow().date.return_value = date(2018, 11, 16)
-        datetime.now().date.return_value = date(2018, 11, 15)
-        hours, spare_min, events = get_expected_hours_in_past_30_days([2, 1])
-        assert hours == 0
-        assert spare_min == 0
-        assert events == [2, 1]
+    assert expected_hours([5, 4, 0, None]) == (24 + 16, 20, [5, 4, 0])
+
+    # assert that the period starts at midnight 30 days ago in the timezone
+    # of the browser. In EST that is 5 AM UTC. In JST it is already the 16th,
+    # so it starts at midnight on October 17th, 3 PM UTC on the 16th.
+    assert expected_hours([45, None], EST) == (24 * 30 + 11, 20, [45])
+    assert expected_hours([45, 29], EST) == (24 - 5, 0, [45, 29])
+    assert expected_hours([45, None], JST) == (24 * 30 + 1, 20, [45])
+    assert expected_hours([45, 30], JST) == (0, 0, [45, 30])
+    assert expected_hours([45, 29], JST) == (9, 0, [45, 29])
+
+    # assert that whole days are counted based on UTC time: while the local
+    # date is the UTC date, or already ahead of it, they count in full
+    assert expected_hours([2, 1], EST) == (24, 0, [2, 1])
+    assert expected_hours([2, 1], JST) == (24, 0, [2, 1])
+
+    # but once the UTC date is already tomorrow, 2018-11-16 01:20 UTC, while
+    # the local date is still today, 2018-11-15 20:20 in EST, they do not
+    late = NOW + 9 * 60 * 60
+    assert get_expected_hours_in_past_30_days([2, 1], late, EST) == (
+        0, 0, [2, 1])
+    assert get_expected_hours_in_past_30_days([45, 30], late, EST) == (
+        0, 0, [45, 30])
+
+
+def test_time_lapsed_at_any_hour():
+    """The runtime of a running instance grows with the time of day."""
+    midnight = day_start(NOW)
+    for hour in range(24):
+        now = midnight + hour * 60 * 60 + 59
+        assert get_time_lapsed_in_past_30_days(3, None, now, EST) == (
+            3 * 24 + hour, 0)
+        assert get_time_lapsed_in_past_30_days(3, 1, now, JST) == (48, 0)
+
+
+def test_day_start():
+    """Midnights are computed in UTC or in a given timezone."""
+    assert format_timestamp(day_start(NOW)) == '2018-11-15T00:00Z'
+    assert format_timestamp(day_start(NOW, 1)) == '2018-11-16T00:00Z'
+    assert format_timestamp(day_start(NOW, -30, EST)) == '2018-10-16T05:00Z'
+    assert format_timestamp(day_start(NOW, 0, JST)) == '2018-11-15T15:00Z'
+
+
+def test_utc_timestamp():
+    """Datetimes are converted to timestamps, naive ones being in UTC."""
+    assert utc_timestamp(datetime(2018, 11, 15, 16, 20)) == NOW
+    assert utc_timestamp(
+        datetime(2018, 11, 15, 16, 20, tzinfo=timezone.utc)) == NOW
+    assert utc_timestamp(NOW + 0.5) == NOW
+    assert abs(utc_timestamp() - time.time()) < 2
 
 
 def test_round_hours():
@@ -0,0 +1,79 @@
+"""Unit tests for :mod:`integrade.workers`."""
+import os
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+
+from integrade import workers
+
+
+@pytest.fixture
+def xdist_env(tmpdir):
+    """Pretend to be the xdist worker gw1 of a run with three workers."""
+    env = {
+        workers.WORKER_ENV: 'gw1',
+        workers.WORKER_COUNT_ENV: '3',
+        workers.TESTRUN_ENV: os.path.basename(str(tmpdir)),
+    }
+    with mock.patch.dict(os.environ, env):
+        with mock.patch('tempfile.gettempdir', return_value=str(tmpdir)):
+            yield env
+    workers.release_slots()
+
+
+def test_not_sharded():
+    """Outside of xdist everything behaves like a single process."""
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert workers.worker_id() == 'master'
+        assert not workers.is_worker()
+        assert workers.worker_count() == 1
+        assert workers.worker_index() == 0
+        assert workers.claim_slot('thing', 3) == 0
+        assert workers.shared_value('value', lambda: 42) == 42
+    workers.release_slots()
+
+
+def test_worker_identity(xdist_env):
+    """The worker id, index and count come from the xdist environment."""
+    assert workers.worker_id() == 'gw1'
+    assert workers.is_worker()
+    assert workers.worker_count() == 3
+    assert workers.worker_index() == 1
+
+
+def test_claim_slot_prefers_worker_index(xdist_env):
+    """A worker claims the slot matching its index and keeps it."""
+    assert workers.claim_slot('aws_profile', 3) == 1
+    assert workers.claim_slot('aws_profile', 3) == 1
+    assert workers.claim_slot('nothing', 0) is None
+
+
+def test_claim_slot_skips_taken_slots(xdist_env):
+    """Slots locked by another process are skipped."""
+    directory = workers.coordination_dir()
+    holder = subprocess.Popen(
+        [sys.executable, '-c', (
+            'import fcntl, sys\n'
+            f'f = open({os.path.join(directory, "res-1.lock")!r}, "w")\n'
+            'fcntl.flock(f, fcntl.LOCK_EX)\n'
+            'print("locked", flush=True)\n'
+            'sys.stdin.read()\n'
+        )],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    try:
+        assert holder.stdout.readline().strip() == b'locked'
+        assert workers.claim_slot('res', 2) == 0
+    finally:
+        holder.communicate(b'')
+
+
+def test_shared_value_computed_once(xdist_env):
+    """Only the first caller runs the factory, the rest read its result."""
+    factory = mock.Mock(return_value={'token': 'abc'})
+    assert workers.shared_value('superuser', factory) == {'token': 'abc'}
+    assert workers.shared_value('superuser', factory) == {'token': 'abc'}
+    assert factory.call_count == 1